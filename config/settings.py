@@ -91,6 +91,56 @@ REST_FRAMEWORK = {
     ],
 }
 
+# How document serializers write outgoing stock: 'pessimistic' locks the affected
+# Stock rows before validating; 'optimistic' validates on an unlocked read and writes
+# with a version check, re-reading only rows that changed concurrently.
+STOCK_WRITE_MODE = config('STOCK_WRITE_MODE', default='pessimistic')
+
+# Cache for report results and list counts. Its keys embed per-table generations kept
+# in the database, so entries are never served stale in any worker. 'locmem' keeps a
+# separate cache in each worker process; 'file' and 'db' are shared by every worker
+# ('db' needs `python manage.py createcachetable` once).
+REPORT_CACHE_BACKEND = config('REPORT_CACHE_BACKEND', default='locmem')
+REPORT_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory-reports',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('REPORT_CACHE_LOCATION', default=str(BASE_DIR / 'report_cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'inventory_report_cache',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        **REPORT_CACHE_BACKENDS[REPORT_CACHE_BACKEND],
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+REPORT_CACHE_ALIAS = 'reports'
+# Number of worker processes serving the API (gunicorn also reads WEB_CONCURRENCY);
+# the inventory.W001 check warns when they would each keep a private locmem cache.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+# Seconds a cached report stays valid when none of its tables change.
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=600, cast=int)
+
+# Background report jobs (run_report_jobs) write their results here.
+REPORT_JOB_ROOT = config('REPORT_JOB_ROOT', default=str(BASE_DIR / 'report_jobs'))
+# Seconds between the heartbeats a worker records while it runs a job.
+REPORT_JOB_HEARTBEAT_INTERVAL = config('REPORT_JOB_HEARTBEAT_INTERVAL', default=30, cast=int)
+# Seconds without a heartbeat after which a running job's worker is taken to be gone
+# and the job is claimed again; the inventory.W002 check wants several heartbeats in it.
+REPORT_JOB_STALE_AFTER = config('REPORT_JOB_STALE_AFTER', default=300, cast=int)
+# Threads (and so database connections) one report dashboard request runs its sections on.
+REPORT_DASHBOARD_WORKERS = config('REPORT_DASHBOARD_WORKERS', default=4, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOW_CREDENTIALS = True
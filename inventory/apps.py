@@ -5,4 +5,5 @@ class InventoryConfig(AppConfig):
     name = 'inventory'
 
     def ready(self):
+        import inventory.checks
         import inventory.models
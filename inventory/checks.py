@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_report_cache_shared(app_configs, **kwargs):
+    """
+    Warns when several worker processes would each keep their own locmem report cache:
+    entries are never stale (their generations live in the database), but every worker
+    recomputes and holds its own copy of every report.
+    """
+    if settings.REPORT_CACHE_BACKEND != 'locmem' or settings.WEB_CONCURRENCY <= 1:
+        return []
+    return [
+        Warning(
+            f"REPORT_CACHE_BACKEND is 'locmem' with WEB_CONCURRENCY={settings.WEB_CONCURRENCY}: "
+            "each worker process keeps a separate report cache.",
+            hint="Set REPORT_CACHE_BACKEND to 'file' or 'db' to share cached reports between workers.",
+            id='inventory.W001',
+        )
+    ]
+
+
+@register()
+def check_report_job_heartbeat(app_configs, **kwargs):
+    """
+    Warns when a report job could be found stale between two heartbeats of a healthy
+    worker, which would then run it a second time.
+    """
+    if settings.REPORT_JOB_STALE_AFTER >= 3 * settings.REPORT_JOB_HEARTBEAT_INTERVAL:
+        return []
+    return [
+        Warning(
+            f"REPORT_JOB_STALE_AFTER={settings.REPORT_JOB_STALE_AFTER} is less than three "
+            f"REPORT_JOB_HEARTBEAT_INTERVAL={settings.REPORT_JOB_HEARTBEAT_INTERVAL} heartbeats: "
+            "running report jobs may be reclaimed from live workers.",
+            hint="Raise REPORT_JOB_STALE_AFTER or lower REPORT_JOB_HEARTBEAT_INTERVAL.",
+            id='inventory.W002',
+        )
+    ]
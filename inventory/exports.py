@@ -0,0 +1,429 @@
+import csv
+import datetime
+import queue
+import re
+import threading
+import zipfile
+from decimal import Decimal, InvalidOperation
+from xml.sax.saxutils import escape
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows written to the sheet between two flushes of the zip stream.
+XLSX_FLUSH_ROWS = 500
+
+# COPY output is handed to the response in chunks of this many bytes, with at most
+# COPY_QUEUE_CHUNKS chunks waiting for a slow client.
+COPY_BUFFER_SIZE = 64 * 1024
+COPY_QUEUE_CHUNKS = 16
+
+_XLSX_STATIC_PARTS = [
+    ('[Content_Types].xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    )),
+    ('_rels/.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )),
+    ('xl/workbook.xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )),
+    ('xl/_rels/workbook.xml.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    )),
+    # Cell styles: 0 default, 1 date, 2 date and time, 3 bold header.
+    ('xl/styles.xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="2">'
+        '<numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+        '<numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm"/>'
+        '</numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )),
+]
+
+_XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_END = '</sheetData></worksheet>'
+
+_XLSX_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Characters that are not allowed anywhere in an XML document.
+_XML_ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Echo:
+    """
+    File-like object whose write() returns what was written, so csv.writer can
+    produce one encoded line at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def _export_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Reads `queryset` through a server-side cursor and yields its rows in lists of
+    at most `chunk_size`, for views that attach data to a batch of rows at a time.
+    """
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _flatten_row(data, prefix=''):
+    """
+    Flattens nested serializer output into a single level, joining keys with dots
+    (e.g. {'stocks': {'W1': {'carton': 1}}} becomes {'stocks.W1.carton': 1}).
+    """
+    flat = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(_flatten_row(value, f'{name}.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _export_filename(view):
+    name = type(view).__name__.removesuffix('View')
+    name = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\1-\2', name)
+    return re.sub(r'([a-z0-9])([A-Z])', r'\1-\2', name).lower()
+
+
+class _ZipStreamSink:
+    """
+    Write-only, unseekable file object for zipfile. Written bytes are kept until
+    drain() hands them to the streaming response.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_inline_string(value, style=0):
+    text = escape(_XML_ILLEGAL_CHARACTERS.sub('', str(value)))
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_cell(value, kind):
+    """
+    Renders one cell. `kind` is 'number', 'date' or None for a column whose cells
+    are typed from their value.
+    """
+    if value is None or value == '':
+        return '<c/>'
+
+    if kind == 'date' and isinstance(value, str):
+        parsed = parse_date(value)
+        if parsed is not None:
+            serial = (datetime.datetime.combine(parsed, datetime.time.min) - _XLSX_EPOCH).days
+            return f'<c s="1"><v>{serial}</v></c>'
+        parsed = parse_datetime(value)
+        if parsed is not None:
+            delta = parsed.replace(tzinfo=None) - _XLSX_EPOCH
+            return f'<c s="2"><v>{delta.days + delta.seconds / 86400}</v></c>'
+
+    if isinstance(value, bool):
+        return _xlsx_inline_string(value)
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if kind == 'number':
+        try:
+            number = Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            number = None
+        if number is not None and number.is_finite():
+            return f'<c><v>{number}</v></c>'
+    return _xlsx_inline_string(value)
+
+
+def _xlsx_column_kinds(serializer):
+    kinds = {}
+    for name, field in serializer.fields.items():
+        if isinstance(field, (serializers.DateTimeField, serializers.DateField)):
+            kinds[name] = 'date'
+        elif isinstance(field, (serializers.IntegerField, serializers.DecimalField, serializers.FloatField)):
+            kinds[name] = 'number'
+    return kinds
+
+
+def _copy_statement(queryset, columns):
+    """
+    Builds a COPY ... TO STDOUT statement exporting `queryset` as CSV with a header.
+    `columns` maps each output column, in order, to a field path or expression on
+    the queryset. Parameters are bound client-side since COPY does not take any.
+    """
+    expressions = {
+        f'copy_column_{index}': F(expression) if isinstance(expression, str) else expression
+        for index, expression in enumerate(columns.values())
+    }
+    sql, params = queryset.values(**expressions).query.sql_with_params()
+    quote_name = connection.ops.quote_name
+    select_list = ', '.join(
+        f'{quote_name(alias)} AS {quote_name(name)}'
+        for alias, name in zip(expressions, columns)
+    )
+    with connection.cursor() as cursor:
+        select_sql = cursor.mogrify(f'SELECT {select_list} FROM ({sql}) AS report', params)
+    if isinstance(select_sql, bytes):
+        select_sql = select_sql.decode()
+    return f'COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER)'
+
+
+class _CopyCancelled(Exception):
+    pass
+
+
+class _CopyPipe:
+    """
+    File object copy_expert writes into on the worker thread. Output is buffered into
+    chunks of COPY_BUFFER_SIZE and passed to the response through a bounded queue, so
+    rows are only read from PostgreSQL as fast as the client takes them.
+    """
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+        self.cancelled = threading.Event()
+        self._buffer = []
+        self._size = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= COPY_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            chunk = b''.join(self._buffer)
+            self._buffer = []
+            self._size = 0
+            self.put(chunk)
+
+    def put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise _CopyCancelled()
+            try:
+                self.queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+def _run_copy(statement, pipe):
+    # COPY runs on its own connection: the request's connection belongs to the
+    # request thread, which is busy handing chunks to the client.
+    copy_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        with copy_connection.cursor() as cursor:
+            cursor.copy_expert(statement, pipe)
+        pipe.flush()
+        pipe.put(None)
+    except _CopyCancelled:
+        pass
+    except Exception as exc:
+        try:
+            pipe.put(exc)
+        except _CopyCancelled:
+            pass
+    finally:
+        copy_connection.close()
+
+
+def _copy_chunks(statement):
+    """
+    Yields the output of a COPY ... TO STDOUT statement as it is produced. The copy
+    stops when the response is closed early.
+    """
+    pipe = _CopyPipe()
+    worker = threading.Thread(target=_run_copy, args=(statement, pipe), daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = pipe.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        pipe.cancelled.set()
+
+
+class ReportExportMixin:
+    """
+    Adds ?export=csv and ?export=xlsx to a report list view. The filtered queryset is
+    read through a server-side cursor and streamed row by row with the report
+    serializer's fields as columns, so memory use does not grow with the size of the
+    report. Views with their own list() call export() with the rows they build.
+
+    Views that define `copy_columns` (output column -> field path or expression, in
+    the order of the serializer fields) also accept ?export=csv&engine=copy, which
+    runs the same filtered query through PostgreSQL COPY and streams its output
+    without building any Python rows.
+    """
+    copy_columns = None
+
+    def list(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export')
+        if export_format:
+            queryset = self.filter_queryset(self.get_queryset())
+            if request.query_params.get('engine') == 'copy' and self.copy_columns is not None:
+                return self.copy_export(queryset, export_format)
+            return self.export(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), export_format)
+        return super().list(request, *args, **kwargs)
+
+    def copy_export(self, queryset, export_format):
+        if export_format != 'csv':
+            return Response(
+                {"error": "The copy engine only exports csv"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            _copy_chunks(_copy_statement(queryset, self.copy_columns)),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{_export_filename(self)}.csv"'
+        return response
+
+    def export(self, rows, export_format):
+        if self.request.query_params.get('engine') == 'copy':
+            return Response(
+                {"error": "This report cannot be exported with the copy engine"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if export_format == 'csv':
+            content, content_type = self._csv_lines(rows), 'text/csv'
+        elif export_format == 'xlsx':
+            content, content_type = self._xlsx_chunks(rows), XLSX_CONTENT_TYPE
+        else:
+            return Response(
+                {"error": f"Unsupported export format: {export_format}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{_export_filename(self)}.{export_format}"'
+        return response
+
+    def _export_records(self, serializer, rows):
+        """
+        Yields the column names, then the values of each row in column order. The
+        columns come from the first row so that nested output is flattened the same
+        way for every row; without rows they are the serializer's fields.
+        """
+        columns = None
+        for row in rows:
+            data = _flatten_row(serializer.to_representation(row))
+            if columns is None:
+                columns = list(data)
+                yield columns
+            yield [data.get(column) for column in columns]
+
+        if columns is None:
+            yield [
+                name for name, field in serializer.fields.items()
+                if not field.write_only
+            ]
+
+    def _csv_lines(self, rows):
+        writer = csv.writer(_Echo())
+        for record in self._export_records(self.get_serializer(), rows):
+            yield writer.writerow(record)
+
+    def _xlsx_chunks(self, rows):
+        """
+        Writes the workbook into a zip stream, yielding the compressed bytes every
+        XLSX_FLUSH_ROWS rows. Cells are inline strings, numbers and date serials, so
+        nothing but the current row is held in memory.
+        """
+        serializer = self.get_serializer()
+        column_kinds = _xlsx_column_kinds(serializer)
+        sink = _ZipStreamSink()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+            for name, content in _XLSX_STATIC_PARTS:
+                workbook.writestr(name, content)
+
+            with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+                sheet.write(_XLSX_SHEET_START.encode())
+                kinds = None
+                for row_number, record in enumerate(self._export_records(serializer, rows), start=1):
+                    if kinds is None:
+                        kinds = [column_kinds.get(column) for column in record]
+                        cells = ''.join(_xlsx_inline_string(column, style=3) for column in record)
+                    else:
+                        cells = ''.join(_xlsx_cell(value, kind) for value, kind in zip(record, kinds))
+                    sheet.write(f'<row r="{row_number}">{cells}</row>'.encode())
+
+                    if row_number % XLSX_FLUSH_ROWS == 0:
+                        data = sink.drain()
+                        if data:
+                            yield data
+                sheet.write(_XLSX_SHEET_END.encode())
+
+        yield sink.drain()
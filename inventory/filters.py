@@ -3,7 +3,7 @@ from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 import datetime
-from .models import SuratTransferStokItems, SuratLainItems, SPG, SPK, SJ, SuratTransferStok, SuratLain, Stock, SJItems, SPGItems
+from .models import SuratTransferStokItems, SuratLainItems, SPG, SPK, SJ, SuratTransferStok, SuratLain, Stock, SJItems, SPGItems, SPKItems, DailyMovementTotal
 
 
 class AwareDateTimeFilter(django_filters.DateTimeFilter):
@@ -92,6 +92,9 @@ class StockTransferReportFilter(django_filters.FilterSet):
     # Filters by the ID of the document's destination warehouse
     destination_warehouse = django_filters.NumberFilter(field_name='surat_transfer_stok__destination_warehouse__id')
 
+    # Filters by a warehouse on either side of the transfer
+    warehouse = django_filters.NumberFilter(method='filter_by_warehouse')
+
     # Filters by the ID of the item's product's supplier
     supplier = django_filters.NumberFilter(field_name='product__supplier__id')
 
@@ -105,10 +108,20 @@ class StockTransferReportFilter(django_filters.FilterSet):
             'end_date',
             'source_warehouse',
             'destination_warehouse',
+            'warehouse',
             'supplier',
             'category'
         ]
 
+    def filter_by_warehouse(self, queryset, name, value):
+        """
+        Custom filter method that keeps the transfers leaving or entering the warehouse.
+        """
+        return queryset.filter(
+            Q(surat_transfer_stok__source_warehouse__id=value)
+            | Q(surat_transfer_stok__destination_warehouse__id=value)
+        )
+
 
 class ReturnReportFilter(django_filters.FilterSet):
     """
@@ -154,10 +167,13 @@ class SPKFilter(django_filters.FilterSet):
     start_date = AwareDateTimeFilter(field_name='transaction_date', lookup_expr='gte')
     end_date = AwareDateTimeFilter(field_name='transaction_date', lookup_expr='lte', adjust_for_end_date=True)
     document_number = django_filters.CharFilter(field_name='document_number', lookup_expr='icontains')
+    customer = django_filters.NumberFilter(field_name='customer__id')
+    # Repeat the parameter for several statuses, e.g. ?status=OPEN&status=PARTIAL
+    status = django_filters.MultipleChoiceFilter(choices=SPK.STATUS_CHOICES)
 
     class Meta:
         model = SPK
-        fields = ['start_date', 'end_date', 'document_number']
+        fields = ['start_date', 'end_date', 'document_number', 'customer', 'status']
 
 
 class SJFilter(django_filters.FilterSet):
@@ -271,3 +287,54 @@ class StockInReportFilter(django_filters.FilterSet):
     class Meta:
         model = SPGItems
         fields = ['start_date', 'end_date', 'warehouse', 'supplier', 'product']
+
+
+class StockInTotalsFilter(django_filters.FilterSet):
+    """
+    FilterSet for the Stock In report when it is read from the daily movement totals.
+    Takes the same parameters as StockInReportFilter, with whole-day dates.
+    """
+    start_date = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    end_date = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    warehouse = django_filters.NumberFilter(field_name='warehouse__id')
+    supplier = django_filters.NumberFilter(field_name='product__supplier__id')
+    product = django_filters.NumberFilter(field_name='product__id')
+
+    class Meta:
+        model = DailyMovementTotal
+        fields = ['start_date', 'end_date', 'warehouse', 'supplier', 'product']
+
+
+class StockOutTotalsFilter(StockInTotalsFilter):
+    """
+    FilterSet for the Stock Out report when it is read from the daily movement totals.
+    Only customer IDs can be matched; non-customer names need the item rows.
+    """
+    customer = django_filters.NumberFilter(field_name='customer__id')
+
+    class Meta(StockInTotalsFilter.Meta):
+        fields = StockInTotalsFilter.Meta.fields + ['customer']
+
+
+class SPKBacklogReportFilter(django_filters.FilterSet):
+    """
+    FilterSet for the SPK backlog report.
+    """
+    start_date = AwareDateTimeFilter(
+        field_name='spk__transaction_date',
+        lookup_expr='gte'
+    )
+    end_date = AwareDateTimeFilter(
+        field_name='spk__transaction_date',
+        lookup_expr='lte',
+        adjust_for_end_date=True
+    )
+    customer = django_filters.NumberFilter(field_name='spk__customer__id')
+    supplier = django_filters.NumberFilter(field_name='product__supplier__id')
+    category = django_filters.NumberFilter(field_name='product__category__id')
+    product = django_filters.NumberFilter(field_name='product__id')
+    status = django_filters.MultipleChoiceFilter(field_name='spk__status', choices=SPK.STATUS_CHOICES)
+
+    class Meta:
+        model = SPKItems
+        fields = ['start_date', 'end_date', 'customer', 'supplier', 'category', 'product', 'status']
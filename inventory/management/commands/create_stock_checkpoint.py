@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.models import _create_stock_checkpoint
+
+class Command(BaseCommand):
+    help = 'Create a stock balance checkpoint used by the stock as-of query (run monthly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            help='Checkpoint date (YYYY-MM-DD), covering movements before that day. Defaults to the first day of the current month.',
+        )
+
+    def handle(self, *args, **options):
+        if options['as_of']:
+            as_of_date = parse_date(options['as_of'])
+            if as_of_date is None:
+                raise CommandError('--as-of must be a date in YYYY-MM-DD format')
+        else:
+            as_of_date = timezone.localdate().replace(day=1)
+
+        as_of = timezone.make_aware(
+            datetime.datetime.combine(as_of_date, datetime.time.min),
+            timezone.get_current_timezone(),
+        )
+        written = _create_stock_checkpoint(as_of)
+
+        self.stdout.write(self.style.SUCCESS(f'Checkpoint at {as_of_date}: {written} balances written'))
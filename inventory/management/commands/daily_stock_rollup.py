@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.models import _roll_up_daily_stock
+
+class Command(BaseCommand):
+    help = 'Write daily closing stock balances for days that are new or changed since the last run (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--through',
+            help='Last day to close (YYYY-MM-DD). Defaults to yesterday.',
+        )
+
+    def handle(self, *args, **options):
+        if options['through']:
+            through = parse_date(options['through'])
+            if through is None:
+                raise CommandError('--through must be a date in YYYY-MM-DD format')
+        else:
+            through = timezone.localdate() - datetime.timedelta(days=1)
+
+        start, written = _roll_up_daily_stock(through)
+        if start is None:
+            self.stdout.write(self.style.SUCCESS(f'Daily stock balances are up to date through {through}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Closed {start} to {through}: {written} balances written'))
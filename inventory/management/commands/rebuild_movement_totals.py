@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import _rebuild_daily_movement_totals
+
+class Command(BaseCommand):
+    help = 'Recompute the daily SPG/SJ movement totals behind the stock in/out reports from the live document items'
+
+    def handle(self, *args, **options):
+        written = _rebuild_daily_movement_totals()
+        self.stdout.write(self.style.SUCCESS(f'{written} daily movement totals written'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import _refresh_spk_fulfillment
+
+class Command(BaseCommand):
+    help = 'Recompute the fulfilled quantities of SPK lines from the live SJ items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'spk_ids',
+            nargs='*',
+            type=int,
+            help='Only refresh these SPKs. Defaults to every SPK.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corrected = _refresh_spk_fulfillment(options['spk_ids'] or None)
+
+        self.stdout.write(self.style.SUCCESS(f'{corrected} SPK lines corrected'))
@@ -0,0 +1,71 @@
+import datetime
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from inventory.models import ReportJob, _beat_report_job, _claim_report_job
+from inventory.views import _run_report_job
+
+
+@contextmanager
+def _heartbeat(job, interval):
+    """
+    Records a heartbeat for `job` every `interval` seconds on a background thread, with
+    its own database connection, for as long as the block runs.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval) and _beat_report_job(job):
+                pass
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'report-job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs, claiming them with SKIP LOCKED so several workers can share the queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls of an empty queue. Defaults to 5.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            stale_before = timezone.now() - datetime.timedelta(seconds=settings.REPORT_JOB_STALE_AFTER)
+            job = _claim_report_job(stale_before)
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running report job {job.pk} ({job.report}, {job.export_format})')
+            with _heartbeat(job, settings.REPORT_JOB_HEARTBEAT_INTERVAL):
+                job = _run_report_job(job)
+            if job.status == ReportJob.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f'Report job {job.pk} written to {job.result_file}'))
+            elif job.status == ReportJob.STATUS_FAILED:
+                self.stdout.write(self.style.ERROR(f'Report job {job.pk} failed: {job.error}'))
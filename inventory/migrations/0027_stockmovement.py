@@ -0,0 +1,129 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+INCOMING_SURAT_LAIN_TYPES = ['STB', 'RETUR_PENJUALAN']
+
+
+def backfill_stock_movements(apps, schema_editor):
+    """
+    Posts every live document line into the ledger, then adds one OPENING row per
+    stock record for whatever part of the current balance the documents do not explain.
+    """
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    Stock = apps.get_model('inventory', 'Stock')
+    SPGItems = apps.get_model('inventory', 'SPGItems')
+    SJItems = apps.get_model('inventory', 'SJItems')
+    SuratLainItems = apps.get_model('inventory', 'SuratLainItems')
+    SuratTransferStokItems = apps.get_model('inventory', 'SuratTransferStokItems')
+    StockAdjustmentItem = apps.get_model('inventory', 'StockAdjustmentItem')
+
+    movements = []
+    totals = {}
+
+    def add(movement_type, source_type, source_id, document_number, transaction_date,
+            product_id, warehouse_id, carton_quantity, pack_quantity):
+        if not carton_quantity and not pack_quantity:
+            return
+        key = (product_id, warehouse_id)
+        carton_total, pack_total = totals.get(key, (0, 0))
+        totals[key] = (carton_total + carton_quantity, pack_total + pack_quantity)
+        movements.append(StockMovement(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            movement_type=movement_type,
+            source_type=source_type,
+            source_id=source_id,
+            document_number=document_number or '',
+            carton_quantity=carton_quantity,
+            pack_quantity=pack_quantity,
+            transaction_date=transaction_date,
+        ))
+        if len(movements) >= 2000:
+            StockMovement.objects.bulk_create(movements)
+            movements.clear()
+
+    for row in SPGItems.objects.filter(spg__is_deleted=False).values_list(
+        'spg_id', 'spg__document_number', 'spg__transaction_date', 'spg__warehouse_id',
+        'product_id', 'carton_quantity', 'pack_quantity',
+    ).iterator():
+        source_id, document_number, transaction_date, warehouse_id, product_id, carton, pack = row
+        add('SPG', 'SPG', source_id, document_number, transaction_date, product_id, warehouse_id, carton, pack)
+
+    for row in SJItems.objects.filter(sj__is_deleted=False).values_list(
+        'sj_id', 'sj__document_number', 'sj__transaction_date', 'sj__warehouse_id',
+        'product_id', 'carton_quantity', 'pack_quantity',
+    ).iterator():
+        source_id, document_number, transaction_date, warehouse_id, product_id, carton, pack = row
+        add('SJ', 'SJ', source_id, document_number, transaction_date, product_id, warehouse_id, -carton, -pack)
+
+    for row in SuratLainItems.objects.filter(surat_lain__is_deleted=False).values_list(
+        'surat_lain_id', 'surat_lain__document_number', 'surat_lain__transaction_date', 'surat_lain__warehouse_id',
+        'surat_lain__document_type', 'product_id', 'carton_quantity', 'pack_quantity',
+    ).iterator():
+        source_id, document_number, transaction_date, warehouse_id, document_type, product_id, carton, pack = row
+        sign = 1 if document_type in INCOMING_SURAT_LAIN_TYPES else -1
+        add(document_type, 'SURAT_LAIN', source_id, document_number, transaction_date,
+            product_id, warehouse_id, sign * carton, sign * pack)
+
+    for row in SuratTransferStokItems.objects.filter(surat_transfer_stok__is_deleted=False).values_list(
+        'surat_transfer_stok_id', 'surat_transfer_stok__document_number', 'surat_transfer_stok__transaction_date',
+        'surat_transfer_stok__source_warehouse_id', 'surat_transfer_stok__destination_warehouse_id',
+        'product_id', 'carton_quantity', 'pack_quantity',
+    ).iterator():
+        source_id, document_number, transaction_date, source_warehouse_id, destination_warehouse_id, product_id, carton, pack = row
+        add('TRANSFER_OUT', 'SURAT_TRANSFER_STOK', source_id, document_number, transaction_date,
+            product_id, source_warehouse_id, -carton, -pack)
+        add('TRANSFER_IN', 'SURAT_TRANSFER_STOK', source_id, document_number, transaction_date,
+            product_id, destination_warehouse_id, carton, pack)
+
+    for row in StockAdjustmentItem.objects.values_list(
+        'stock_adjustment_id', 'stock_adjustment__document_number', 'stock_adjustment__transaction_date',
+        'stock_adjustment__warehouse_id', 'product_id',
+        'old_carton_quantity', 'old_pack_quantity', 'new_carton_quantity', 'new_pack_quantity',
+    ).iterator():
+        source_id, document_number, transaction_date, warehouse_id, product_id, old_carton, old_pack, new_carton, new_pack = row
+        add('ADJUSTMENT', 'STOCK_ADJUSTMENT', source_id, document_number, transaction_date,
+            product_id, warehouse_id, new_carton - old_carton, new_pack - old_pack)
+
+    for row in Stock.objects.values_list(
+        'product_id', 'warehouse_id', 'carton_quantity', 'pack_quantity', 'created_at',
+    ).iterator():
+        product_id, warehouse_id, carton, pack, created_at = row
+        carton_total, pack_total = totals.get((product_id, warehouse_id), (0, 0))
+        add('OPENING', 'STOCK', None, '', created_at, product_id, warehouse_id, carton - carton_total, pack - pack_total)
+
+    StockMovement.objects.bulk_create(movements)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0026_documentsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('OPENING', 'Opening Balance'), ('SPG', 'SPG'), ('SJ', 'SJ'), ('STB', 'STB'), ('SPB', 'SPB'), ('RETUR_PEMBELIAN', 'Retur Pembelian'), ('RETUR_PENJUALAN', 'Retur Penjualan'), ('TRANSFER_OUT', 'Transfer Out'), ('TRANSFER_IN', 'Transfer In'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('source_type', models.CharField(max_length=30)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('document_number', models.CharField(blank=True, max_length=100)),
+                ('carton_quantity', models.IntegerField(default=0)),
+                ('pack_quantity', models.IntegerField(default=0)),
+                ('transaction_date', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.product')),
+                ('reversal_of', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reversal', to='inventory.stockmovement')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'warehouse', 'transaction_date'], name='stock_movement_card_idx'), models.Index(fields=['warehouse', 'transaction_date'], name='stock_movement_wh_date_idx'), models.Index(fields=['source_type', 'source_id'], name='stock_movement_source_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_movements, migrations.RunPython.noop),
+    ]
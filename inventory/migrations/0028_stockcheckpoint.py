@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField()),
+                ('carton_quantity', models.IntegerField(default=0)),
+                ('pack_quantity', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('as_of', 'warehouse', 'product'), name='unique_stock_checkpoint_as_of_warehouse_product')],
+            },
+        ),
+    ]
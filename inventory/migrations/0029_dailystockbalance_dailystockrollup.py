@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0028_stockcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStockRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_through', models.DateField(blank=True, null=True)),
+                ('dirty_from', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyStockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('carton_quantity', models.IntegerField(default=0)),
+                ('pack_quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='daily_stock_balance_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'warehouse', 'date'), name='unique_daily_stock_balance_product_warehouse_date')],
+            },
+        ),
+    ]
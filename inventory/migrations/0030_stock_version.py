@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0029_dailystockbalance_dailystockrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
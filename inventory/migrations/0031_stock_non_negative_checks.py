@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:39
+
+from django.db import migrations, models
+
+
+# Existing rows may already be negative, so the constraints are added NOT VALID
+# (enforced for every new write) and only validated when no such rows remain.
+ADD_CONSTRAINTS_SQL = """
+ALTER TABLE inventory_stock
+    ADD CONSTRAINT stock_carton_quantity_non_negative CHECK (carton_quantity >= 0) NOT VALID;
+ALTER TABLE inventory_stock
+    ADD CONSTRAINT stock_pack_quantity_non_negative CHECK (pack_quantity >= 0) NOT VALID;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM inventory_stock WHERE carton_quantity < 0 OR pack_quantity < 0) THEN
+        ALTER TABLE inventory_stock VALIDATE CONSTRAINT stock_carton_quantity_non_negative;
+        ALTER TABLE inventory_stock VALIDATE CONSTRAINT stock_pack_quantity_non_negative;
+    END IF;
+END
+$$;
+"""
+
+DROP_CONSTRAINTS_SQL = """
+ALTER TABLE inventory_stock DROP CONSTRAINT IF EXISTS stock_carton_quantity_non_negative;
+ALTER TABLE inventory_stock DROP CONSTRAINT IF EXISTS stock_pack_quantity_non_negative;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0030_stock_version'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(ADD_CONSTRAINTS_SQL, DROP_CONSTRAINTS_SQL),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='stock',
+                    constraint=models.CheckConstraint(condition=models.Q(('carton_quantity__gte', 0)), name='stock_carton_quantity_non_negative'),
+                ),
+                migrations.AddConstraint(
+                    model_name='stock',
+                    constraint=models.CheckConstraint(condition=models.Q(('pack_quantity__gte', 0)), name='stock_pack_quantity_non_negative'),
+                ),
+            ],
+        ),
+    ]
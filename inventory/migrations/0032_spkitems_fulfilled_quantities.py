@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+def backfill_fulfilled_quantities(apps, schema_editor):
+    """
+    Sets the fulfilled counters of every SPK line from the items of the live SJs
+    shipped against its SPK.
+    """
+    SPKItems = apps.get_model('inventory', 'SPKItems')
+    SJItems = apps.get_model('inventory', 'SJItems')
+
+    totals = {
+        (row['sj__spk_id'], row['product_id']): (row['carton_total'], row['pack_total'])
+        for row in SJItems.objects.filter(sj__is_deleted=False).values('sj__spk_id', 'product_id').annotate(
+            carton_total=models.Sum('carton_quantity'),
+            pack_total=models.Sum('pack_quantity'),
+        )
+    }
+
+    items = []
+    for item in SPKItems.objects.filter(spk_id__in={spk_id for spk_id, _ in totals}).only('id', 'spk_id', 'product_id'):
+        item.fulfilled_carton_quantity, item.fulfilled_pack_quantity = totals.get((item.spk_id, item.product_id), (0, 0))
+        items.append(item)
+    SPKItems.objects.bulk_update(items, ['fulfilled_carton_quantity', 'fulfilled_pack_quantity'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0031_stock_non_negative_checks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spkitems',
+            name='fulfilled_carton_quantity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='spkitems',
+            name='fulfilled_pack_quantity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_fulfilled_quantities, migrations.RunPython.noop),
+    ]
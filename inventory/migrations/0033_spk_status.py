@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_spk_status(apps, schema_editor):
+    """
+    Derives the status of every SPK from the fulfilled counters of its lines.
+    """
+    SPK = apps.get_model('inventory', 'SPK')
+    SPKItems = apps.get_model('inventory', 'SPKItems')
+
+    progress = {}
+    for item in SPKItems.objects.order_by('spk_id').iterator():
+        over_shipped, shipped, complete = progress.get(item.spk_id, (False, False, True))
+        progress[item.spk_id] = (
+            over_shipped
+            or item.fulfilled_carton_quantity > item.carton_quantity
+            or item.fulfilled_pack_quantity > item.pack_quantity,
+            shipped or item.fulfilled_carton_quantity != 0 or item.fulfilled_pack_quantity != 0,
+            complete
+            and item.fulfilled_carton_quantity >= item.carton_quantity
+            and item.fulfilled_pack_quantity >= item.pack_quantity,
+        )
+
+    spks_by_status = {}
+    for spk_id, (over_shipped, shipped, complete) in progress.items():
+        if over_shipped:
+            status = 'OVER_SHIPPED'
+        elif not shipped:
+            continue
+        elif complete:
+            status = 'FULFILLED'
+        else:
+            status = 'PARTIAL'
+        spks_by_status.setdefault(status, []).append(spk_id)
+
+    for status, spk_ids in spks_by_status.items():
+        SPK.objects.filter(pk__in=spk_ids).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0032_spkitems_fulfilled_quantities'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spk',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Open'), ('PARTIAL', 'Partially Fulfilled'), ('FULFILLED', 'Fulfilled'), ('OVER_SHIPPED', 'Over-shipped')], default='OPEN', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='spk',
+            index=models.Index(fields=['status', 'customer'], name='inventory_spk_status_cust_idx'),
+        ),
+        migrations.RunPython(backfill_spk_status, migrations.RunPython.noop),
+    ]
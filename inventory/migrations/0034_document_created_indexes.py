@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-16 22:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0033_spk_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sj',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_sj_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spg',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_spg_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spk',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_spk_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suratlain',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_sl_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='surattransferstok',
+            index=models.Index(fields=['created_at', 'id'], name='inventory_transfer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:03
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_daily_movement_totals(apps, schema_editor):
+    """
+    Sums the items of every live SPG and SJ per local transaction day, warehouse,
+    product and (for SJ) customer.
+    """
+    DailyMovementTotal = apps.get_model('inventory', 'DailyMovementTotal')
+    SPG = apps.get_model('inventory', 'SPG')
+    SPGItems = apps.get_model('inventory', 'SPGItems')
+    SJ = apps.get_model('inventory', 'SJ')
+    SJItems = apps.get_model('inventory', 'SJItems')
+    time_zone = timezone.get_current_timezone_name()
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {DailyMovementTotal._meta.db_table}
+                (source_type, date, warehouse_id, product_id, customer_id, line_count, carton_quantity, pack_quantity)
+            SELECT 'SPG', (spg.transaction_date AT TIME ZONE %s)::date, spg.warehouse_id, item.product_id, NULL,
+                   COUNT(*), SUM(item.carton_quantity), SUM(item.pack_quantity)
+            FROM {SPGItems._meta.db_table} AS item
+            JOIN {SPG._meta.db_table} AS spg ON spg.id = item.spg_id
+            WHERE NOT spg.is_deleted
+            GROUP BY 2, 3, 4
+            UNION ALL
+            SELECT 'SJ', (sj.transaction_date AT TIME ZONE %s)::date, sj.warehouse_id, item.product_id, sj.customer_id,
+                   COUNT(*), SUM(item.carton_quantity), SUM(item.pack_quantity)
+            FROM {SJItems._meta.db_table} AS item
+            JOIN {SJ._meta.db_table} AS sj ON sj.id = item.sj_id
+            WHERE NOT sj.is_deleted
+            GROUP BY 2, 3, 4, 5
+            """,
+            [time_zone, time_zone],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0034_document_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(choices=[('SPG', 'SPG'), ('SJ', 'SJ')], max_length=10)),
+                ('date', models.DateField()),
+                ('line_count', models.IntegerField(default=0)),
+                ('carton_quantity', models.IntegerField(default=0)),
+                ('pack_quantity', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source_type', 'date'], name='daily_movement_type_date_idx')],
+                'constraints': [models.UniqueConstraint(models.F('source_type'), models.F('date'), models.F('warehouse'), models.F('product'), django.db.models.functions.comparison.Coalesce('customer', 0), name='unique_daily_movement_total')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_movement_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0035_daily_movement_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(choices=[('stock-info', 'Stock Info'), ('stock-balance', 'Stock Balance'), ('stock-card', 'Stock Card'), ('stock-transfer', 'Stock Transfer'), ('retur-pembelian', 'Retur Pembelian'), ('retur-penjualan', 'Retur Penjualan'), ('penerimaan-barang', 'Penerimaan Barang'), ('pengeluaran-barang', 'Pengeluaran Barang'), ('stock-out', 'Stock Out'), ('stock-in', 'Stock In'), ('spk-backlog', 'SPK Backlog')], max_length=50)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('export_format', models.CharField(choices=[('json', 'JSON'), ('csv', 'CSV'), ('xlsx', 'XLSX')], default='json', max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', editable=False, max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, editable=False)),
+                ('result_file', models.CharField(blank=True, editable=False, max_length=255)),
+                ('error', models.TextField(blank=True, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='report_job_status_idx')],
+            },
+        ),
+    ]
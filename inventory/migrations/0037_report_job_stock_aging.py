@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0036_report_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report',
+            field=models.CharField(choices=[('stock-info', 'Stock Info'), ('stock-balance', 'Stock Balance'), ('stock-card', 'Stock Card'), ('stock-transfer', 'Stock Transfer'), ('retur-pembelian', 'Retur Pembelian'), ('retur-penjualan', 'Retur Penjualan'), ('penerimaan-barang', 'Penerimaan Barang'), ('pengeluaran-barang', 'Pengeluaran Barang'), ('stock-out', 'Stock Out'), ('stock-in', 'Stock In'), ('spk-backlog', 'SPK Backlog'), ('stock-aging', 'Stock Aging')], max_length=50),
+        ),
+    ]
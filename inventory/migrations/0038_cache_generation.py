@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0037_report_job_stock_aging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
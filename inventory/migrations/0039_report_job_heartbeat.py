@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+def backfill_heartbeats(apps, schema_editor):
+    """
+    Starts the heartbeat of jobs already claimed at their claim time, so jobs that were
+    running without one can still be found stale.
+    """
+    ReportJob = apps.get_model('inventory', 'ReportJob')
+    ReportJob.objects.filter(started_at__isnull=False).update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0038_cache_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeats, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,23 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+from django.conf import settings
+from django.core.cache import caches
 from django.dispatch import receiver
-from django.db import models, transaction
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connection, connections, models, transaction
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
-from django.db.models import F
+import datetime
+import functools
+import hashlib
+import random
+import re
+import time
 
 
 class DocumentSequence(models.Model):
+    """
+    Legacy row-locked document counters. Numbers now come from per family/period
+    PostgreSQL sequences, which are seeded from these rows when first created.
+    """
     family = models.CharField(max_length=50)
     period_key = models.CharField(max_length=20)
     current_value = models.PositiveIntegerField(default=0)
@@ -21,16 +33,52 @@ class DocumentSequence(models.Model):
         ]
 
 
+def _document_sequence_name(family, period_key):
+    key = f'{family}:{period_key}'
+    slug = re.sub(r'[^a-z0-9]+', '_', key.lower()).strip('_')
+    return f"docseq_{slug}_{hashlib.md5(key.encode()).hexdigest()[:8]}"
+
+
+def _provisioned_document_sequence_value(family, period_key, name):
+    """
+    Creates the PostgreSQL sequence for a family/period if needed and takes its next value,
+    both on a separate autocommit connection: the catalog change is not held by the caller's
+    transaction, and the caller may not see the new sequence until its transaction ends.
+    New sequences continue from the DocumentSequence counter of the same period.
+    """
+    provisioning_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    try:
+        with provisioning_connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT current_value FROM {DocumentSequence._meta.db_table} WHERE family = %s AND period_key = %s",
+                [family, period_key],
+            )
+            row = cursor.fetchone()
+            start = (row[0] if row else 0) + 1
+            try:
+                cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {name} START WITH {int(start)}")
+            except IntegrityError:
+                # Another worker created the same sequence concurrently.
+                pass
+            cursor.execute("SELECT nextval(%s)", [name])
+            return cursor.fetchone()[0]
+    finally:
+        provisioning_connection.close()
+
+
 def _next_document_sequence(family, period_key):
-    with transaction.atomic():
-        sequence, created = DocumentSequence.objects.select_for_update().get_or_create(
-            family=family,
-            period_key=period_key,
-            defaults={'current_value': 0},
-        )
-        sequence.current_value += 1
-        sequence.save(update_fields=['current_value', 'updated_at'])
-        return sequence.current_value
+    """
+    Returns the next number of a family/period from its own PostgreSQL sequence.
+    nextval never blocks concurrent callers and is not rolled back, so numbers taken
+    by transactions that fail later are skipped.
+    """
+    name = _document_sequence_name(family, period_key)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(to_regclass(%s))", [name])
+        value = cursor.fetchone()[0]
+    if value is None:
+        value = _provisioned_document_sequence_value(family, period_key, name)
+    return value
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -107,16 +155,1411 @@ class Stock(models.Model):
     warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
     carton_quantity = models.IntegerField(default=0)
     pack_quantity = models.IntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['product', 'warehouse']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(carton_quantity__gte=0),
+                name='stock_carton_quantity_non_negative',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(pack_quantity__gte=0),
+                name='stock_pack_quantity_non_negative',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.name} at {self.warehouse.name}"
 
 
+TRANSACTION_RETRY_ATTEMPTS = 4
+TRANSACTION_RETRY_BASE_DELAY = 0.05
+TRANSACTION_RETRY_MAX_DELAY = 0.5
+TRANSACTION_CONFLICT_PGCODES = ('40001', '40P01')  # serialization_failure, deadlock_detected
+
+
+def _run_with_transaction_retry(func, on_retry=None):
+    """
+    Runs `func` in a transaction and reruns it with jittered exponential backoff when
+    PostgreSQL aborts it with a serialization failure or deadlock. Only the outermost
+    transaction can be retried, so inside an atomic block `func` simply runs once.
+    `on_retry` is called before every rerun, e.g. to reload instances mutated by `func`.
+    """
+    if connection.in_atomic_block:
+        return func()
+
+    for attempt in range(1, TRANSACTION_RETRY_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except DatabaseError as exc:
+            pgcode = getattr(exc.__cause__, 'pgcode', None)
+            if pgcode not in TRANSACTION_CONFLICT_PGCODES or attempt == TRANSACTION_RETRY_ATTEMPTS:
+                raise
+
+        delay = min(TRANSACTION_RETRY_BASE_DELAY * 2 ** (attempt - 1), TRANSACTION_RETRY_MAX_DELAY)
+        time.sleep(delay * random.uniform(0.5, 1.0))
+        if on_retry is not None:
+            on_retry()
+
+
+def _transaction_retry(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return _run_with_transaction_retry(lambda: method(*args, **kwargs))
+    return wrapper
+
+
+def _merge_stock_delta(deltas, product_id, warehouse_id, carton_quantity, pack_quantity):
+    key = (product_id, warehouse_id)
+    if key not in deltas:
+        deltas[key] = {'carton_quantity': 0, 'pack_quantity': 0}
+
+    deltas[key]['carton_quantity'] += carton_quantity
+    deltas[key]['pack_quantity'] += pack_quantity
+
+
+class InsufficientStockError(Exception):
+    """
+    Raised when stock deltas would take a Stock row below zero or have no Stock row.
+    `messages` holds one human readable message per affected product/warehouse.
+    """
+    def __init__(self, messages):
+        self.messages = messages
+        super().__init__(' '.join(messages))
+
+
+def _stock_shortfall_messages(deltas, stock_keys):
+    stock_keys = sorted(stock_keys)
+    stock_filter = models.Q()
+    for product_id, warehouse_id in stock_keys:
+        stock_filter |= models.Q(product_id=product_id, warehouse_id=warehouse_id)
+    stocks = {
+        (stock.product_id, stock.warehouse_id): stock
+        for stock in Stock.objects.filter(stock_filter).select_related('product', 'warehouse')
+    }
+    products = Product.objects.in_bulk({product_id for product_id, warehouse_id in stock_keys})
+    warehouses = Warehouse.objects.in_bulk({warehouse_id for product_id, warehouse_id in stock_keys})
+
+    messages = []
+    for stock_key in stock_keys:
+        product = products.get(stock_key[0])
+        warehouse = warehouses.get(stock_key[1])
+        product_name = product.name if product else f'product {stock_key[0]}'
+        warehouse_name = warehouse.name if warehouse else f'warehouse {stock_key[1]}'
+        stock = stocks.get(stock_key)
+        delta = deltas[stock_key]
+        if stock is None:
+            messages.append(f"Stock record for {product_name} at {warehouse_name} not found.")
+        elif stock.carton_quantity + delta['carton_quantity'] < 0:
+            messages.append(f"Insufficient carton stock for {product_name} at {warehouse_name}.")
+        else:
+            messages.append(f"Insufficient pack stock for {product_name} at {warehouse_name}.")
+    return messages
+
+
+def _apply_stock_deltas(deltas):
+    """
+    Applies a {(product_id, warehouse_id): {'carton_quantity', 'pack_quantity'}} map
+    to Stock in a single statement and returns the resulting quantities, keyed the same
+    way. The affected rows are locked in (product_id, warehouse_id) order and a row is
+    only updated if it stays non-negative; otherwise InsufficientStockError is raised
+    and the caller's transaction must be rolled back.
+    """
+    rows = [
+        (product_id, warehouse_id, delta['carton_quantity'], delta['pack_quantity'])
+        for (product_id, warehouse_id), delta in sorted(deltas.items())
+        if delta['carton_quantity'] or delta['pack_quantity']
+    ]
+    if not rows:
+        return {}
+
+    values_sql = ', '.join(['(%s::bigint, %s::bigint, %s::integer, %s::integer)'] * len(rows))
+    params = []
+    for row in rows:
+        params.extend(row)
+    params.append(timezone.now())
+
+    table = Stock._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH delta (product_id, warehouse_id, carton_quantity, pack_quantity) AS (
+                VALUES {values_sql}
+            ),
+            locked AS (
+                SELECT stock.id
+                FROM {table} AS stock
+                JOIN delta ON stock.product_id = delta.product_id AND stock.warehouse_id = delta.warehouse_id
+                ORDER BY stock.product_id, stock.warehouse_id
+                FOR UPDATE OF stock
+            )
+            UPDATE {table} AS stock
+            SET carton_quantity = stock.carton_quantity + delta.carton_quantity,
+                pack_quantity = stock.pack_quantity + delta.pack_quantity,
+                version = stock.version + 1,
+                updated_at = %s
+            FROM delta, locked
+            WHERE stock.id = locked.id
+              AND stock.product_id = delta.product_id
+              AND stock.warehouse_id = delta.warehouse_id
+              AND stock.carton_quantity + delta.carton_quantity >= 0
+              AND stock.pack_quantity + delta.pack_quantity >= 0
+            RETURNING stock.product_id, stock.warehouse_id, stock.carton_quantity, stock.pack_quantity
+            """,
+            params,
+        )
+        applied = {
+            (product_id, warehouse_id): {
+                'carton_quantity': carton_quantity,
+                'pack_quantity': pack_quantity,
+            }
+            for product_id, warehouse_id, carton_quantity, pack_quantity in cursor.fetchall()
+        }
+
+    if len(applied) < len(rows):
+        short_keys = [(row[0], row[1]) for row in rows if (row[0], row[1]) not in applied]
+        raise InsufficientStockError(_stock_shortfall_messages(deltas, short_keys))
+    return applied
+
+
+def _apply_versioned_stock_deltas(deltas, versions):
+    """
+    Optimistic counterpart of _apply_stock_deltas. Each delta is applied only if its stock
+    row still has the version in `versions` and stays non-negative. Returns the part of
+    `deltas` that was not applied.
+    """
+    rows = [
+        (product_id, warehouse_id, delta['carton_quantity'], delta['pack_quantity'], versions[(product_id, warehouse_id)])
+        for (product_id, warehouse_id), delta in sorted(deltas.items())
+        if (product_id, warehouse_id) in versions
+    ]
+    if not rows:
+        return dict(deltas)
+
+    values_sql = ', '.join(['(%s::bigint, %s::bigint, %s::integer, %s::integer, %s::bigint)'] * len(rows))
+    params = [timezone.now()]
+    for row in rows:
+        params.extend(row)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Stock._meta.db_table} AS stock
+            SET carton_quantity = stock.carton_quantity + delta.carton_quantity,
+                pack_quantity = stock.pack_quantity + delta.pack_quantity,
+                version = stock.version + 1,
+                updated_at = %s
+            FROM (VALUES {values_sql}) AS delta (product_id, warehouse_id, carton_quantity, pack_quantity, version)
+            WHERE stock.product_id = delta.product_id
+              AND stock.warehouse_id = delta.warehouse_id
+              AND stock.version = delta.version
+              AND stock.carton_quantity + delta.carton_quantity >= 0
+              AND stock.pack_quantity + delta.pack_quantity >= 0
+            RETURNING stock.product_id, stock.warehouse_id
+            """,
+            params,
+        )
+        applied = set(cursor.fetchall())
+
+    return {
+        stock_key: delta
+        for stock_key, delta in deltas.items()
+        if stock_key not in applied
+    }
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of signed stock changes, one row per product/warehouse/document line.
+    Edits and deletions never touch existing rows: they append reversal rows that point at
+    the row they cancel and carry its transaction_date, so sums over any date range stay exact.
+    """
+    MOVEMENT_TYPE_CHOICES = [
+        ('OPENING', 'Opening Balance'),
+        ('SPG', 'SPG'),
+        ('SJ', 'SJ'),
+        ('STB', 'STB'),
+        ('SPB', 'SPB'),
+        ('RETUR_PEMBELIAN', 'Retur Pembelian'),
+        ('RETUR_PENJUALAN', 'Retur Penjualan'),
+        ('TRANSFER_OUT', 'Transfer Out'),
+        ('TRANSFER_IN', 'Transfer In'),
+        ('ADJUSTMENT', 'Adjustment'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT)
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
+    source_type = models.CharField(max_length=30)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True)
+    document_number = models.CharField(max_length=100, blank=True)
+    carton_quantity = models.IntegerField(default=0)
+    pack_quantity = models.IntegerField(default=0)
+    transaction_date = models.DateTimeField()
+    reversal_of = models.OneToOneField(
+        'self',
+        related_name='reversal',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'warehouse', 'transaction_date'], name='stock_movement_card_idx'),
+            models.Index(fields=['warehouse', 'transaction_date'], name='stock_movement_wh_date_idx'),
+            models.Index(fields=['source_type', 'source_id'], name='stock_movement_source_idx'),
+        ]
+
+
+def _merge_stock_effects(deltas, effects):
+    for movement_type, product_id, warehouse_id, carton_quantity, pack_quantity in effects:
+        _merge_stock_delta(deltas, product_id, warehouse_id, carton_quantity, pack_quantity)
+    return deltas
+
+
+def _document_item_lines(document):
+    return list(document.items.values_list('product_id', 'carton_quantity', 'pack_quantity'))
+
+
+class StockCheckpoint(models.Model):
+    """
+    Ledger balance of a product in a warehouse over every movement dated before `as_of`.
+    Checkpoints are written for the whole catalog at once by the create_stock_checkpoint
+    command and are shifted in place whenever a backdated movement is recorded.
+    """
+    as_of = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    carton_quantity = models.IntegerField(default=0)
+    pack_quantity = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['as_of', 'warehouse', 'product'],
+                name='unique_stock_checkpoint_as_of_warehouse_product',
+            )
+        ]
+
+
+def _shift_stock_checkpoints(movements):
+    """
+    Adds backdated `movements` to every checkpoint taken after their transaction_date,
+    so checkpoints stay equal to the ledger they summarise.
+    """
+    movements = [
+        movement for movement in movements
+        if movement.carton_quantity or movement.pack_quantity
+    ]
+    if not movements:
+        return
+
+    latest_as_of = StockCheckpoint.objects.aggregate(latest=models.Max('as_of'))['latest']
+    movements = [movement for movement in movements if movement.transaction_date < latest_as_of] if latest_as_of else []
+    if not movements:
+        return
+
+    values_sql = ', '.join(['(%s::bigint, %s::bigint, %s::integer, %s::integer, %s::timestamptz)'] * len(movements))
+    params = [timezone.now()]
+    for movement in movements:
+        params.extend([
+            movement.product_id,
+            movement.warehouse_id,
+            movement.carton_quantity,
+            movement.pack_quantity,
+            movement.transaction_date,
+        ])
+    params.append(min(movement.transaction_date for movement in movements))
+
+    table = StockCheckpoint._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (as_of, product_id, warehouse_id, carton_quantity, pack_quantity, created_at)
+            SELECT checkpoint.as_of, movement.product_id, movement.warehouse_id,
+                   SUM(movement.carton_quantity), SUM(movement.pack_quantity), %s
+            FROM (VALUES {values_sql}) AS movement (product_id, warehouse_id, carton_quantity, pack_quantity, transaction_date)
+            JOIN (SELECT DISTINCT as_of FROM {table} WHERE as_of > %s) AS checkpoint
+              ON checkpoint.as_of > movement.transaction_date
+            GROUP BY checkpoint.as_of, movement.product_id, movement.warehouse_id
+            ORDER BY checkpoint.as_of, movement.warehouse_id, movement.product_id
+            ON CONFLICT (as_of, warehouse_id, product_id) DO UPDATE
+            SET carton_quantity = {table}.carton_quantity + EXCLUDED.carton_quantity,
+                pack_quantity = {table}.pack_quantity + EXCLUDED.pack_quantity
+            """,
+            params,
+        )
+
+
+def _lock_stock_movements():
+    """
+    Waits for every ledger write in flight to commit and blocks new ones until the
+    current transaction ends.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {StockMovement._meta.db_table} IN SHARE MODE")
+
+
+def _movement_high_water_mark():
+    """
+    Returns the highest StockMovement id once the ledger writes in flight have committed.
+    The lock is released straight away: every movement with a larger id is recorded
+    after this call, and every one up to it is committed.
+    """
+    with transaction.atomic():
+        _lock_stock_movements()
+        return StockMovement.objects.aggregate(high_water_mark=models.Max('id'))['high_water_mark'] or 0
+
+
+def _create_stock_checkpoint(as_of):
+    """
+    Writes the checkpoint at `as_of` from the previous checkpoint plus the ledger rows in
+    between and returns the number of balances written. The balances are summed without
+    blocking ledger writes, up to a committed movement id; the movements recorded while
+    they were summed are added under a brief lock, just before the checkpoint becomes
+    visible to _shift_stock_checkpoints, so no backdated movement can be missed.
+    """
+    high_water_mark = _movement_high_water_mark()
+    movement_table = StockMovement._meta.db_table
+    table = StockCheckpoint._meta.db_table
+
+    with transaction.atomic():
+        if StockCheckpoint.objects.filter(as_of=as_of).exists():
+            return 0
+
+        previous_as_of = StockCheckpoint.objects.filter(as_of__lt=as_of).aggregate(
+            previous=models.Max('as_of')
+        )['previous']
+
+        if previous_as_of is None:
+            sources_sql = f"""
+                SELECT product_id, warehouse_id, carton_quantity, pack_quantity
+                FROM {movement_table}
+                WHERE transaction_date < %s AND id <= %s
+            """
+            params = [as_of, high_water_mark]
+        else:
+            # The previous checkpoint already holds the backdated movements committed past
+            # the high-water mark; they are taken back out so the sum stops at the mark.
+            sources_sql = f"""
+                SELECT product_id, warehouse_id, carton_quantity, pack_quantity
+                FROM {table}
+                WHERE as_of = %s
+                UNION ALL
+                SELECT product_id, warehouse_id, -carton_quantity, -pack_quantity
+                FROM {movement_table}
+                WHERE transaction_date < %s AND id > %s
+                UNION ALL
+                SELECT product_id, warehouse_id, carton_quantity, pack_quantity
+                FROM {movement_table}
+                WHERE transaction_date >= %s AND transaction_date < %s AND id <= %s
+            """
+            params = [previous_as_of, previous_as_of, high_water_mark, previous_as_of, as_of, high_water_mark]
+
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS stock_checkpoint_build")
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE stock_checkpoint_build ON COMMIT DROP AS
+                SELECT balance.product_id, balance.warehouse_id,
+                       SUM(balance.carton_quantity) AS carton_quantity, SUM(balance.pack_quantity) AS pack_quantity
+                FROM ({sources_sql}) AS balance
+                GROUP BY balance.product_id, balance.warehouse_id
+                """,
+                params,
+            )
+
+        _lock_stock_movements()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (as_of, product_id, warehouse_id, carton_quantity, pack_quantity, created_at)
+                SELECT %s, balance.product_id, balance.warehouse_id,
+                       SUM(balance.carton_quantity), SUM(balance.pack_quantity), %s
+                FROM (
+                    SELECT product_id, warehouse_id, carton_quantity, pack_quantity
+                    FROM stock_checkpoint_build
+                    UNION ALL
+                    SELECT product_id, warehouse_id, carton_quantity, pack_quantity
+                    FROM {movement_table}
+                    WHERE transaction_date < %s AND id > %s
+                ) AS balance
+                GROUP BY balance.product_id, balance.warehouse_id
+                HAVING SUM(balance.carton_quantity) <> 0 OR SUM(balance.pack_quantity) <> 0
+                """,
+                [as_of, timezone.now(), as_of, high_water_mark],
+            )
+            return cursor.rowcount
+
+
+def _stock_balances_as_of(cutoff, warehouse_id=None):
+    """
+    Returns {(product_id, warehouse_id): {'carton_quantity', 'pack_quantity'}} over every
+    movement dated before `cutoff`, starting from the nearest checkpoint at or before it.
+    """
+    checkpoint_as_of = StockCheckpoint.objects.filter(as_of__lte=cutoff).aggregate(
+        latest=models.Max('as_of')
+    )['latest']
+
+    movements = StockMovement.objects.filter(transaction_date__lt=cutoff)
+    if warehouse_id is not None:
+        movements = movements.filter(warehouse_id=warehouse_id)
+
+    balances = {}
+    if checkpoint_as_of is not None:
+        checkpoints = StockCheckpoint.objects.filter(as_of=checkpoint_as_of)
+        if warehouse_id is not None:
+            checkpoints = checkpoints.filter(warehouse_id=warehouse_id)
+        for product_id, row_warehouse_id, carton_quantity, pack_quantity in checkpoints.values_list(
+            'product_id', 'warehouse_id', 'carton_quantity', 'pack_quantity'
+        ):
+            _merge_stock_delta(balances, product_id, row_warehouse_id, carton_quantity, pack_quantity)
+        movements = movements.filter(transaction_date__gte=checkpoint_as_of)
+
+    rows = movements.values('product_id', 'warehouse_id').annotate(
+        carton_total=models.Sum('carton_quantity'),
+        pack_total=models.Sum('pack_quantity'),
+    ).values_list('product_id', 'warehouse_id', 'carton_total', 'pack_total')
+    for product_id, row_warehouse_id, carton_quantity, pack_quantity in rows:
+        _merge_stock_delta(balances, product_id, row_warehouse_id, carton_quantity, pack_quantity)
+
+    return balances
+
+
+def _stock_card(product_id, warehouse_id, start, end):
+    """
+    Returns the opening balance {'carton_quantity', 'pack_quantity'} of a product in a
+    warehouse at `start` and its live ledger rows dated in [start, end), oldest first,
+    each with the running balance after it. Edited and voided documents only show their
+    current rows: reversed rows and their reversals cancel out and are left out.
+    Computed in one statement, the running balance with a window over the rows.
+    """
+    table = StockMovement._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH live AS (
+                SELECT movement.id, movement.transaction_date, movement.movement_type, movement.source_type,
+                       movement.source_id, movement.document_number, movement.carton_quantity, movement.pack_quantity
+                FROM {table} AS movement
+                WHERE movement.product_id = %s
+                  AND movement.warehouse_id = %s
+                  AND movement.transaction_date < %s
+                  AND movement.reversal_of_id IS NULL
+                  AND NOT EXISTS (SELECT 1 FROM {table} AS reversal WHERE reversal.reversal_of_id = movement.id)
+            ),
+            opening AS (
+                SELECT COALESCE(SUM(carton_quantity), 0) AS carton_quantity,
+                       COALESCE(SUM(pack_quantity), 0) AS pack_quantity
+                FROM live
+                WHERE transaction_date < %s
+            )
+            SELECT opening.carton_quantity, opening.pack_quantity,
+                   card.transaction_date, card.movement_type, card.source_type, card.source_id,
+                   card.document_number, card.carton_quantity, card.pack_quantity,
+                   card.balance_carton_quantity, card.balance_pack_quantity
+            FROM opening
+            LEFT JOIN LATERAL (
+                SELECT live.*,
+                       opening.carton_quantity + SUM(live.carton_quantity) OVER running AS balance_carton_quantity,
+                       opening.pack_quantity + SUM(live.pack_quantity) OVER running AS balance_pack_quantity
+                FROM live
+                WHERE live.transaction_date >= %s
+                WINDOW running AS (ORDER BY live.transaction_date, live.id)
+            ) AS card ON TRUE
+            ORDER BY card.transaction_date, card.id
+            """,
+            [product_id, warehouse_id, end, start, start],
+        )
+        rows = cursor.fetchall()
+
+    opening = {'carton_quantity': rows[0][0], 'pack_quantity': rows[0][1]}
+    columns = [
+        'transaction_date', 'movement_type', 'source_type', 'source_id', 'document_number',
+        'carton_quantity', 'pack_quantity', 'balance_carton_quantity', 'balance_pack_quantity',
+    ]
+    movements = [dict(zip(columns, row[2:])) for row in rows if row[2] is not None]
+    return opening, movements
+
+
+# Aging buckets of the stock aging report: (key, most days since the last outbound
+# movement, or None for no upper bound).
+STOCK_AGING_BUCKETS = [
+    ('days_0_30', 30),
+    ('days_31_90', 90),
+    ('days_91_180', 180),
+    ('days_over_180', None),
+]
+
+
+def _stock_aging_bucket(days):
+    for key, most_days in STOCK_AGING_BUCKETS:
+        if most_days is None or days <= most_days:
+            return key
+
+
+def _stock_aging(as_of, warehouse_id=None, supplier_id=None, category_id=None):
+    """
+    Returns every on-hand stock record of a live product with the local date of its last
+    outbound movement (live SJ, SPB and RETUR_PEMBELIAN documents and transfers out of
+    the warehouse) and the days from then to `as_of`, counted from the creation of the
+    stock record when it never moved out. Oldest first within each warehouse. Computed
+    in one statement: the last outbound dates are aggregated per product and warehouse
+    over the document items and joined to the stock records.
+    """
+    time_zone = timezone.get_current_timezone_name()
+    document_warehouse = 'AND document.warehouse_id = %s' if warehouse_id is not None else ''
+    transfer_warehouse = 'AND document.source_warehouse_id = %s' if warehouse_id is not None else ''
+    stock_filters = []
+    stock_params = []
+    for column, value in (
+        ('stock.warehouse_id', warehouse_id),
+        ('product.supplier_id', supplier_id),
+        ('product.category_id', category_id),
+    ):
+        if value is not None:
+            stock_filters.append(f'AND {column} = %s')
+            stock_params.append(value)
+    outbound_params = [warehouse_id] * 3 if warehouse_id is not None else []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH outbound AS (
+                SELECT item.product_id, document.warehouse_id, MAX(document.transaction_date) AS moved_at
+                FROM {SJItems._meta.db_table} AS item
+                JOIN {SJ._meta.db_table} AS document ON document.id = item.sj_id
+                WHERE NOT document.is_deleted {document_warehouse}
+                GROUP BY 1, 2
+                UNION ALL
+                SELECT item.product_id, document.warehouse_id, MAX(document.transaction_date)
+                FROM {SuratLainItems._meta.db_table} AS item
+                JOIN {SuratLain._meta.db_table} AS document ON document.id = item.surat_lain_id
+                WHERE NOT document.is_deleted AND document.document_type IN ('SPB', 'RETUR_PEMBELIAN') {document_warehouse}
+                GROUP BY 1, 2
+                UNION ALL
+                SELECT item.product_id, document.source_warehouse_id, MAX(document.transaction_date)
+                FROM {SuratTransferStokItems._meta.db_table} AS item
+                JOIN {SuratTransferStok._meta.db_table} AS document ON document.id = item.surat_transfer_stok_id
+                WHERE NOT document.is_deleted {transfer_warehouse}
+                GROUP BY 1, 2
+            ),
+            last_outbound AS (
+                SELECT product_id, warehouse_id, MAX(moved_at) AS moved_at
+                FROM outbound
+                GROUP BY 1, 2
+            )
+            SELECT stock.product_id, product.code, product.name, category.name, supplier.name, product.packing,
+                   stock.warehouse_id, warehouse.name, stock.carton_quantity, stock.pack_quantity,
+                   (last_outbound.moved_at AT TIME ZONE %s)::date AS last_outbound_date,
+                   GREATEST(%s::date - (COALESCE(last_outbound.moved_at, stock.created_at) AT TIME ZONE %s)::date, 0) AS days
+            FROM {Stock._meta.db_table} AS stock
+            JOIN {Product._meta.db_table} AS product ON product.id = stock.product_id
+            JOIN {Category._meta.db_table} AS category ON category.id = product.category_id
+            JOIN {Supplier._meta.db_table} AS supplier ON supplier.id = product.supplier_id
+            JOIN {Warehouse._meta.db_table} AS warehouse ON warehouse.id = stock.warehouse_id
+            LEFT JOIN last_outbound
+                ON last_outbound.product_id = stock.product_id AND last_outbound.warehouse_id = stock.warehouse_id
+            WHERE NOT product.is_deleted
+              AND (stock.carton_quantity > 0 OR stock.pack_quantity > 0)
+              {' '.join(stock_filters)}
+            ORDER BY warehouse.name, stock.warehouse_id, days DESC, category.sort_order, LOWER(product.name), stock.id
+            """,
+            outbound_params + [time_zone, as_of, time_zone] + stock_params,
+        )
+        rows = cursor.fetchall()
+
+    columns = [
+        'product', 'product_code', 'product_name', 'product_category', 'supplier_name', 'packing',
+        'warehouse', 'warehouse_name', 'carton_quantity', 'pack_quantity',
+        'last_outbound_date', 'days_since_movement',
+    ]
+    records = [dict(zip(columns, row)) for row in rows]
+    for record in records:
+        record['bucket'] = _stock_aging_bucket(record['days_since_movement'])
+    return records
+
+
+class DailyStockBalance(models.Model):
+    """
+    Closing balance of a product in a warehouse at the end of `date` (local time).
+    Rows exist only for days on which the balance changed; the closing balance of
+    any other day is the latest row dated on or before it.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    carton_quantity = models.IntegerField(default=0)
+    pack_quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'warehouse', 'date'],
+                name='unique_daily_stock_balance_product_warehouse_date',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='daily_stock_balance_date_idx'),
+        ]
+
+
+class DailyStockRollup(models.Model):
+    """
+    Watermark of the daily_stock_rollup command. DailyStockBalance rows are final up to
+    `processed_through`, except from `dirty_from` onwards once a backdated movement lands.
+    """
+    processed_through = models.DateField(null=True, blank=True)
+    dirty_from = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DailyMovementTotal(models.Model):
+    """
+    Item quantities of the live SPG and SJ documents summed per local transaction day,
+    warehouse, product and (for SJ) customer, behind the stock in/out reports. Kept up
+    to date by the document writes, deletes and restores; `line_count` is the number of
+    item lines summed, and rows whose lines are all gone are removed.
+    """
+    SOURCE_TYPE_CHOICES = [
+        ('SPG', 'SPG'),
+        ('SJ', 'SJ'),
+    ]
+
+    source_type = models.CharField(max_length=10, choices=SOURCE_TYPE_CHOICES)
+    date = models.DateField()
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    customer = models.ForeignKey('Customer', on_delete=models.CASCADE, null=True, blank=True)
+    line_count = models.IntegerField(default=0)
+    carton_quantity = models.IntegerField(default=0)
+    pack_quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'source_type', 'date', 'warehouse', 'product', Coalesce('customer', 0),
+                name='unique_daily_movement_total',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['source_type', 'date'], name='daily_movement_type_date_idx'),
+        ]
+
+
+def _mark_daily_stock_dirty(movements):
+    if not movements:
+        return
+
+    day = min(timezone.localdate(movement.transaction_date) for movement in movements)
+    DailyStockRollup.objects.filter(
+        processed_through__gte=day,
+    ).filter(
+        models.Q(dirty_from__isnull=True) | models.Q(dirty_from__gt=day)
+    ).update(dirty_from=day)
+
+
+def _local_day_start(day):
+    return timezone.make_aware(
+        datetime.datetime.combine(day, datetime.time.min),
+        timezone.get_current_timezone(),
+    )
+
+
+# Key of the transaction-level advisory lock that keeps daily_stock_rollup runs apart.
+DAILY_STOCK_ROLLUP_LOCK_ID = 7_301_001
+
+
+def _roll_up_daily_stock(through):
+    """
+    Rebuilds DailyStockBalance for every day that is new or dirty up to `through` and
+    advances the watermark. Returns the first rebuilt day and the number of rows written.
+    The days are rebuilt from the movements up to a committed high-water mark without
+    blocking ledger writes; any day touched by a movement recorded meanwhile is left dirty.
+    """
+    high_water_mark = _movement_high_water_mark()
+    with transaction.atomic():
+        # Rollups are serialised with an advisory lock rather than the watermark row,
+        # which _mark_daily_stock_dirty updates from inside ledger writes.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [DAILY_STOCK_ROLLUP_LOCK_ID])
+
+        rollup = DailyStockRollup.objects.order_by('pk').first()
+        if rollup is None:
+            rollup = DailyStockRollup.objects.create()
+
+        if rollup.processed_through is None:
+            first_movement = StockMovement.objects.filter(
+                id__lte=high_water_mark,
+            ).order_by('transaction_date').values_list('transaction_date', flat=True).first()
+            if first_movement is None:
+                return None, 0
+            start = timezone.localdate(first_movement)
+        else:
+            start = rollup.processed_through + datetime.timedelta(days=1)
+        if rollup.dirty_from is not None:
+            start = min(start, rollup.dirty_from)
+        if start > through:
+            return None, 0
+
+        DailyStockBalance.objects.filter(date__gte=start, date__lte=through).delete()
+
+        balance_table = DailyStockBalance._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {balance_table} (date, product_id, warehouse_id, carton_quantity, pack_quantity)
+                SELECT day_total.day, day_total.product_id, day_total.warehouse_id,
+                       COALESCE(opening.carton_quantity, 0) + SUM(day_total.carton_quantity) OVER running,
+                       COALESCE(opening.pack_quantity, 0) + SUM(day_total.pack_quantity) OVER running
+                FROM (
+                    SELECT (transaction_date AT TIME ZONE %s)::date AS day, product_id, warehouse_id,
+                           SUM(carton_quantity) AS carton_quantity, SUM(pack_quantity) AS pack_quantity
+                    FROM {StockMovement._meta.db_table}
+                    WHERE transaction_date >= %s AND transaction_date < %s AND id <= %s
+                    GROUP BY 1, 2, 3
+                    HAVING SUM(carton_quantity) <> 0 OR SUM(pack_quantity) <> 0
+                ) AS day_total
+                LEFT JOIN LATERAL (
+                    SELECT carton_quantity, pack_quantity
+                    FROM {balance_table}
+                    WHERE product_id = day_total.product_id
+                      AND warehouse_id = day_total.warehouse_id
+                      AND date < %s
+                    ORDER BY date DESC
+                    LIMIT 1
+                ) AS opening ON TRUE
+                WINDOW running AS (PARTITION BY day_total.product_id, day_total.warehouse_id ORDER BY day_total.day)
+                """,
+                [
+                    timezone.get_current_timezone_name(),
+                    _local_day_start(start),
+                    _local_day_start(through + datetime.timedelta(days=1)),
+                    high_water_mark,
+                    start,
+                ],
+            )
+            written = cursor.rowcount
+
+        # Wait for the ledger writes still in flight; the movements recorded past the
+        # high-water mark keep the days they touch dirty. Only then is the watermark row
+        # locked, so no writer waiting on it can hold up the table lock.
+        _lock_stock_movements()
+        late_movement = StockMovement.objects.filter(
+            id__gt=high_water_mark,
+            transaction_date__lt=_local_day_start(through + datetime.timedelta(days=1)),
+        ).aggregate(first=models.Min('transaction_date'))['first']
+        rollup = DailyStockRollup.objects.select_for_update().get(pk=rollup.pk)
+
+        if rollup.processed_through is not None and through < rollup.processed_through:
+            rollup.dirty_from = through + datetime.timedelta(days=1)
+        else:
+            rollup.processed_through = through
+            rollup.dirty_from = None
+        if late_movement is not None:
+            late_day = timezone.localdate(late_movement)
+            rollup.dirty_from = min(rollup.dirty_from or late_day, late_day)
+        rollup.save()
+        return start, written
+
+
+def _daily_closing_balances(day, warehouse_id=None):
+    """
+    Returns {(product_id, warehouse_id): {'carton_quantity', 'pack_quantity'}} at the end
+    of `day`, read from the daily snapshots and topped up from the ledger for any days
+    the rollup has not (re)processed yet.
+    """
+    rollup = DailyStockRollup.objects.order_by('pk').first()
+    final_through = rollup.processed_through if rollup else None
+    if final_through is not None and rollup.dirty_from is not None:
+        final_through = min(final_through, rollup.dirty_from - datetime.timedelta(days=1))
+    if final_through is not None:
+        final_through = min(final_through, day)
+
+    balances = {}
+    movements = StockMovement.objects.filter(
+        transaction_date__lt=_local_day_start(day + datetime.timedelta(days=1))
+    )
+    if warehouse_id is not None:
+        movements = movements.filter(warehouse_id=warehouse_id)
+
+    if final_through is not None:
+        snapshots = DailyStockBalance.objects.filter(date__lte=final_through)
+        if warehouse_id is not None:
+            snapshots = snapshots.filter(warehouse_id=warehouse_id)
+        rows = snapshots.order_by('product_id', 'warehouse_id', '-date').distinct(
+            'product_id', 'warehouse_id'
+        ).values_list('product_id', 'warehouse_id', 'carton_quantity', 'pack_quantity')
+        for product_id, row_warehouse_id, carton_quantity, pack_quantity in rows:
+            _merge_stock_delta(balances, product_id, row_warehouse_id, carton_quantity, pack_quantity)
+        movements = movements.filter(
+            transaction_date__gte=_local_day_start(final_through + datetime.timedelta(days=1))
+        )
+
+    rows = movements.values('product_id', 'warehouse_id').annotate(
+        carton_total=models.Sum('carton_quantity'),
+        pack_total=models.Sum('pack_quantity'),
+    ).values_list('product_id', 'warehouse_id', 'carton_total', 'pack_total')
+    for product_id, row_warehouse_id, carton_quantity, pack_quantity in rows:
+        _merge_stock_delta(balances, product_id, row_warehouse_id, carton_quantity, pack_quantity)
+
+    return balances
+
+
+def _document_movement_totals(model, document_ids, sign=1, deltas=None):
+    """
+    Merges the item quantities of the `model` (SPG or SJ) documents in `document_ids`,
+    times `sign`, into a {(source_type, date, warehouse_id, product_id, customer_id):
+    [line_count, carton_quantity, pack_quantity]} map, which is returned.
+    """
+    if deltas is None:
+        deltas = {}
+    items_relation = model._meta.get_field('items')
+    parent = items_relation.field.name
+    customer_field = f'{parent}__customer_id' if model is SJ else None
+
+    rows = items_relation.related_model.objects.filter(
+        **{f'{parent}_id__in': document_ids}
+    ).annotate(
+        day=TruncDate(f'{parent}__transaction_date'),
+    ).values(
+        'day', f'{parent}__warehouse_id', 'product_id', *filter(None, [customer_field])
+    ).annotate(
+        lines=models.Count('id'),
+        carton_total=models.Sum('carton_quantity'),
+        pack_total=models.Sum('pack_quantity'),
+    )
+    for row in rows:
+        key = (
+            model.STOCK_SOURCE_TYPE,
+            row['day'],
+            row[f'{parent}__warehouse_id'],
+            row['product_id'],
+            row[customer_field] if customer_field else None,
+        )
+        total = deltas.setdefault(key, [0, 0, 0])
+        total[0] += sign * row['lines']
+        total[1] += sign * row['carton_total']
+        total[2] += sign * row['pack_total']
+    return deltas
+
+
+def _apply_daily_movement_totals(deltas):
+    """
+    Adds `deltas` (see _document_movement_totals) to DailyMovementTotal with one upsert,
+    in key order, and removes the rows left without item lines.
+    """
+    keys = sorted(
+        (key for key, total in deltas.items() if any(total)),
+        key=lambda key: (key[0], key[1], key[2], key[3], key[4] or 0),
+    )
+    if not keys:
+        return
+
+    table = DailyMovementTotal._meta.db_table
+    values_sql = ', '.join(['(%s, %s::date, %s::bigint, %s::bigint, %s::bigint, %s, %s, %s)'] * len(keys))
+    params = [value for key in keys for value in (*key, *deltas[key])]
+    key_sql = ', '.join(['(%s, %s::date, %s::bigint, %s::bigint)'] * len(keys))
+    key_params = [value for key in keys for value in key[:4]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} AS total
+                (source_type, date, warehouse_id, product_id, customer_id, line_count, carton_quantity, pack_quantity)
+            VALUES {values_sql}
+            ON CONFLICT (source_type, date, warehouse_id, product_id, (COALESCE(customer_id, 0))) DO UPDATE
+            SET line_count = total.line_count + EXCLUDED.line_count,
+                carton_quantity = total.carton_quantity + EXCLUDED.carton_quantity,
+                pack_quantity = total.pack_quantity + EXCLUDED.pack_quantity
+            """,
+            params,
+        )
+        cursor.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE line_count = 0
+              AND (source_type, date, warehouse_id, product_id) IN (VALUES {key_sql})
+            """,
+            key_params,
+        )
+
+
+def _shift_daily_movement_totals(model, document_ids, sign=1):
+    _apply_daily_movement_totals(_document_movement_totals(model, document_ids, sign))
+
+
+def _rebuild_daily_movement_totals():
+    """
+    Recomputes DailyMovementTotal from the items of every live SPG and SJ. Returns the
+    number of rows written.
+    """
+    table = DailyMovementTotal._meta.db_table
+    time_zone = timezone.get_current_timezone_name()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (source_type, date, warehouse_id, product_id, customer_id, line_count, carton_quantity, pack_quantity)
+                SELECT %s, (spg.transaction_date AT TIME ZONE %s)::date, spg.warehouse_id, item.product_id, NULL,
+                       COUNT(*), SUM(item.carton_quantity), SUM(item.pack_quantity)
+                FROM {SPGItems._meta.db_table} AS item
+                JOIN {SPG._meta.db_table} AS spg ON spg.id = item.spg_id
+                WHERE NOT spg.is_deleted
+                GROUP BY 2, 3, 4
+                UNION ALL
+                SELECT %s, (sj.transaction_date AT TIME ZONE %s)::date, sj.warehouse_id, item.product_id, sj.customer_id,
+                       COUNT(*), SUM(item.carton_quantity), SUM(item.pack_quantity)
+                FROM {SJItems._meta.db_table} AS item
+                JOIN {SJ._meta.db_table} AS sj ON sj.id = item.sj_id
+                WHERE NOT sj.is_deleted
+                GROUP BY 2, 3, 4, 5
+                """,
+                [SPG.STOCK_SOURCE_TYPE, time_zone, SJ.STOCK_SOURCE_TYPE, time_zone],
+            )
+            written = cursor.rowcount
+        _bump_table_generations(SPG, SJ)
+        return written
+
+
+def _save_stock_movements(movements):
+    StockMovement.objects.bulk_create(movements)
+    _shift_stock_checkpoints(movements)
+    _mark_daily_stock_dirty(movements)
+
+
+def _document_movements(document, effects):
+    return [
+        StockMovement(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            movement_type=movement_type,
+            source_type=document.STOCK_SOURCE_TYPE,
+            source_id=document.pk,
+            document_number=document.document_number,
+            carton_quantity=carton_quantity,
+            pack_quantity=pack_quantity,
+            transaction_date=document.transaction_date,
+        )
+        for movement_type, product_id, warehouse_id, carton_quantity, pack_quantity in effects
+        if carton_quantity or pack_quantity
+    ]
+
+
+def _post_document_stock(document, lines, deltas=None):
+    """
+    Records the stock effects of (product_id, carton, pack) item lines of `document`
+    in the movement ledger and merges them into `deltas`, which is returned.
+    """
+    if deltas is None:
+        deltas = {}
+    effects = document.stock_effects(lines)
+    _save_stock_movements(_document_movements(document, effects))
+    return _merge_stock_effects(deltas, effects)
+
+
+def _post_documents_stock(documents, deltas=None):
+    """
+    Same as _post_document_stock for the current items of several documents of one
+    model, reading all items with one query and writing the ledger with one insert.
+    """
+    if deltas is None:
+        deltas = {}
+    if not documents:
+        return deltas
+
+    parent_field = type(documents[0]).items.field
+    lines_by_document = {document.pk: [] for document in documents}
+    for document_id, product_id, carton_quantity, pack_quantity in parent_field.model.objects.filter(
+        **{f'{parent_field.attname}__in': list(lines_by_document)}
+    ).order_by('id').values_list(parent_field.attname, 'product_id', 'carton_quantity', 'pack_quantity'):
+        lines_by_document[document_id].append((product_id, carton_quantity, pack_quantity))
+
+    movements = []
+    for document in documents:
+        effects = document.stock_effects(lines_by_document[document.pk])
+        movements.extend(_document_movements(document, effects))
+        _merge_stock_effects(deltas, effects)
+    _save_stock_movements(movements)
+    return deltas
+
+
+def _revert_documents_stock(source_type, source_ids, deltas=None):
+    """
+    Appends reversal rows for every live ledger row of the given documents and merges
+    the reversed quantities into `deltas`, which is returned.
+    """
+    if deltas is None:
+        deltas = {}
+    reversals = [
+        StockMovement(
+            product_id=movement.product_id,
+            warehouse_id=movement.warehouse_id,
+            movement_type=movement.movement_type,
+            source_type=movement.source_type,
+            source_id=movement.source_id,
+            document_number=movement.document_number,
+            carton_quantity=-movement.carton_quantity,
+            pack_quantity=-movement.pack_quantity,
+            transaction_date=movement.transaction_date,
+            reversal_of=movement,
+        )
+        for movement in StockMovement.objects.filter(
+            source_type=source_type,
+            source_id__in=source_ids,
+            reversal_of__isnull=True,
+            reversal__isnull=True,
+        ).order_by('id')
+    ]
+    _save_stock_movements(reversals)
+    for movement in reversals:
+        _merge_stock_delta(
+            deltas,
+            movement.product_id,
+            movement.warehouse_id,
+            movement.carton_quantity,
+            movement.pack_quantity,
+        )
+    return deltas
+
+
+def _revert_document_stock(document, deltas=None):
+    return _revert_documents_stock(document.STOCK_SOURCE_TYPE, [document.pk], deltas)
+
+
+class CacheGeneration(models.Model):
+    """
+    Generation token of a table (or of all tracked tables), moved on after every write
+    to it. Cache keys embed the tokens, so cached entries go stale the moment their data
+    changes in any worker process, whichever cache backend holds the entries.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    generation = models.BigIntegerField()
+
+
+GENERATION_CACHE_KEY_PREFIX = 'inventory:generation'
+ALL_TABLES_GENERATION_KEY = f'{GENERATION_CACHE_KEY_PREFIX}:*'
+
+
+def _report_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def _generation_key(model):
+    return f'{GENERATION_CACHE_KEY_PREFIX}:{model._meta.db_table}'
+
+
+def _generations(keys):
+    generations = dict(CacheGeneration.objects.filter(key__in=keys).values_list('key', 'generation'))
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        # Seeded from the clock rather than 0, so a recreated table cannot hand out a
+        # generation that entries still held by a shared cache were keyed by.
+        CacheGeneration.objects.bulk_create(
+            [CacheGeneration(key=key, generation=time.time_ns()) for key in missing],
+            ignore_conflicts=True,
+        )
+        generations.update(CacheGeneration.objects.filter(key__in=missing).values_list('key', 'generation'))
+    return tuple(generations.get(key) for key in keys)
+
+
+def _table_generations(models_):
+    """
+    Returns the current generation of the table of each model in `models_`: tokens that
+    change whenever the table is written, so cache entries derived from the tables can
+    be keyed by them. They live in the CacheGeneration table, shared by every worker.
+    """
+    return _generations([_generation_key(model) for model in models_])
+
+
+def _data_generation():
+    """
+    Returns a generation that changes whenever any tracked table is written.
+    """
+    return _generations([ALL_TABLES_GENERATION_KEY])[0]
+
+
+def _bump_generations(keys):
+    table = CacheGeneration._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (key, generation)
+            SELECT key, %s FROM UNNEST(%s::varchar[]) AS key
+            ON CONFLICT (key) DO UPDATE SET generation = {table}.generation + 1
+            """,
+            [time.time_ns(), sorted(keys)],
+        )
+
+
+def _bump_table_generations(*models_):
+    # Takes effect once the surrounding transaction commits, in a statement of its own,
+    # so writers never hold the generation rows for the length of their transaction.
+    keys = {_generation_key(model) for model in models_} | {ALL_TABLES_GENERATION_KEY}
+    transaction.on_commit(lambda: _bump_generations(keys))
+
+
+def _bump_document_generations(model):
+    """
+    Moves on the generations of the tables a write of a `model` document changes: its
+    own, the stock and ledger for documents that move stock, and the SPKs an SJ ships.
+    """
+    tables = [model]
+    if hasattr(model, 'STOCK_SOURCE_TYPE'):
+        tables += [Stock, StockMovement]
+    if model is SJ:
+        tables.append(SPK)
+    _bump_table_generations(*tables)
+
+
+@_transaction_retry
+def _set_documents_deleted(model, ids, deleted):
+    """
+    Voids (deleted=True) or restores the `model` documents in `ids` that are not already
+    in that state, in one transaction: the documents are locked in id order, their ledger
+    rows are reversed or reposted with one insert and every stock delta is applied in a
+    single statement. For SJs the fulfilled counters of their SPK lines are shifted too.
+    Returns the affected documents.
+    """
+    with transaction.atomic():
+        documents = list(
+            model.objects.select_for_update().filter(
+                pk__in=ids,
+                is_deleted=not deleted,
+            ).order_by('pk')
+        )
+        if not documents:
+            return []
+
+        document_ids = [document.pk for document in documents]
+        if deleted:
+            deltas = _revert_documents_stock(model.STOCK_SOURCE_TYPE, document_ids)
+        else:
+            deltas = _post_documents_stock(documents)
+        _apply_stock_deltas(deltas)
+        if model is SJ:
+            _shift_spk_fulfillment(_sj_fulfillment_deltas(document_ids, -1 if deleted else 1))
+        if model in (SPG, SJ):
+            _shift_daily_movement_totals(model, document_ids, -1 if deleted else 1)
+
+        now = timezone.now()
+        model.objects.filter(pk__in=document_ids).update(
+            is_deleted=deleted,
+            deleted_at=now if deleted else None,
+            updated_at=now,
+        )
+        for document in documents:
+            document.is_deleted = deleted
+            document.deleted_at = now if deleted else None
+        _bump_document_generations(model)
+        return documents
+
+
+def _set_document_deleted(document, deleted):
+    """
+    Voids or restores one document through _set_documents_deleted, which skips it when
+    it already is in that state, so a repeated or concurrent soft_delete/restore never
+    reverts or posts its stock twice. `document` is refreshed from its row.
+    """
+    _set_documents_deleted(type(document), [document.pk], deleted)
+    document.refresh_from_db(fields=['is_deleted', 'deleted_at', 'updated_at'])
+
+
+def _lock_document_state(document):
+    """
+    Locks the row of a document being edited for the rest of the transaction and
+    refreshes its deleted state from it. Returns whether the document is deleted.
+    """
+    document.is_deleted, document.deleted_at = type(document).objects.select_for_update().values_list(
+        'is_deleted', 'deleted_at'
+    ).get(pk=document.pk)
+    return document.is_deleted
+
+
+def _merge_fulfillment_delta(deltas, spk_id, product_id, carton_quantity, pack_quantity):
+    key = (spk_id, product_id)
+    if key not in deltas:
+        deltas[key] = {'carton_quantity': 0, 'pack_quantity': 0}
+
+    deltas[key]['carton_quantity'] += carton_quantity
+    deltas[key]['pack_quantity'] += pack_quantity
+
+
+def _sj_fulfillment_deltas(sj_ids, sign=1, deltas=None):
+    """
+    Merges the item totals of the SJs in `sj_ids`, multiplied by `sign`, into a
+    {(spk_id, product_id): {'carton_quantity', 'pack_quantity'}} map, which is returned.
+    """
+    if deltas is None:
+        deltas = {}
+    rows = SJItems.objects.filter(sj_id__in=sj_ids).values('sj__spk_id', 'product_id').annotate(
+        carton_total=models.Sum('carton_quantity'),
+        pack_total=models.Sum('pack_quantity'),
+    ).values_list('sj__spk_id', 'product_id', 'carton_total', 'pack_total')
+    for spk_id, product_id, carton_quantity, pack_quantity in rows:
+        _merge_fulfillment_delta(deltas, spk_id, product_id, sign * carton_quantity, sign * pack_quantity)
+    return deltas
+
+
+def _lock_spks(cursor, spk_ids=None):
+    """
+    Locks the SPK rows of `spk_ids` (every SPK if None) in id order. Every writer of
+    the fulfilled counters takes these locks first, so the counters and the status
+    derived from them change one transaction at a time per SPK.
+    """
+    spk_filter, params = _spk_id_filter('spk.id', spk_ids)
+    cursor.execute(
+        f"SELECT spk.id FROM {SPK._meta.db_table} AS spk WHERE TRUE {spk_filter} ORDER BY spk.id FOR UPDATE",
+        params,
+    )
+
+
+def _spk_id_filter(column, spk_ids):
+    if spk_ids is None:
+        return '', []
+    return f'AND {column} = ANY(%s)', [list(spk_ids)]
+
+
+def _refresh_spk_status(cursor, spk_ids=None):
+    """
+    Derives SPK.status of `spk_ids` (every SPK if None) from the fulfilled counters
+    of their lines.
+    """
+    spk_filter, params = _spk_id_filter('item.spk_id', spk_ids)
+    cursor.execute(
+        f"""
+        WITH progress AS (
+            SELECT item.spk_id,
+                   BOOL_OR(item.fulfilled_carton_quantity > item.carton_quantity
+                           OR item.fulfilled_pack_quantity > item.pack_quantity) AS over_shipped,
+                   BOOL_OR(item.fulfilled_carton_quantity <> 0
+                           OR item.fulfilled_pack_quantity <> 0) AS shipped,
+                   BOOL_AND(item.fulfilled_carton_quantity >= item.carton_quantity
+                            AND item.fulfilled_pack_quantity >= item.pack_quantity) AS complete
+            FROM {SPKItems._meta.db_table} AS item
+            WHERE TRUE {spk_filter}
+            GROUP BY item.spk_id
+        ),
+        expected AS (
+            SELECT spk_id,
+                   CASE
+                       WHEN over_shipped THEN %s
+                       WHEN NOT shipped THEN %s
+                       WHEN complete THEN %s
+                       ELSE %s
+                   END AS status
+            FROM progress
+        )
+        UPDATE {SPK._meta.db_table} AS spk
+        SET status = expected.status
+        FROM expected
+        WHERE spk.id = expected.spk_id
+          AND spk.status <> expected.status
+        """,
+        params + [SPK.STATUS_OVER_SHIPPED, SPK.STATUS_OPEN, SPK.STATUS_FULFILLED, SPK.STATUS_PARTIAL],
+    )
+
+
+def _shift_spk_fulfillment(deltas):
+    """
+    Adds a {(spk_id, product_id): {'carton_quantity', 'pack_quantity'}} map to the
+    fulfilled counters of the matching SPKItems rows in a single statement and
+    updates the status of the affected SPKs.
+    """
+    rows = [
+        (spk_id, product_id, delta['carton_quantity'], delta['pack_quantity'])
+        for (spk_id, product_id), delta in sorted(deltas.items())
+        if delta['carton_quantity'] or delta['pack_quantity']
+    ]
+    if not rows:
+        return
+
+    values_sql = ', '.join(['(%s::bigint, %s::bigint, %s::integer, %s::integer)'] * len(rows))
+    params = []
+    for row in rows:
+        params.extend(row)
+
+    spk_ids = sorted({row[0] for row in rows})
+    table = SPKItems._meta.db_table
+    with connection.cursor() as cursor:
+        _lock_spks(cursor, spk_ids)
+        cursor.execute(
+            f"""
+            WITH delta (spk_id, product_id, carton_quantity, pack_quantity) AS (
+                VALUES {values_sql}
+            )
+            UPDATE {table} AS item
+            SET fulfilled_carton_quantity = item.fulfilled_carton_quantity + delta.carton_quantity,
+                fulfilled_pack_quantity = item.fulfilled_pack_quantity + delta.pack_quantity
+            FROM delta
+            WHERE item.spk_id = delta.spk_id
+              AND item.product_id = delta.product_id
+            """,
+            params,
+        )
+        _refresh_spk_status(cursor, spk_ids)
+
+
+def _refresh_spk_fulfillment(spk_ids=None):
+    """
+    Recomputes the fulfilled counters of the SPKItems of `spk_ids` (every SPK if None)
+    from the live SJ items, refreshes the SPK status and returns the number of lines
+    that were corrected.
+    """
+    if spk_ids is not None:
+        spk_ids = sorted(spk_ids)
+        if not spk_ids:
+            return 0
+
+    item_filter, item_params = _spk_id_filter('item.spk_id', spk_ids)
+    sj_filter, sj_params = _spk_id_filter('sj.spk_id', spk_ids)
+    item_table = SPKItems._meta.db_table
+    with connection.cursor() as cursor:
+        _lock_spks(cursor, spk_ids)
+        cursor.execute(
+            f"""
+            WITH fulfilled AS (
+                SELECT sj.spk_id, sj_item.product_id,
+                       SUM(sj_item.carton_quantity) AS carton_quantity,
+                       SUM(sj_item.pack_quantity) AS pack_quantity
+                FROM {SJItems._meta.db_table} AS sj_item
+                JOIN {SJ._meta.db_table} AS sj ON sj.id = sj_item.sj_id
+                WHERE NOT sj.is_deleted {sj_filter}
+                GROUP BY sj.spk_id, sj_item.product_id
+            ),
+            expected AS (
+                SELECT item.id,
+                       COALESCE(fulfilled.carton_quantity, 0) AS carton_quantity,
+                       COALESCE(fulfilled.pack_quantity, 0) AS pack_quantity
+                FROM {item_table} AS item
+                LEFT JOIN fulfilled ON fulfilled.spk_id = item.spk_id AND fulfilled.product_id = item.product_id
+                WHERE TRUE {item_filter}
+            )
+            UPDATE {item_table} AS item
+            SET fulfilled_carton_quantity = expected.carton_quantity,
+                fulfilled_pack_quantity = expected.pack_quantity
+            FROM expected
+            WHERE item.id = expected.id
+              AND (item.fulfilled_carton_quantity, item.fulfilled_pack_quantity)
+                  IS DISTINCT FROM (expected.carton_quantity, expected.pack_quantity)
+            """,
+            sj_params + item_params,
+        )
+        corrected = cursor.rowcount
+        _refresh_spk_status(cursor, spk_ids)
+    _bump_table_generations(SPK)
+    return corrected
+
 class Customer(models.Model):
     name = models.CharField(max_length=200)
     address = models.TextField()
@@ -167,40 +1610,33 @@ class SPG(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='inventory_spg_created_idx'),
+        ]
+
+    STOCK_SOURCE_TYPE = 'SPG'
+
+    def stock_effects(self, lines):
+        """
+        Returns the signed (movement_type, product_id, warehouse_id, carton, pack)
+        stock effects of the given (product_id, carton, pack) item lines.
+        """
+        return [
+            ('SPG', product_id, self.warehouse_id, carton_quantity, pack_quantity)
+            for product_id, carton_quantity, pack_quantity in lines
+        ]
 
     def soft_delete(self):
         """
         Marks the SPG as deleted and reverts the stock additions.
         """
-        with transaction.atomic():
-            for item in self.items.all():
-                Stock.objects.filter(
-                    product=item.product,
-                    warehouse=self.warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') - item.carton_quantity,
-                    pack_quantity=F('pack_quantity') - item.pack_quantity
-                )
-            self.is_deleted = True
-            self.deleted_at = timezone.now()
-            self.save()
+        _set_document_deleted(self, True)
 
     def restore(self):
         """
         Restores a soft-deleted SPG and re-applies the stock additions.
         """
-        with transaction.atomic():
-            for item in self.items.all():
-                Stock.objects.filter(
-                    product=item.product,
-                    warehouse=self.warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') + item.carton_quantity,
-                    pack_quantity=F('pack_quantity') + item.pack_quantity
-                )
-            self.is_deleted = False
-            self.deleted_at = None
-            self.save()
+        _set_document_deleted(self, False)
 
     def save(self, *args, **kwargs):
         if not self.document_number:
@@ -244,10 +1680,23 @@ class SPGItems(models.Model):
 
 
 class SPK(models.Model):
+    STATUS_OPEN = 'OPEN'
+    STATUS_PARTIAL = 'PARTIAL'
+    STATUS_FULFILLED = 'FULFILLED'
+    STATUS_OVER_SHIPPED = 'OVER_SHIPPED'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_PARTIAL, 'Partially Fulfilled'),
+        (STATUS_FULFILLED, 'Fulfilled'),
+        (STATUS_OVER_SHIPPED, 'Over-shipped'),
+    ]
+
     document_number = models.CharField(max_length=100)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
     user = models.ForeignKey('users.User', on_delete=models.PROTECT)
     notes = models.TextField(blank=True, null=True)
+    # Derived from the fulfilled counters of the items by _refresh_spk_status.
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN, editable=False)
     transaction_date = models.DateTimeField(default=timezone.now)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
@@ -256,6 +1705,10 @@ class SPK(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'customer'], name='inventory_spk_status_cust_idx'),
+            models.Index(fields=['created_at', 'id'], name='inventory_spk_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.document_number:
@@ -268,12 +1721,14 @@ class SPK(models.Model):
     def soft_delete(self):
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save()
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+        _bump_document_generations(type(self))
 
     def restore(self):
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
+        self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+        _bump_document_generations(type(self))
 
 
 class SPKItems(models.Model):
@@ -281,6 +1736,10 @@ class SPKItems(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     carton_quantity = models.IntegerField(default=0)
     pack_quantity = models.IntegerField(default=0)
+    # Totals of the live SJ lines shipped for this product against the SPK.
+    # Kept in step with SJ writes by _shift_spk_fulfillment.
+    fulfilled_carton_quantity = models.IntegerField(default=0, editable=False)
+    fulfilled_pack_quantity = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -322,6 +1781,9 @@ class SJ(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='inventory_sj_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """
@@ -349,33 +1811,25 @@ class SJ(models.Model):
 
         super().save(*args, **kwargs)
 
+    STOCK_SOURCE_TYPE = 'SJ'
+
+    def stock_effects(self, lines):
+        return [
+            ('SJ', product_id, self.warehouse_id, -carton_quantity, -pack_quantity)
+            for product_id, carton_quantity, pack_quantity in lines
+        ]
+
     def soft_delete(self):
         """
         Marks the SJ as deleted and ADDS the stock back to the warehouse.
         """
-        with transaction.atomic():
-            for item in self.items.all():
-                Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                    carton_quantity=F('carton_quantity') + item.carton_quantity,
-                    pack_quantity=F('pack_quantity') + item.pack_quantity
-                )
-            self.is_deleted = True
-            self.deleted_at = timezone.now()
-            self.save()
+        _set_document_deleted(self, True)
 
     def restore(self):
         """
         Restores a soft-deleted SJ and SUBTRACTS the stock from the warehouse again.
         """
-        with transaction.atomic():
-            for item in self.items.all():
-                Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                    carton_quantity=F('carton_quantity') - item.carton_quantity,
-                    pack_quantity=F('pack_quantity') - item.pack_quantity
-                )
-            self.is_deleted = False
-            self.deleted_at = None
-            self.save()
+        _set_document_deleted(self, False)
 
 
 class SJItems(models.Model):
@@ -415,6 +1869,9 @@ class SuratLain(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='inventory_sl_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.document_number:
@@ -432,42 +1889,21 @@ class SuratLain(models.Model):
 
         super().save(*args, **kwargs)
 
+    STOCK_SOURCE_TYPE = 'SURAT_LAIN'
+
+    def stock_effects(self, lines):
+        # Incoming types add stock, outgoing types subtract it.
+        sign = 1 if self.document_type in self.INCOMING_TYPES else -1
+        return [
+            (self.document_type, product_id, self.warehouse_id, sign * carton_quantity, sign * pack_quantity)
+            for product_id, carton_quantity, pack_quantity in lines
+        ]
+
     def soft_delete(self):
-        with transaction.atomic():
-            for item in self.items.all():
-                # If it was an incoming type, deleting it subtracts stock.
-                if self.document_type in self.INCOMING_TYPES:
-                    Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                        carton_quantity=F('carton_quantity') - item.carton_quantity,
-                        pack_quantity=F('pack_quantity') - item.pack_quantity
-                    )
-                # If it was an outgoing type, deleting it adds stock back.
-                else:
-                    Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                        carton_quantity=F('carton_quantity') + item.carton_quantity,
-                        pack_quantity=F('pack_quantity') + item.pack_quantity
-                    )
-            self.is_deleted = True
-            self.deleted_at = timezone.now()
-            self.save()
+        _set_document_deleted(self, True)
 
     def restore(self):
-        with transaction.atomic():
-            for item in self.items.all():
-                # Re-apply the original transaction
-                if self.document_type in self.INCOMING_TYPES:
-                    Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                        carton_quantity=F('carton_quantity') + item.carton_quantity,
-                        pack_quantity=F('pack_quantity') + item.pack_quantity
-                    )
-                else: # Outgoing
-                    Stock.objects.filter(product=item.product, warehouse=self.warehouse).update(
-                        carton_quantity=F('carton_quantity') - item.carton_quantity,
-                        pack_quantity=F('pack_quantity') - item.pack_quantity
-                    )
-            self.is_deleted = False
-            self.deleted_at = None
-            self.save()
+        _set_document_deleted(self, False)
 
 class SuratLainItems(models.Model):
     surat_lain = models.ForeignKey(SuratLain, related_name='items', on_delete=models.PROTECT)
@@ -491,65 +1927,9 @@ class SuratTransferStok(models.Model):
 
     class Meta:
         ordering = ['-created_at']
-
-    def update(self, instance, validated_data):
-        items_data = validated_data.pop('items')
-        # Get the new warehouses from the request, falling back to the instance's values if not provided.
-        new_source_warehouse = validated_data.get('source_warehouse', instance.source_warehouse)
-        new_destination_warehouse = validated_data.get('destination_warehouse', instance.destination_warehouse)
-
-        with transaction.atomic():
-            # --- Step 1: Revert the original stock transfer ---
-            # This moves stock from the original destination back to the original source.
-            for item in instance.items.all():
-                # Add stock back to the ORIGINAL source warehouse
-                Stock.objects.filter(
-                    product=item.product,
-                    warehouse=instance.source_warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') + item.carton_quantity,
-                    pack_quantity=F('pack_quantity') + item.pack_quantity
-                )
-                # Remove stock from the ORIGINAL destination warehouse
-                Stock.objects.filter(
-                    product=item.product,
-                    warehouse=instance.destination_warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') - item.carton_quantity,
-                    pack_quantity=F('pack_quantity') - item.pack_quantity
-                )
-
-            # --- Step 2: Apply the new stock transfer ---
-            # This moves stock from the NEW source to the NEW destination.
-            for item_data in items_data:
-                # Subtract stock from the NEW source warehouse
-                Stock.objects.filter(
-                    product=item_data['product'],
-                    warehouse=new_source_warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') - item_data.get('carton_quantity', 0),
-                    pack_quantity=F('pack_quantity') - item_data.get('pack_quantity', 0)
-                )
-                # Add stock to the NEW destination warehouse
-                Stock.objects.filter(
-                    product=item_data['product'],
-                    warehouse=new_destination_warehouse
-                ).update(
-                    carton_quantity=F('carton_quantity') + item_data.get('carton_quantity', 0),
-                    pack_quantity=F('pack_quantity') + item_data.get('pack_quantity', 0)
-                )
-
-            # --- Step 3: Update the transfer document itself and its items ---
-            # Remove read-only fields before calling super().update()
-            validated_data.pop('transaction_date', None)
-            instance = super().update(instance, validated_data) # This updates the instance's warehouses to the new ones
-
-            # Re-create the items for the updated transfer document
-            instance.items.all().delete()
-            for item_data in items_data:
-                SuratTransferStokItems.objects.create(surat_transfer_stok=instance, **item_data)
-
-        return instance
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='inventory_transfer_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.document_number:
@@ -559,47 +1939,28 @@ class SuratTransferStok(models.Model):
 
         super().save(*args, **kwargs)
 
+    STOCK_SOURCE_TYPE = 'SURAT_TRANSFER_STOK'
+
+    def stock_effects(self, lines):
+        effects = []
+        for product_id, carton_quantity, pack_quantity in lines:
+            effects.append(('TRANSFER_OUT', product_id, self.source_warehouse_id, -carton_quantity, -pack_quantity))
+            effects.append(('TRANSFER_IN', product_id, self.destination_warehouse_id, carton_quantity, pack_quantity))
+        return effects
+
     def soft_delete(self):
         """
         Marks the transfer as deleted and reverts the stock transfer.
         (Adds stock back to source, removes from destination)
         """
-        with transaction.atomic():
-            for item in self.surattransferstokitems_set.all():
-                # Add back to source
-                Stock.objects.filter(product=item.product, warehouse=self.source_warehouse).update(
-                    carton_quantity=F('carton_quantity') + item.carton_quantity,
-                    pack_quantity=F('pack_quantity') + item.pack_quantity
-                )
-                # Remove from destination
-                Stock.objects.filter(product=item.product, warehouse=self.destination_warehouse).update(
-                    carton_quantity=F('carton_quantity') - item.carton_quantity,
-                    pack_quantity=F('pack_quantity') - item.pack_quantity
-                )
-            self.is_deleted = True
-            self.deleted_at = timezone.now()
-            self.save()
+        _set_document_deleted(self, True)
 
     def restore(self):
         """
         Restores a soft-deleted transfer and re-applies the stock transfer.
         (Removes stock from source, adds to destination)
         """
-        with transaction.atomic():
-            for item in self.surattransferstokitems_set.all():
-                # Remove from source
-                Stock.objects.filter(product=item.product, warehouse=self.source_warehouse).update(
-                    carton_quantity=F('carton_quantity') - item.carton_quantity,
-                    pack_quantity=F('pack_quantity') - item.pack_quantity
-                )
-                # Add to destination
-                Stock.objects.filter(product=item.product, warehouse=self.destination_warehouse).update(
-                    carton_quantity=F('carton_quantity') + item.carton_quantity,
-                    pack_quantity=F('pack_quantity') + item.pack_quantity
-                )
-            self.is_deleted = False
-            self.deleted_at = None
-            self.save()
+        _set_document_deleted(self, False)
 
 class SuratTransferStokItems(models.Model):
     surat_transfer_stok = models.ForeignKey(SuratTransferStok, related_name='items', on_delete=models.PROTECT)
@@ -641,6 +2002,19 @@ def create_warehouse_stocks(sender, instance, created, **kwargs):
         Stock.objects.bulk_create(stock_objects)
 
 
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Warehouse)
+@receiver([post_save, post_delete], sender=Customer)
+def bump_master_data_generation(sender, **kwargs):
+    # New products and warehouses also get their stock rows.
+    if sender in (Product, Warehouse):
+        _bump_table_generations(sender, Stock)
+    else:
+        _bump_table_generations(sender)
+
 class StockAdjustment(models.Model):
     document_number = models.CharField(max_length=100, blank=True)
     warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT)
@@ -662,6 +2036,15 @@ class StockAdjustment(models.Model):
 
         super().save(*args, **kwargs)
 
+    STOCK_SOURCE_TYPE = 'STOCK_ADJUSTMENT'
+
+    def stock_effects(self, lines):
+        # Adjustment lines are already signed (new quantity minus old quantity).
+        return [
+            ('ADJUSTMENT', product_id, self.warehouse_id, carton_quantity, pack_quantity)
+            for product_id, carton_quantity, pack_quantity in lines
+        ]
+
 
 class StockAdjustmentItem(models.Model):
     stock_adjustment = models.ForeignKey(StockAdjustment, related_name='items', on_delete=models.PROTECT)
@@ -673,3 +2056,109 @@ class StockAdjustmentItem(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class ReportJob(models.Model):
+    """
+    A report run in the background by the run_report_jobs worker instead of inside a
+    request. `params` are the report's query parameters; the result is written to
+    `result_file` under settings.REPORT_JOB_ROOT.
+    """
+    REPORT_CHOICES = [
+        ('stock-info', 'Stock Info'),
+        ('stock-balance', 'Stock Balance'),
+        ('stock-card', 'Stock Card'),
+        ('stock-transfer', 'Stock Transfer'),
+        ('retur-pembelian', 'Retur Pembelian'),
+        ('retur-penjualan', 'Retur Penjualan'),
+        ('penerimaan-barang', 'Penerimaan Barang'),
+        ('pengeluaran-barang', 'Pengeluaran Barang'),
+        ('stock-out', 'Stock Out'),
+        ('stock-in', 'Stock In'),
+        ('spk-backlog', 'SPK Backlog'),
+        ('stock-aging', 'Stock Aging'),
+    ]
+    FORMAT_CHOICES = [
+        ('json', 'JSON'),
+        ('csv', 'CSV'),
+        ('xlsx', 'XLSX'),
+    ]
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_DONE = 'DONE'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    # A job is given up after this many claims, e.g. when it keeps killing its worker.
+    MAX_ATTEMPTS = 3
+
+    user = models.ForeignKey('users.User', on_delete=models.PROTECT)
+    report = models.CharField(max_length=50, choices=REPORT_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='json')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, editable=False)
+    attempts = models.PositiveIntegerField(default=0, editable=False)
+    result_file = models.CharField(max_length=255, blank=True, editable=False)
+    error = models.TextField(blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Refreshed by the worker while the job runs; a running job whose heartbeat stopped
+    # lost its worker.
+    heartbeat_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_job_status_idx'),
+        ]
+
+
+def _claim_report_job(stale_before):
+    """
+    Claims the oldest pending report job and marks it running. A running job whose
+    last heartbeat is before `stale_before` lost its worker and is claimed again, up to
+    ReportJob.MAX_ATTEMPTS times. Rows locked by another worker are skipped, so any
+    number of workers can poll the queue at once. Returns None when nothing is queued.
+    """
+    ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING,
+        heartbeat_at__lt=stale_before,
+        attempts__gte=ReportJob.MAX_ATTEMPTS,
+    ).update(
+        status=ReportJob.STATUS_FAILED,
+        error='The report worker stopped while running this job',
+        finished_at=timezone.now(),
+    )
+
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update(skip_locked=True).filter(
+            models.Q(status=ReportJob.STATUS_PENDING)
+            | models.Q(status=ReportJob.STATUS_RUNNING, heartbeat_at__lt=stale_before),
+            attempts__lt=ReportJob.MAX_ATTEMPTS,
+        ).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+
+        job.status = ReportJob.STATUS_RUNNING
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.error = ''
+        job.save(update_fields=['status', 'attempts', 'started_at', 'heartbeat_at', 'error'])
+        return job
+
+
+def _beat_report_job(job):
+    """
+    Records that the worker running `job` is still alive. Returns False once the job is
+    no longer on the attempt this worker claimed, e.g. after it was reclaimed as stale.
+    """
+    return ReportJob.objects.filter(
+        pk=job.pk,
+        status=ReportJob.STATUS_RUNNING,
+        attempts=job.attempts,
+    ).update(heartbeat_at=timezone.now()) == 1
@@ -22,10 +22,19 @@ from .serializers_documents import (
 )
 from .serializers_reports import (
     DocumentSummaryReportSerializer,
+    ReportJobSerializer,
     ReturnReportSerializer,
+    SPKBacklogReportSerializer,
     StockAdjustmentItemSerializer,
     StockAdjustmentSerializer,
+    StockAgingReportSerializer,
+    StockAgingSummarySerializer,
+    StockAsOfSerializer,
+    StockBalanceReportSerializer,
+    StockCardMovementSerializer,
+    StockInItemReportSerializer,
     StockInfoReportSerializer,
+    StockOutItemReportSerializer,
     StockReportSerializer,
     StockTransferReportSerializer,
 )
@@ -1,11 +1,13 @@
 from rest_framework import serializers
-from .models import Category, Supplier, Product, Warehouse, Stock, Customer, SPG, SPGItems, SuratTransferStok, SuratTransferStokItems, SPK, SPKItems, SJ, SJItems, SuratLain, SuratLainItems, StockAdjustment, StockAdjustmentItem
+from rest_framework.settings import api_settings
+from .models import Category, Supplier, Product, Warehouse, Stock, Customer, SPG, SPGItems, SuratTransferStok, SuratTransferStokItems, SPK, SPKItems, SJ, SuratLain, SuratLainItems, StockAdjustment, StockAdjustmentItem, InsufficientStockError, _apply_stock_deltas, _apply_versioned_stock_deltas, _bump_document_generations, _merge_fulfillment_delta, _run_with_transaction_retry, _stock_shortfall_messages
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum, F
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 import datetime
 
+OPTIMISTIC_STOCK_WRITE_ATTEMPTS = 3
+
 
 def _build_stock_map(warehouse, product_ids, lock=False):
     queryset = Stock.objects.filter(
@@ -13,7 +15,7 @@ def _build_stock_map(warehouse, product_ids, lock=False):
         product_id__in=product_ids,
     )
     if lock:
-        queryset = queryset.select_for_update()
+        queryset = queryset.order_by('product_id').select_for_update()
     return {
         stock.product_id: stock
         for stock in queryset
@@ -39,6 +41,13 @@ def _aggregate_item_totals(items_data):
     return totals
 
 
+def _item_data_lines(items_data):
+    return [
+        (item_data['product'].id, item_data.get('carton_quantity', 0), item_data.get('pack_quantity', 0))
+        for item_data in items_data
+    ]
+
+
 def _aggregate_existing_item_totals(items):
     totals = {}
     for item in items:
@@ -56,62 +65,87 @@ def _aggregate_existing_item_totals(items):
     return totals
 
 
-def _ensure_stock_deltas_fit(stock_map, stock_deltas):
-    for (product_id, warehouse_id), delta in stock_deltas.items():
-        if delta['carton_quantity'] >= 0 and delta['pack_quantity'] >= 0:
-            continue
-
-        stock = stock_map.get((product_id, warehouse_id))
-        if stock is None:
-            raise serializers.ValidationError(
-                f"Stock record for product {product_id} at warehouse {warehouse_id} not found."
-            )
-
-        if (stock.carton_quantity + delta['carton_quantity']) < 0:
-            raise serializers.ValidationError(
-                f"Insufficient carton stock for product {product_id} at warehouse {warehouse_id}."
-            )
-        if (stock.pack_quantity + delta['pack_quantity']) < 0:
-            raise serializers.ValidationError(
-                f"Insufficient pack stock for product {product_id} at warehouse {warehouse_id}."
-            )
-
-
-def _build_locked_stock_map(stock_deltas):
-    stock_keys = list(stock_deltas.keys())
+def _build_stock_key_map(stock_keys):
+    """
+    Reads exactly the (product_id, warehouse_id) stock rows in `stock_keys`, unlocked.
+    """
+    stock_keys = sorted(stock_keys)
     if not stock_keys:
         return {}
 
-    product_ids = [key[0] for key in stock_keys]
-    warehouse_ids = [key[1] for key in stock_keys]
-
-    stocks = Stock.objects.filter(
-        product_id__in=product_ids,
-        warehouse_id__in=warehouse_ids,
-    ).order_by('product_id', 'warehouse_id').select_for_update()
+    values_sql = ', '.join(['(%s::bigint, %s::bigint)'] * len(stock_keys))
+    params = [value for stock_key in stock_keys for value in stock_key]
+    stocks = Stock.objects.raw(
+        f"""
+        SELECT stock.*
+        FROM {Stock._meta.db_table} AS stock
+        WHERE (stock.product_id, stock.warehouse_id) IN (VALUES {values_sql})
+        """,
+        params,
+    )
     return {
         (stock.product_id, stock.warehouse_id): stock
         for stock in stocks
     }
 
 
-def _build_spk_fulfillment_map(spk, product_ids, exclude_sj_id=None):
-    queryset = SJItems.objects.filter(
-        sj__spk=spk,
-        product_id__in=product_ids,
-        sj__is_deleted=False,
-    )
-    if exclude_sj_id is not None:
-        queryset = queryset.exclude(sj_id=exclude_sj_id)
-
-    rows = queryset.values('product_id').annotate(
-        carton_total=Coalesce(Sum('carton_quantity'), 0),
-        pack_total=Coalesce(Sum('pack_quantity'), 0),
-    )
-    return {
-        row['product_id']: row
-        for row in rows
+def _apply_stock_deltas_optimistically(stock_deltas):
+    """
+    Validates and applies `stock_deltas` without locking stock up front: rows are read
+    unlocked and written with a version-checked UPDATE, and only the rows another
+    transaction changed in between are read and written again. Rows still conflicting
+    after OPTIMISTIC_STOCK_WRITE_ATTEMPTS rounds go through the locking _apply_stock_deltas.
+    """
+    pending = {
+        stock_key: delta
+        for stock_key, delta in stock_deltas.items()
+        if delta['carton_quantity'] or delta['pack_quantity']
     }
+    for attempt in range(OPTIMISTIC_STOCK_WRITE_ATTEMPTS):
+        if not pending:
+            return
+
+        stock_map = _build_stock_key_map(pending)
+        short_keys = [
+            stock_key for stock_key, delta in pending.items()
+            if stock_key not in stock_map
+            or stock_map[stock_key].carton_quantity + delta['carton_quantity'] < 0
+            or stock_map[stock_key].pack_quantity + delta['pack_quantity'] < 0
+        ]
+        if short_keys:
+            raise InsufficientStockError(_stock_shortfall_messages(pending, short_keys))
+
+        pending = _apply_versioned_stock_deltas(
+            pending,
+            {stock_key: stock.version for stock_key, stock in stock_map.items()},
+        )
+
+    if pending:
+        _apply_stock_deltas(pending)
+
+
+def _apply_checked_stock_deltas(stock_deltas):
+    """
+    Applies `stock_deltas`, raising InsufficientStockError if any stock would go negative,
+    using the write mode selected by settings.STOCK_WRITE_MODE.
+    """
+    if settings.STOCK_WRITE_MODE == 'optimistic':
+        _apply_stock_deltas_optimistically(stock_deltas)
+        return
+
+    _apply_stock_deltas(stock_deltas)
+
+
+def _item_data_fulfillment_deltas(spk_id, items_data, deltas=None):
+    """
+    Merges the quantities of SJ `items_data` shipped against `spk_id` into a
+    {(spk_id, product_id): {'carton_quantity', 'pack_quantity'}} map, which is returned.
+    """
+    if deltas is None:
+        deltas = {}
+    for product_id, carton_quantity, pack_quantity in _item_data_lines(items_data):
+        _merge_fulfillment_delta(deltas, spk_id, product_id, carton_quantity, pack_quantity)
+    return deltas
 
 
 def _build_spk_item_map(spk, product_ids):
@@ -125,21 +159,84 @@ def _build_spk_item_map(spk, product_ids):
     }
 
 
-def _apply_stock_deltas(deltas):
-    for (product_id, warehouse_id), delta in deltas.items():
-        Stock.objects.filter(product_id=product_id, warehouse_id=warehouse_id).update(
-            carton_quantity=F('carton_quantity') + delta['carton_quantity'],
-            pack_quantity=F('pack_quantity') + delta['pack_quantity'],
-        )
+def _build_document_items(item_model, parent_field, parent, items_data):
+    return [
+        item_model(**{parent_field: parent}, **item_data)
+        for item_data in items_data
+    ]
 
 
-def _merge_stock_delta(deltas, product_id, warehouse_id, carton_quantity, pack_quantity):
-    key = (product_id, warehouse_id)
-    if key not in deltas:
-        deltas[key] = {'carton_quantity': 0, 'pack_quantity': 0}
+def _sync_document_items(item_model, parent_field, parent, items_data):
+    """
+    Replaces the items of `parent` with `items_data` while only touching the
+    rows that changed. Incoming lines are paired with existing rows of the same
+    product in their original order; changed pairs are bulk-updated, unmatched
+    rows are deleted and unmatched lines are bulk-created.
+    """
+    existing = {}
+    for item in item_model.objects.filter(**{parent_field: parent}).order_by('id'):
+        existing.setdefault(item.product_id, []).append(item)
+
+    compared_fields = [
+        field for field in item_model._meta.concrete_fields
+        if field.editable and not field.primary_key and field.name not in (parent_field, 'product', 'created_at', 'updated_at')
+    ]
+
+    to_create = []
+    to_update = []
+    update_fields = set()
+    for candidate in _build_document_items(item_model, parent_field, parent, items_data):
+        matches = existing.get(candidate.product_id)
+        if not matches:
+            to_create.append(candidate)
+            continue
+
+        item = matches.pop(0)
+        changed = [
+            field.attname for field in compared_fields
+            if getattr(item, field.attname) != getattr(candidate, field.attname)
+        ]
+        if changed:
+            for attname in changed:
+                setattr(item, attname, getattr(candidate, attname))
+            update_fields.update(changed)
+            to_update.append(item)
+
+    stale_ids = [item.pk for items in existing.values() for item in items]
+    if stale_ids:
+        item_model.objects.filter(pk__in=stale_ids).delete()
+
+    if to_update:
+        now = timezone.now()
+        for item in to_update:
+            item.updated_at = now
+        item_model.objects.bulk_update(to_update, sorted(update_fields) + ['updated_at'])
 
-    deltas[key]['carton_quantity'] += carton_quantity
-    deltas[key]['pack_quantity'] += pack_quantity
+    if to_create:
+        item_model.objects.bulk_create(to_create)
+
+
+class TransactionRetryMixin:
+    """
+    Runs save() in a transaction that is retried on deadlock or serialization failure.
+    The instance being updated is reloaded before each retry. Stock shortfalls detected
+    while writing are reported as non-field validation errors. A successful save moves
+    on the generations of the tables the document write changed.
+    """
+    def save(self, **kwargs):
+        try:
+            instance = _run_with_transaction_retry(
+                lambda: super(TransactionRetryMixin, self).save(**kwargs),
+                on_retry=self._reload_instance,
+            )
+        except InsufficientStockError as exc:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: exc.messages})
+        _bump_document_generations(self.Meta.model)
+        return instance
+
+    def _reload_instance(self):
+        if self.instance is not None:
+            self.instance.refresh_from_db()
 
 
 class FlexDateTimeField(serializers.DateTimeField):
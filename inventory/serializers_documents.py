@@ -1,7 +1,5 @@
 from rest_framework import serializers
 from django.db import transaction
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
 
 from .models import (
     Customer,
@@ -18,18 +16,28 @@ from .models import (
     SuratLainItems,
     SuratTransferStok,
     SuratTransferStokItems,
+    _apply_daily_movement_totals,
+    _apply_stock_deltas,
+    _document_movement_totals,
+    _lock_document_state,
+    _post_document_stock,
+    _refresh_spk_fulfillment,
+    _revert_document_stock,
+    _shift_daily_movement_totals,
+    _shift_spk_fulfillment,
+    _sj_fulfillment_deltas,
 )
 from .serializers_base import (
     FlexDateTimeField,
+    TransactionRetryMixin,
+    _apply_checked_stock_deltas,
     _aggregate_existing_item_totals,
     _aggregate_item_totals,
-    _apply_stock_deltas,
-    _build_locked_stock_map,
-    _build_spk_fulfillment_map,
     _build_spk_item_map,
-    _build_stock_map,
-    _ensure_stock_deltas_fit,
-    _merge_stock_delta,
+    _build_document_items,
+    _item_data_fulfillment_deltas,
+    _item_data_lines,
+    _sync_document_items,
 )
 
 class SPGItemsSerializer(serializers.ModelSerializer):
@@ -79,7 +87,7 @@ class SPGItemsSerializer(serializers.ModelSerializer):
         ]
 
 
-class SPGSerializer(serializers.ModelSerializer):
+class SPGSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = SPGItemsSerializer(many=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
@@ -166,32 +174,20 @@ class SPGSerializer(serializers.ModelSerializer):
             items_data = validated_data.pop('items')
             with transaction.atomic():
                 spg = SPG.objects.create(**validated_data)
-                stock_deltas = {}
-                for item_data in items_data:
-                    SPGItems.objects.create(spg=spg, **item_data)
-                    _merge_stock_delta(
-                        stock_deltas,
-                        item_data['product'].id,
-                        spg.warehouse_id,
-                        item_data.get('carton_quantity', 0),
-                        item_data.get('pack_quantity', 0),
-                    )
-                _apply_stock_deltas(stock_deltas)
+                SPGItems.objects.bulk_create(_build_document_items(SPGItems, 'spg', spg, items_data))
+                _shift_daily_movement_totals(SPG, [spg.pk])
+                _apply_stock_deltas(_post_document_stock(spg, _item_data_lines(items_data)))
             return spg
 
     def update(self, instance, validated_data):
             items_data = validated_data.pop('items')
 
             with transaction.atomic():
-                stock_deltas = {}
-                for item in instance.items.all():
-                    _merge_stock_delta(
-                        stock_deltas,
-                        item.product_id,
-                        instance.warehouse_id,
-                        -item.carton_quantity,
-                        -item.pack_quantity,
-                    )
+                # A deleted SPG has no live ledger rows: its items are only synced here
+                # and restore() posts them.
+                was_deleted = _lock_document_state(instance)
+                stock_deltas = {} if was_deleted else _revert_document_stock(instance)
+                movement_totals = {} if was_deleted else _document_movement_totals(SPG, [instance.pk], -1)
 
                 instance.document_number = validated_data.get('document_number', instance.document_number)
                 instance.warehouse = validated_data.get('warehouse', instance.warehouse)
@@ -203,18 +199,12 @@ class SPGSerializer(serializers.ModelSerializer):
                 instance.notes = validated_data.get('notes', instance.notes)
                 instance.save()
 
-                instance.items.all().delete()
-                for item_data in items_data:
-                    SPGItems.objects.create(spg=instance, **item_data)
-                    _merge_stock_delta(
-                        stock_deltas,
-                        item_data['product'].id,
-                        instance.warehouse_id,
-                        item_data.get('carton_quantity', 0),
-                        item_data.get('pack_quantity', 0),
-                    )
-
+                _sync_document_items(SPGItems, 'spg', instance, items_data)
+                if not was_deleted:
+                    _post_document_stock(instance, _item_data_lines(items_data), stock_deltas)
+                    _document_movement_totals(SPG, [instance.pk], 1, movement_totals)
                 _apply_stock_deltas(stock_deltas)
+                _apply_daily_movement_totals(movement_totals)
 
             return instance
 
@@ -235,7 +225,7 @@ class SuratTransferStokItemsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'product_name', 'product_code']
 
 
-class SuratTransferStokSerializer(serializers.ModelSerializer):
+class SuratTransferStokSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = SuratTransferStokItemsSerializer(many=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     source_warehouse_name = serializers.CharField(source='source_warehouse.name', read_only=True)
@@ -257,73 +247,27 @@ class SuratTransferStokSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         """
-        Validates the stock transfer, checking for sufficient stock.
+        Validates the stock transfer. Stock availability is enforced when the
+        stock deltas are applied.
         """
         source_warehouse = data.get('source_warehouse')
         destination_warehouse = data.get('destination_warehouse')
-        items = data.get('items')
-        item_totals = _aggregate_item_totals(items)
-        original_item_totals = {}
 
         # Rule: Source and destination cannot be the same
         if source_warehouse == destination_warehouse:
             raise serializers.ValidationError("Source and destination warehouses cannot be the same.")
 
-        product_ids = list(item_totals.keys())
-        stock_map = _build_stock_map(source_warehouse, product_ids)
-
-        # For updates, the instance is available in the context
-        is_update = self.instance is not None
-        if is_update:
-            original_item_totals = _aggregate_existing_item_totals(self.instance.items.all())
-
-        for item_total in item_totals.values():
-            product = item_total['product']
-            stock_at_source = stock_map.get(product.id)
-
-            if stock_at_source is None:
-                raise serializers.ValidationError(f"Stock record for {product.name} at {source_warehouse.name} not found.")
-
-            original_carton_qty = 0
-            original_pack_qty = 0
-            if is_update and self.instance.source_warehouse == source_warehouse:
-                original_item = original_item_totals.get(product.id)
-                if original_item:
-                    original_carton_qty = original_item['carton_quantity']
-                    original_pack_qty = original_item['pack_quantity']
-
-            if (stock_at_source.carton_quantity + original_carton_qty) < item_total['carton_quantity']:
-                raise serializers.ValidationError(f"Insufficient carton stock for {product.name} at {source_warehouse.name}.")
-            if (stock_at_source.pack_quantity + original_pack_qty) < item_total['pack_quantity']:
-                raise serializers.ValidationError(f"Insufficient pack stock for {product.name} at {source_warehouse.name}.")
-
         return data
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         with transaction.atomic():
             transfer = SuratTransferStok.objects.create(**validated_data)
-            item_totals = _aggregate_item_totals(items_data)
-            stock_deltas = {}
-            for item_total in item_totals.values():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    transfer.source_warehouse_id,
-                    -item_total['carton_quantity'],
-                    -item_total['pack_quantity'],
-                )
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    transfer.destination_warehouse_id,
-                    item_total['carton_quantity'],
-                    item_total['pack_quantity'],
-                )
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-            for item_data in items_data:
-                SuratTransferStokItems.objects.create(surat_transfer_stok=transfer, **item_data)
-            _apply_stock_deltas(stock_deltas)
+            SuratTransferStokItems.objects.bulk_create(
+                _build_document_items(SuratTransferStokItems, 'surat_transfer_stok', transfer, items_data)
+            )
+            stock_deltas = _post_document_stock(transfer, _item_data_lines(items_data))
+            _apply_checked_stock_deltas(stock_deltas)
         return transfer
 
     def update(self, instance, validated_data):
@@ -332,51 +276,21 @@ class SuratTransferStokSerializer(serializers.ModelSerializer):
         new_destination_warehouse = validated_data.get('destination_warehouse', instance.destination_warehouse)
 
         with transaction.atomic():
-            stock_deltas = {}
-            for item in instance.items.all():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item.product_id,
-                    instance.source_warehouse_id,
-                    item.carton_quantity,
-                    item.pack_quantity,
-                )
-                _merge_stock_delta(
-                    stock_deltas,
-                    item.product_id,
-                    instance.destination_warehouse_id,
-                    -item.carton_quantity,
-                    -item.pack_quantity,
-                )
-
-            item_totals = _aggregate_item_totals(items_data)
-            for item_total in item_totals.values():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    new_source_warehouse.id,
-                    -item_total['carton_quantity'],
-                    -item_total['pack_quantity'],
-                )
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    new_destination_warehouse.id,
-                    item_total['carton_quantity'],
-                    item_total['pack_quantity'],
-                )
-
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-            _apply_stock_deltas(stock_deltas)
+            # Revert the original transfer, then apply the new one between the new warehouses.
+            # A deleted transfer has nothing to revert and posts nothing until it is restored.
+            was_deleted = _lock_document_state(instance)
+            stock_deltas = {} if was_deleted else _revert_document_stock(instance)
 
             instance.source_warehouse = new_source_warehouse
             instance.destination_warehouse = new_destination_warehouse
             instance.save()
 
-            # Re-create the items for the transfer
-            instance.items.all().delete()
-            for item_data in items_data:
-                SuratTransferStokItems.objects.create(surat_transfer_stok=instance, **item_data)
+            # Bring the transfer's items in line with the request
+            _sync_document_items(SuratTransferStokItems, 'surat_transfer_stok', instance, items_data)
+
+            if not was_deleted:
+                _post_document_stock(instance, _item_data_lines(items_data), stock_deltas)
+            _apply_checked_stock_deltas(stock_deltas)
 
         return instance
 
@@ -396,46 +310,28 @@ class SPKItemsSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'product', 'product_name', 'product_code',
             'carton_quantity', 'pack_quantity', 'packing', 'supplier_name',
+            'fulfilled_carton_quantity',
+            'fulfilled_pack_quantity',
             'unfulfilled_carton_quantity',
             'unfulfilled_pack_quantity',
         ]
         read_only_fields = ['id', 'product_name', 'product_code']
 
-    def _get_fulfilled_totals(self, obj):
-        cache = getattr(self, '_fulfilled_totals_cache', None)
-        if cache is None:
-            cache = {}
-            self._fulfilled_totals_cache = cache
-
-        if obj.pk not in cache:
-            cache[obj.pk] = SJItems.objects.filter(
-                sj__spk=obj.spk,
-                product=obj.product,
-                sj__is_deleted=False
-            ).aggregate(
-                carton_total=Coalesce(Sum('carton_quantity'), 0),
-                pack_total=Coalesce(Sum('pack_quantity'), 0),
-            )
-
-        return cache[obj.pk]
-
     def get_unfulfilled_carton_quantity(self, obj):
         """
-        Calculates the remaining carton quantity by subtracting all fulfilled SJ items.
+        Calculates the remaining carton quantity from the fulfilled counter.
         'obj' here is an instance of SPKItems.
         """
-        totals = self._get_fulfilled_totals(obj)
-        return obj.carton_quantity - totals['carton_total']
+        return obj.carton_quantity - obj.fulfilled_carton_quantity
 
     def get_unfulfilled_pack_quantity(self, obj):
         """
-        Calculates the remaining pack quantity by subtracting all fulfilled SJ items.
+        Calculates the remaining pack quantity from the fulfilled counter.
         """
-        totals = self._get_fulfilled_totals(obj)
-        return obj.pack_quantity - totals['pack_total']
+        return obj.pack_quantity - obj.fulfilled_pack_quantity
 
 
-class SPKSerializer(serializers.ModelSerializer):
+class SPKSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = SPKItemsSerializer(many=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
@@ -448,10 +344,10 @@ class SPKSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'document_number',
             'customer', 'customer_name', 'customer_address', 'customer_upline', 'notes', 'user', 'user_username',
-            'is_deleted', 'deleted_at', 'transaction_date', 'created_at', 'updated_at', 'items'
+            'status', 'is_deleted', 'deleted_at', 'transaction_date', 'created_at', 'updated_at', 'items'
         ]
         read_only_fields = [
-            'id', 'document_number', 'user', 'user_username', 'customer_name', 'is_deleted',
+            'id', 'document_number', 'user', 'user_username', 'customer_name', 'status', 'is_deleted',
             'deleted_at', 'created_at', 'updated_at'
         ]
 
@@ -459,8 +355,7 @@ class SPKSerializer(serializers.ModelSerializer):
         items_data = validated_data.pop('items')
         with transaction.atomic():
             spk = SPK.objects.create(**validated_data)
-            for item_data in items_data:
-                SPKItems.objects.create(spk=spk, **item_data)
+            SPKItems.objects.bulk_create(_build_document_items(SPKItems, 'spk', spk, items_data))
         return spk
 
     def update(self, instance, validated_data):
@@ -469,9 +364,9 @@ class SPKSerializer(serializers.ModelSerializer):
 
         if items_data is not None:
             with transaction.atomic():
-                instance.items.all().delete()
-                for item_data in items_data:
-                    SPKItems.objects.create(spk=instance, **item_data)
+                _sync_document_items(SPKItems, 'spk', instance, items_data)
+                # Lines added by the edit start from what has already been shipped.
+                _refresh_spk_fulfillment([instance.pk])
         return instance
 
 
@@ -491,7 +386,7 @@ class SJItemsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'product_name', 'product_code']
 
 
-class SJSerializer(serializers.ModelSerializer):
+class SJSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = SJItemsSerializer(many=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
@@ -548,8 +443,8 @@ class SJSerializer(serializers.ModelSerializer):
         """
         Custom validation for:
         1. Conditional customer vs. non-customer fields.
-        2. Sufficient stock in the source warehouse.
-        3. Ensuring SJ quantities do not exceed the unfulfilled quantities from the parent SPK.
+        2. Ensuring SJ quantities do not exceed the unfulfilled quantities from the parent SPK.
+        Stock availability is enforced when the stock deltas are applied.
         """
         # --- Get the SPK and items from the request data ---
         # On a create, 'spk' will be in data. On an update, it's on the instance.
@@ -562,13 +457,8 @@ class SJSerializer(serializers.ModelSerializer):
 
         product_ids = list(item_totals.keys())
         spk_item_map = _build_spk_item_map(spk, product_ids)
-        fulfilled_map = _build_spk_fulfillment_map(
-            spk,
-            product_ids,
-            exclude_sj_id=self.instance.pk if self.instance else None,
-        )
         original_item_totals = {}
-        if self.instance:
+        if self.instance and self.instance.spk_id == spk.pk and not self.instance.is_deleted:
             original_item_totals = _aggregate_existing_item_totals(self.instance.items.all())
 
         for item_total in item_totals.values():
@@ -582,7 +472,6 @@ class SJSerializer(serializers.ModelSerializer):
                 })
 
             # --- Validation 2: Check if the quantity exceeds the unfulfilled amount ---
-            fulfilled_totals = fulfilled_map.get(product.id, {'carton_total': 0, 'pack_total': 0})
 
             original_cartons = 0
             original_packs = 0
@@ -591,8 +480,8 @@ class SJSerializer(serializers.ModelSerializer):
                 original_cartons = original_item['carton_quantity']
                 original_packs = original_item['pack_quantity']
 
-            unfulfilled_cartons = spk_item.carton_quantity - fulfilled_totals['carton_total'] + original_cartons
-            unfulfilled_packs = spk_item.pack_quantity - fulfilled_totals['pack_total'] + original_packs
+            unfulfilled_cartons = spk_item.carton_quantity - spk_item.fulfilled_carton_quantity + original_cartons
+            unfulfilled_packs = spk_item.pack_quantity - spk_item.fulfilled_pack_quantity + original_packs
 
             if item_total['carton_quantity'] > unfulfilled_cartons:
                 raise serializers.ValidationError({
@@ -604,98 +493,49 @@ class SJSerializer(serializers.ModelSerializer):
                     f"product_{product.id}": f"Pack quantity for '{product.name}' ({item_total['pack_quantity']}) exceeds the unfulfilled quantity on the SPK ({unfulfilled_packs})."
                 })
 
-        # --- Stock Validation ---
-        warehouse = data.get('warehouse') or (self.instance and self.instance.warehouse)
-        is_update = self.instance is not None
-        product_ids = list(item_totals.keys())
-        stock_map = _build_stock_map(warehouse, product_ids)
-        original_item_totals = {}
-        if is_update:
-            original_item_totals = _aggregate_existing_item_totals(self.instance.items.all())
-
-        for item_total in item_totals.values():
-            product = item_total['product']
-            stock = stock_map.get(product.id)
-            if stock is None:
-                raise serializers.ValidationError(f"Stock record for {product.name} at {warehouse.name} not found.")
-
-            original_carton = 0
-            original_pack = 0
-            if is_update:
-                original_item = original_item_totals.get(product.id)
-                if original_item:
-                    original_carton = original_item['carton_quantity']
-                    original_pack = original_item['pack_quantity']
-
-            if (stock.carton_quantity + original_carton) < item_total['carton_quantity']:
-                raise serializers.ValidationError(f"Insufficient carton stock for {product.name} at {warehouse.name}.")
-            if (stock.pack_quantity + original_pack) < item_total['pack_quantity']:
-                raise serializers.ValidationError(f"Insufficient pack stock for {product.name} at {warehouse.name}.")
-
         return data
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         with transaction.atomic():
             sj = SJ.objects.create(**validated_data)
-            item_totals = _aggregate_item_totals(items_data)
-            stock_deltas = {}
-            for item_total in item_totals.values():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    sj.warehouse_id,
-                    -item_total['carton_quantity'],
-                    -item_total['pack_quantity'],
-                )
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-            for item_data in items_data:
-                SJItems.objects.create(sj=sj, **item_data)
-            _apply_stock_deltas(stock_deltas)
+            SJItems.objects.bulk_create(_build_document_items(SJItems, 'sj', sj, items_data))
+            _shift_daily_movement_totals(SJ, [sj.pk])
+            stock_deltas = _post_document_stock(sj, _item_data_lines(items_data))
+            _apply_checked_stock_deltas(stock_deltas)
+            _shift_spk_fulfillment(_item_data_fulfillment_deltas(sj.spk_id, items_data))
         return sj
 
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items')
-        # Get the new warehouse from the request, falling back to the instance's current warehouse if not provided.
-        new_warehouse = validated_data.get('warehouse', instance.warehouse)
 
         with transaction.atomic():
-            stock_deltas = {}
             # --- Step 1: Revert the old stock from the OLD warehouse ---
             # This is critical. It adds the quantities back to the original source warehouse.
-            original_item_totals = _aggregate_existing_item_totals(instance.items.all())
-            for item_total in original_item_totals.values():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    instance.warehouse_id,  # Use the ORIGINAL warehouse here
-                    item_total['carton_quantity'],
-                    item_total['pack_quantity'],
-                )
-
-            # --- Step 2: Apply the new stock to the NEW warehouse ---
-            # This subtracts the new quantities from the potentially new warehouse.
-            item_totals = _aggregate_item_totals(items_data)
-            for item_total in item_totals.values():
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    new_warehouse.id,  # Use the NEW warehouse here
-                    -item_total['carton_quantity'],
-                    -item_total['pack_quantity'],
-                )
-
-            # --- Step 3: Update the SJ instance itself and its items ---
+            # A deleted SJ has no live ledger rows: its items are only synced and restore() posts them.
+            was_deleted = _lock_document_state(instance)
+            stock_deltas = {} if was_deleted else _revert_document_stock(instance)
+            # Take the old lines off the fulfilled counters of the SPK they were shipped against.
+            fulfillment_deltas = {} if was_deleted else _sj_fulfillment_deltas([instance.pk], -1)
+            movement_totals = {} if was_deleted else _document_movement_totals(SJ, [instance.pk], -1)
+
+            # --- Step 2: Update the SJ instance itself and its items ---
             # Remove read-only fields before calling super().update()
             validated_data.pop('transaction_date', None)
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-            instance = super().update(instance, validated_data) # This updates instance.warehouse to new_warehouse
-            # Re-create the items for the updated SJ
-            instance.items.all().delete()
-            for item_data in items_data:
-                SJItems.objects.create(sj=instance, **item_data)
+            instance = super().update(instance, validated_data) # This moves the SJ to the requested warehouse
+            # Bring the SJ's items in line with the request
+            _sync_document_items(SJItems, 'sj', instance, items_data)
 
-            _apply_stock_deltas(stock_deltas)
+            # --- Step 3: Apply the new stock to the NEW warehouse ---
+            # This subtracts the new quantities from the potentially new warehouse.
+            if not was_deleted:
+                _post_document_stock(instance, _item_data_lines(items_data), stock_deltas)
+            _apply_checked_stock_deltas(stock_deltas)
+            if not was_deleted:
+                _item_data_fulfillment_deltas(instance.spk_id, items_data, fulfillment_deltas)
+                _document_movement_totals(SJ, [instance.pk], 1, movement_totals)
+            _shift_spk_fulfillment(fulfillment_deltas)
+            _apply_daily_movement_totals(movement_totals)
 
         return instance
 
@@ -713,7 +553,7 @@ class SuratLainItemsSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'product_name', 'product_code']
 
 
-class SuratLainSerializer(serializers.ModelSerializer):
+class SuratLainSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = SuratLainItemsSerializer(many=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
@@ -731,118 +571,32 @@ class SuratLainSerializer(serializers.ModelSerializer):
             'warehouse_name', 'is_deleted', 'deleted_at', 'created_at', 'updated_at'
         ]
 
-    def validate(self, data):
-        """
-        Custom validation for:
-        1. Sufficient stock for OUTGOING document types (SPB, RETUR_PEMBELIAN).
-        """
-        doc_type = self.context.get('document_type')
-
-        # --- Stock Validation for Outgoing Types ---
-        # This check only runs for types that are NOT considered incoming.
-        if doc_type not in SuratLain.INCOMING_TYPES:
-            # Get the warehouse from the incoming data, or from the existing instance on updates.
-            warehouse = data.get('warehouse') or (self.instance and self.instance.warehouse)
-            items_data = data.get('items', [])
-            item_totals = _aggregate_item_totals(items_data)
-            product_ids = list(item_totals.keys())
-            stock_map = _build_stock_map(warehouse, product_ids)
-            is_update = self.instance is not None
-            original_item_totals = {}
-            if is_update:
-                original_item_totals = _aggregate_existing_item_totals(self.instance.items.all())
-
-            for item_total in item_totals.values():
-                product = item_total['product']
-                stock = stock_map.get(product.id)
-                if stock is None:
-                    raise serializers.ValidationError(f"Stock record for {product.name} at {warehouse.name} not found.")
-
-                # On update, we can "use" the stock from the original document
-                # before checking if the new amount is available.
-                original_carton = 0
-                original_pack = 0
-                if is_update:
-                    original_item = original_item_totals.get(product.id)
-                    if original_item:
-                        original_carton = original_item['carton_quantity']
-                        original_pack = original_item['pack_quantity']
-
-                # Check if available stock is sufficient for the new outgoing amount
-                if (stock.carton_quantity + original_carton) < item_total['carton_quantity']:
-                    raise serializers.ValidationError(f"Insufficient carton stock for {product.name} at {warehouse.name}.")
-                if (stock.pack_quantity + original_pack) < item_total['pack_quantity']:
-                    raise serializers.ValidationError(f"Insufficient pack stock for {product.name} at {warehouse.name}.")
-
-        # If all validation passes, return the data.
-        return data
-
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         doc_type = self.context.get('document_type')
-        item_totals = _aggregate_item_totals(items_data)
 
         with transaction.atomic():
             surat = SuratLain.objects.create(document_type=doc_type, **validated_data)
-            stock_deltas = {}
-            for item_total in item_totals.values():
-                if doc_type in SuratLain.INCOMING_TYPES:
-                    carton_delta = item_total['carton_quantity']
-                    pack_delta = item_total['pack_quantity']
-                else: # Outgoing
-                    carton_delta = -item_total['carton_quantity']
-                    pack_delta = -item_total['pack_quantity']
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    surat.warehouse_id,
-                    carton_delta,
-                    pack_delta,
-                )
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-            for item_data in items_data:
-                SuratLainItems.objects.create(surat_lain=surat, **item_data)
-            _apply_stock_deltas(stock_deltas)
+            SuratLainItems.objects.bulk_create(_build_document_items(SuratLainItems, 'surat_lain', surat, items_data))
+            stock_deltas = _post_document_stock(surat, _item_data_lines(items_data))
+            _apply_checked_stock_deltas(stock_deltas)
         return surat
 
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items')
-        new_warehouse = validated_data.get('warehouse', instance.warehouse)
-        item_totals = _aggregate_item_totals(items_data)
 
         with transaction.atomic():
-            stock_deltas = {}
-            # Revert old stock movements
-            instance.soft_delete() # This flips is_deleted=True, so we must flip it back
-            instance.is_deleted = False
-            instance.deleted_at = None
+            # Revert old stock movements; a deleted document has none until it is restored
+            was_deleted = _lock_document_state(instance)
+            stock_deltas = {} if was_deleted else _revert_document_stock(instance)
 
-            # Apply new stock movements
-            for item_total in item_totals.values():
-                if instance.document_type in SuratLain.INCOMING_TYPES:
-                    carton_delta = item_total['carton_quantity']
-                    pack_delta = item_total['pack_quantity']
-                else: # Outgoing
-                    carton_delta = -item_total['carton_quantity']
-                    pack_delta = -item_total['pack_quantity']
-                _merge_stock_delta(
-                    stock_deltas,
-                    item_total['product'].id,
-                    new_warehouse.id,
-                    carton_delta,
-                    pack_delta,
-                )
-
-            _ensure_stock_deltas_fit(_build_locked_stock_map(stock_deltas), stock_deltas)
-
-            # Update the instance itself
+            # Update the instance itself and bring its items in line with the request
             instance = super().update(instance, validated_data)
+            _sync_document_items(SuratLainItems, 'surat_lain', instance, items_data)
 
-            # Re-create items and save the instance's final state
-            instance.items.all().delete()
-            for item_data in items_data:
-                SuratLainItems.objects.create(surat_lain=instance, **item_data)
-            instance.save()
-            _apply_stock_deltas(stock_deltas)
+            # Apply new stock movements
+            if not was_deleted:
+                _post_document_stock(instance, _item_data_lines(items_data), stock_deltas)
+            _apply_checked_stock_deltas(stock_deltas)
 
         return instance
@@ -1,14 +1,49 @@
 from rest_framework import serializers
-
-from .models import Stock, StockAdjustment, StockAdjustmentItem, SuratLainItems, SuratTransferStokItems
-from .serializers_base import FlexDateTimeField
+from rest_framework.reverse import reverse
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import (
+    ReportJob,
+    Stock,
+    StockAdjustment,
+    StockAdjustmentItem,
+    SuratLainItems,
+    _apply_stock_deltas,
+    _post_document_stock,
+)
+from .serializers_base import FlexDateTimeField, TransactionRetryMixin, _build_stock_map
 
 # --- REPORTING SERIALIZERS ---
 
-class StockInfoReportSerializer(serializers.ModelSerializer):
+class ValuesRowSerializer(serializers.Serializer):
     """
-    Serializer for the main stock information report.
-    Gathers detailed information for each stock record.
+    Read-only serializer for report rows fetched with `.values()` under the names of its
+    fields. Each row is read by key, and only date and decimal fields go through their
+    to_representation, instead of every field resolving its source on a model instance.
+    """
+
+    @cached_property
+    def _row_fields(self):
+        formatted = (serializers.DateField, serializers.DateTimeField, serializers.DecimalField)
+        return [
+            (name, field.to_representation if isinstance(field, formatted) else None)
+            for name, field in self.fields.items()
+            if not field.write_only
+        ]
+
+    def to_representation(self, row):
+        data = {}
+        for name, to_representation in self._row_fields:
+            value = row[name]
+            data[name] = value if to_representation is None or value is None else to_representation(value)
+        return data
+
+
+class StockRecordReportSerializer(serializers.ModelSerializer):
+    """
+    Product and warehouse details of a stock record, for the stock reports that attach
+    computed balances to Stock instances.
     """
     product_code = serializers.CharField(source='product.code', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -31,34 +66,76 @@ class StockInfoReportSerializer(serializers.ModelSerializer):
         ]
 
 
-class StockTransferReportSerializer(serializers.ModelSerializer):
+class StockInfoReportSerializer(ValuesRowSerializer):
     """
-    Serializer for the stock transfer report.
-    Gathers summary data for each item in an active stock transfer.
+    Serializer for the main stock information report.
+    Renders one stock record per row.
     """
-    document_number = serializers.CharField(source='surat_transfer_stok.document_number', read_only=True)
-    transaction_date = serializers.DateTimeField(source='surat_transfer_stok.transaction_date', format="%Y-%m-%d")
-    product_name = serializers.CharField(source='product.name', read_only=True)
-    supplier_name = serializers.CharField(source='product.supplier.name', read_only=True)
-    packing = serializers.CharField(source='product.packing', read_only=True)
-    source_warehouse = serializers.CharField(source='surat_transfer_stok.source_warehouse.name', read_only=True)
-    destination_warehouse = serializers.CharField(source='surat_transfer_stok.destination_warehouse.name', read_only=True)
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    product_category = serializers.CharField()
+    supplier_name = serializers.CharField()
+    packing = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+    warehouse_name = serializers.CharField()
 
-    class Meta:
-        model = SuratTransferStokItems
+
+class StockAsOfSerializer(StockRecordReportSerializer):
+    """
+    Serializer for the stock as-of query. Quantities come from the ledger balance
+    attached to each stock record instead of its current totals.
+    """
+    carton_quantity = serializers.IntegerField(source='as_of_carton_quantity', read_only=True)
+    pack_quantity = serializers.IntegerField(source='as_of_pack_quantity', read_only=True)
+
+    class Meta(StockRecordReportSerializer.Meta):
+        fields = ['product', 'warehouse'] + StockRecordReportSerializer.Meta.fields
+
+
+class StockBalanceReportSerializer(StockRecordReportSerializer):
+    """
+    Serializer for the opening/closing stock balance report. Balances are attached
+    to each stock record by the view.
+    """
+    opening_carton_quantity = serializers.IntegerField(read_only=True)
+    opening_pack_quantity = serializers.IntegerField(read_only=True)
+    closing_carton_quantity = serializers.IntegerField(read_only=True)
+    closing_pack_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta(StockRecordReportSerializer.Meta):
         fields = [
-            'document_number',
-            'transaction_date',
+            'product',
+            'warehouse',
+            'product_code',
             'product_name',
+            'product_category',
             'supplier_name',
             'packing',
-            'carton_quantity',
-            'pack_quantity',
-            'source_warehouse',
-            'destination_warehouse',
+            'warehouse_name',
+            'opening_carton_quantity',
+            'opening_pack_quantity',
+            'closing_carton_quantity',
+            'closing_pack_quantity',
         ]
 
 
+class StockTransferReportSerializer(ValuesRowSerializer):
+    """
+    Serializer for the stock transfer report.
+    Renders one item of an active stock transfer per row.
+    """
+    document_number = serializers.CharField()
+    transaction_date = serializers.DateField(format="%Y-%m-%d")
+    product_name = serializers.CharField()
+    supplier_name = serializers.CharField()
+    packing = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+    source_warehouse = serializers.CharField()
+    destination_warehouse = serializers.CharField()
+
+
 class ReturnReportSerializer(serializers.ModelSerializer):
     """
     Serializer for the purchase and sales return reports.
@@ -86,38 +163,22 @@ class ReturnReportSerializer(serializers.ModelSerializer):
         ]
 
 
-class DocumentSummaryReportSerializer(serializers.ModelSerializer):
+class DocumentSummaryReportSerializer(ValuesRowSerializer):
     """
     A dynamic and generic serializer for document summary reports.
     It adjusts its fields based on the report type provided by the view.
     """
-    document_number = serializers.CharField(source='surat_lain.document_number', read_only=True)
-    transaction_date = serializers.DateTimeField(source='surat_lain.transaction_date', format="%Y-%m-%d")
-    warehouse_name = serializers.CharField(source='surat_lain.warehouse.name', read_only=True)
-    notes = serializers.CharField(source='surat_lain.notes', read_only=True, allow_blank=True)
-    product_code = serializers.CharField(source='product.code', read_only=True)
-    product_name = serializers.CharField(source='product.name', read_only=True)
-    packing = serializers.CharField(source='product.packing', read_only=True)
-
-    # --- Conditionally included fields ---
-    sj_number = serializers.CharField(source='surat_lain.sj_number', read_only=True)
-    supplier_name = serializers.CharField(source='product.supplier.name', read_only=True)
-
-    class Meta:
-        model = SuratLainItems
-        fields = [
-            'document_number',
-            'transaction_date',
-            'sj_number',          # Will be removed for return reports
-            'supplier_name',      # Will be removed for STB/SPB reports
-            'warehouse_name',
-            'product_code',
-            'product_name',
-            'packing',
-            'carton_quantity',
-            'pack_quantity',
-            'notes',
-        ]
+    document_number = serializers.CharField()
+    transaction_date = serializers.DateField(format="%Y-%m-%d")
+    sj_number = serializers.CharField()          # Will be removed for return reports
+    supplier_name = serializers.CharField()
+    warehouse_name = serializers.CharField()
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    packing = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+    notes = serializers.CharField(allow_blank=True)
 
     def __init__(self, *args, **kwargs):
         """
@@ -151,7 +212,7 @@ class StockAdjustmentItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'product_name', 'product_code']
 
 
-class StockAdjustmentSerializer(serializers.ModelSerializer):
+class StockAdjustmentSerializer(TransactionRetryMixin, serializers.ModelSerializer):
     items = StockAdjustmentItemSerializer(many=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
@@ -176,23 +237,36 @@ class StockAdjustmentSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             adjustment = StockAdjustment.objects.create(**validated_data)
 
+            # Lock the current stock records for the transaction.
+            product_ids = [item_data['product'].id for item_data in items_data]
+            stock_map = _build_stock_map(warehouse, product_ids, lock=True)
+            adjustment_lines = []
+            adjustment_items = []
+
             for item_data in items_data:
                 product = item_data['product']
-
-                # Get the current stock record, locking it for the transaction.
-                stock = Stock.objects.select_for_update().get(product=product, warehouse=warehouse)
+                stock = stock_map.get(product.id)
+                if stock is None:
+                    raise serializers.ValidationError(f"Stock record for {product.name} at {warehouse.name} not found.")
 
                 # Populate old quantities from the current stock
                 item_data['old_carton_quantity'] = stock.carton_quantity
                 item_data['old_pack_quantity'] = stock.pack_quantity
 
-                # Create the audit record (the adjustment item)
-                StockAdjustmentItem.objects.create(stock_adjustment=adjustment, **item_data)
+                # Build the audit record (the adjustment item)
+                adjustment_items.append(StockAdjustmentItem(stock_adjustment=adjustment, **item_data))
 
-                # Update the actual stock level to the new quantities
+                # Move the stock level to the new quantities
+                adjustment_lines.append((
+                    product.id,
+                    item_data['new_carton_quantity'] - stock.carton_quantity,
+                    item_data['new_pack_quantity'] - stock.pack_quantity,
+                ))
                 stock.carton_quantity = item_data['new_carton_quantity']
                 stock.pack_quantity = item_data['new_pack_quantity']
-                stock.save()
+
+            StockAdjustmentItem.objects.bulk_create(adjustment_items)
+            _apply_stock_deltas(_post_document_stock(adjustment, adjustment_lines))
 
         return adjustment
 
@@ -206,3 +280,171 @@ class StockReportSerializer(serializers.Serializer):
     packing = serializers.CharField()
     total_carton_quantity = serializers.IntegerField()
     total_pack_quantity = serializers.IntegerField()
+
+
+class StockInItemReportSerializer(ValuesRowSerializer):
+    """
+    Serializer for the stock in items report.
+    Renders one item of an active SPG per row, with its document, warehouse and product.
+    """
+    document_number = serializers.CharField()
+    document_type = serializers.CharField()
+    transaction_date = serializers.DateField(format="%Y-%m-%d")
+    sj_number = serializers.CharField()
+    container_number = serializers.CharField()
+    vehicle_number = serializers.CharField()
+    warehouse_name = serializers.CharField()
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    product_category = serializers.CharField()
+    supplier_name = serializers.CharField()
+    packing = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+
+
+class StockOutItemReportSerializer(ValuesRowSerializer):
+    """
+    Serializer for the stock out items report.
+    Renders one item of an active SJ per row, with its document, warehouse and product.
+    """
+    document_number = serializers.CharField()
+    transaction_date = serializers.DateField(format="%Y-%m-%d")
+    spk_document_number = serializers.CharField()
+    sj_type = serializers.CharField()
+    customer_name = serializers.CharField(allow_null=True)
+    non_customer_name = serializers.CharField(allow_blank=True)
+    vehicle_number = serializers.CharField()
+    warehouse_name = serializers.CharField()
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    product_category = serializers.CharField()
+    supplier_name = serializers.CharField()
+    packing = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+
+
+class SPKBacklogReportSerializer(serializers.Serializer):
+    """
+    Serializer for the SPK backlog report. The customer fields are only present when
+    the report is grouped by customer; `stocks` is attached by the view.
+    """
+    product = serializers.IntegerField(source='product_id')
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    packing = serializers.CharField()
+    customer = serializers.IntegerField(source='customer_id', required=False)
+    customer_name = serializers.CharField(required=False)
+    ordered_carton_quantity = serializers.IntegerField()
+    ordered_pack_quantity = serializers.IntegerField()
+    shipped_carton_quantity = serializers.IntegerField()
+    shipped_pack_quantity = serializers.IntegerField()
+    outstanding_carton_quantity = serializers.IntegerField()
+    outstanding_pack_quantity = serializers.IntegerField()
+    stocks = serializers.DictField()
+
+
+class StockCardMovementSerializer(serializers.Serializer):
+    """
+    Serializer for one row of the stock card: a signed ledger movement and the running
+    balance after it.
+    """
+    transaction_date = serializers.DateTimeField(format="%Y-%m-%d")
+    movement_type = serializers.CharField()
+    document_number = serializers.CharField()
+    source_type = serializers.CharField()
+    source_id = serializers.IntegerField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+    balance_carton_quantity = serializers.IntegerField()
+    balance_pack_quantity = serializers.IntegerField()
+
+
+class StockAgingReportSerializer(ValuesRowSerializer):
+    """
+    Serializer for one stock record of the stock aging report. `last_outbound_date` is
+    empty for stock that never moved out of the warehouse.
+    """
+    product = serializers.IntegerField()
+    product_code = serializers.CharField()
+    product_name = serializers.CharField()
+    product_category = serializers.CharField()
+    supplier_name = serializers.CharField()
+    packing = serializers.CharField()
+    warehouse = serializers.IntegerField()
+    warehouse_name = serializers.CharField()
+    carton_quantity = serializers.IntegerField()
+    pack_quantity = serializers.IntegerField()
+    last_outbound_date = serializers.DateField(format="%Y-%m-%d", allow_null=True)
+    days_since_movement = serializers.IntegerField()
+    bucket = serializers.CharField()
+
+
+class StockAgingSummarySerializer(ValuesRowSerializer):
+    """
+    Serializer for the stock aging report grouped by warehouse: the number of stock
+    records and their quantities in each aging bucket.
+    """
+    warehouse = serializers.IntegerField()
+    warehouse_name = serializers.CharField()
+    days_0_30_stock_count = serializers.IntegerField()
+    days_0_30_carton_quantity = serializers.IntegerField()
+    days_0_30_pack_quantity = serializers.IntegerField()
+    days_31_90_stock_count = serializers.IntegerField()
+    days_31_90_carton_quantity = serializers.IntegerField()
+    days_31_90_pack_quantity = serializers.IntegerField()
+    days_91_180_stock_count = serializers.IntegerField()
+    days_91_180_carton_quantity = serializers.IntegerField()
+    days_91_180_pack_quantity = serializers.IntegerField()
+    days_over_180_stock_count = serializers.IntegerField()
+    days_over_180_carton_quantity = serializers.IntegerField()
+    days_over_180_pack_quantity = serializers.IntegerField()
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for queueing a background report and polling it. `params` are the query
+    parameters the report takes on its own endpoint; the output format is chosen with
+    `export_format` instead of `export`.
+    """
+    poll_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id',
+            'report',
+            'params',
+            'export_format',
+            'status',
+            'attempts',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'poll_url',
+            'download_url',
+        ]
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("params must be an object of report query parameters")
+        if 'export' in value:
+            raise serializers.ValidationError("Use export_format to choose the output format")
+
+        scalar_types = (str, int, float, bool)
+        for key, param in value.items():
+            values = param if isinstance(param, list) else [param]
+            if not all(isinstance(item, scalar_types) for item in values):
+                raise serializers.ValidationError(f"{key} must be a string, number or list of them")
+        return value
+
+    def get_poll_url(self, obj):
+        return reverse('report-job-detail', args=[obj.pk], request=self.context.get('request'))
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.STATUS_DONE:
+            return None
+        return reverse('report-job-download', args=[obj.pk], request=self.context.get('request'))
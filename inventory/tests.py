@@ -0,0 +1,491 @@
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from users.models import User
+
+from .models import (
+    ALL_TABLES_GENERATION_KEY,
+    CacheGeneration,
+    Category,
+    Customer,
+    Product,
+    ReportJob,
+    SPG,
+    SPK,
+    SPKItems,
+    SJ,
+    Stock,
+    StockMovement,
+    Supplier,
+    SuratTransferStok,
+    Warehouse,
+    _beat_report_job,
+    _claim_report_job,
+)
+from .serializers_documents import SJSerializer, SPGSerializer, SuratTransferStokSerializer
+from .views import _cached_count
+
+
+class DeletedDocumentStockTests(TestCase):
+    """
+    Editing a soft-deleted document must not post stock: only restore() does, once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='staff@example.com', username='staff')
+        category = Category.objects.create(name='Category')
+        supplier = Supplier.objects.create(name='Supplier', email='', address='', pic_name='', pic_contact='')
+        cls.warehouse = Warehouse.objects.create(name='Gudang 1')
+        cls.other_warehouse = Warehouse.objects.create(name='Gudang 2')
+        cls.product = Product.objects.create(
+            code='P1', name='Product', category=category, supplier=supplier, supplier_price=1, packing='1x1'
+        )
+        cls.customer = Customer.objects.create(name='Customer', address='', contact_number='')
+
+    def context(self, **kwargs):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.user
+        return dict(request=request, **kwargs)
+
+    def items(self, carton_quantity, pack_quantity):
+        return [{'product': self.product.pk, 'carton_quantity': carton_quantity, 'pack_quantity': pack_quantity}]
+
+    def stock(self, warehouse):
+        stock = Stock.objects.get(product=self.product, warehouse=warehouse)
+        return stock.carton_quantity, stock.pack_quantity
+
+    def assertLedgerMatchesStock(self):
+        for stock in Stock.objects.all():
+            movements = StockMovement.objects.filter(product_id=stock.product_id, warehouse_id=stock.warehouse_id)
+            self.assertEqual(
+                (sum(m.carton_quantity for m in movements), sum(m.pack_quantity for m in movements)),
+                (stock.carton_quantity, stock.pack_quantity),
+            )
+
+    def create_spg(self, carton_quantity, pack_quantity):
+        serializer = SPGSerializer(
+            data={'warehouse': self.warehouse.pk, 'sj_number': 'SJ-1', 'items': self.items(carton_quantity, pack_quantity)},
+            context=self.context(document_type='BAWANG'),
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(user=self.user, document_type='BAWANG')
+
+    def test_edit_deleted_spg_then_restore(self):
+        spg = self.create_spg(10, 5)
+        spg.soft_delete()
+        self.assertEqual(self.stock(self.warehouse), (0, 0))
+
+        serializer = SPGSerializer(
+            SPG.objects.get(pk=spg.pk),
+            data={'warehouse': self.warehouse.pk, 'sj_number': 'SJ-1', 'items': self.items(7, 3)},
+            context=self.context(document_type='BAWANG'),
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.stock(self.warehouse), (0, 0))
+
+        spg = SPG.objects.get(pk=spg.pk)
+        self.assertTrue(spg.is_deleted)
+        spg.restore()
+        self.assertEqual(self.stock(self.warehouse), (7, 3))
+
+        # A repeated restore, even from a stale instance, posts nothing.
+        spg.restore()
+        SPG.objects.get(pk=spg.pk).restore()
+        self.assertEqual(self.stock(self.warehouse), (7, 3))
+        self.assertLedgerMatchesStock()
+
+    def test_edit_deleted_transfer_then_restore(self):
+        self.create_spg(10, 5)
+        serializer = SuratTransferStokSerializer(
+            data={
+                'source_warehouse': self.warehouse.pk,
+                'destination_warehouse': self.other_warehouse.pk,
+                'items': self.items(4, 2),
+            },
+            context=self.context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        transfer = serializer.save(user=self.user)
+        transfer.soft_delete()
+
+        serializer = SuratTransferStokSerializer(
+            SuratTransferStok.objects.get(pk=transfer.pk),
+            data={
+                'source_warehouse': self.warehouse.pk,
+                'destination_warehouse': self.other_warehouse.pk,
+                'items': self.items(6, 1),
+            },
+            context=self.context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.stock(self.warehouse), (10, 5))
+        self.assertEqual(self.stock(self.other_warehouse), (0, 0))
+
+        transfer.restore()
+        transfer.restore()
+        self.assertEqual(self.stock(self.warehouse), (4, 4))
+        self.assertEqual(self.stock(self.other_warehouse), (6, 1))
+        self.assertLedgerMatchesStock()
+
+    def test_edit_deleted_sj_then_restore(self):
+        self.create_spg(10, 5)
+        spk = SPK.objects.create(document_number='SPK-1', customer=self.customer, user=self.user)
+        SPKItems.objects.create(spk=spk, product=self.product, carton_quantity=10, pack_quantity=5)
+        serializer = SJSerializer(
+            data={
+                'spk': spk.pk, 'warehouse': self.warehouse.pk, 'sj_type': 'KA',
+                'vehicle_type': 'Truck', 'vehicle_number': 'B 1', 'items': self.items(3, 1),
+            },
+            context=self.context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        sj = serializer.save(user=self.user)
+        sj.soft_delete()
+        sj.soft_delete()
+        self.assertEqual(self.stock(self.warehouse), (10, 5))
+
+        serializer = SJSerializer(
+            SJ.objects.get(pk=sj.pk),
+            data={
+                'spk': spk.pk, 'warehouse': self.warehouse.pk, 'sj_type': 'KA',
+                'vehicle_type': 'Truck', 'vehicle_number': 'B 1', 'items': self.items(5, 2),
+            },
+            context=self.context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.stock(self.warehouse), (10, 5))
+
+        sj.restore()
+        self.assertEqual(self.stock(self.warehouse), (5, 3))
+        spk_item = SPKItems.objects.get(spk=spk)
+        self.assertEqual((spk_item.fulfilled_carton_quantity, spk_item.fulfilled_pack_quantity), (5, 2))
+        self.assertLedgerMatchesStock()
+
+
+class CacheGenerationTests(TestCase):
+    """
+    Cached entries are keyed by generations kept in the database, so a write committed
+    by another worker process invalidates them in this one.
+    """
+
+    def test_generation_bumped_elsewhere_invalidates_cached_count(self):
+        Warehouse.objects.create(name='Gudang 1')
+        request = Request(APIRequestFactory().get('/api/warehouses/'))
+        self.assertEqual(_cached_count(Warehouse.objects.all(), request), 1)
+
+        # Another worker's write: no signal fires here, only the shared generation moves.
+        Warehouse.objects.bulk_create([Warehouse(name='Gudang 2')])
+        self.assertEqual(_cached_count(Warehouse.objects.all(), request), 1)
+        CacheGeneration.objects.filter(key=ALL_TABLES_GENERATION_KEY).update(generation=F('generation') + 1)
+        self.assertEqual(_cached_count(Warehouse.objects.all(), request), 2)
+
+
+class InventoryAPITestCase(APITestCase):
+    """
+    Two warehouses, two products and a customer, with an authenticated staff client.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='staff@example.com', username='staff')
+        category = Category.objects.create(name='Category')
+        supplier = Supplier.objects.create(name='Supplier', email='', address='', pic_name='', pic_contact='')
+        cls.warehouse = Warehouse.objects.create(name='Gudang 1')
+        cls.other_warehouse = Warehouse.objects.create(name='Gudang 2')
+        cls.product = Product.objects.create(
+            code='P1', name='Product 1', category=category, supplier=supplier, supplier_price=1, packing='1x1'
+        )
+        cls.other_product = Product.objects.create(
+            code='P2', name='Product 2', category=category, supplier=supplier, supplier_price=1, packing='1x1'
+        )
+        cls.customer = Customer.objects.create(name='Customer', address='', contact_number='')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def stock(self, warehouse, product=None):
+        stock = Stock.objects.get(product=product or self.product, warehouse=warehouse)
+        return stock.carton_quantity, stock.pack_quantity
+
+    def assertLedgerMatchesStock(self):
+        ledger = {
+            (row['product_id'], row['warehouse_id']): (row['carton_quantity'], row['pack_quantity'])
+            for row in StockMovement.objects.values('product_id', 'warehouse_id').annotate(
+                carton_quantity=Sum('carton_quantity'),
+                pack_quantity=Sum('pack_quantity'),
+            )
+        }
+        for stock in Stock.objects.all():
+            self.assertEqual(
+                ledger.get((stock.product_id, stock.warehouse_id), (0, 0)),
+                (stock.carton_quantity, stock.pack_quantity),
+            )
+
+    def post(self, url, data, expected_status=status.HTTP_201_CREATED):
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def create_spg(self, lines, warehouse=None):
+        return self.post('/api/spg/bawang/', {
+            'warehouse': (warehouse or self.warehouse).pk,
+            'sj_number': 'SJ-SUPPLIER',
+            'items': [
+                {'product': product.pk, 'carton_quantity': carton_quantity, 'pack_quantity': pack_quantity}
+                for product, carton_quantity, pack_quantity in lines
+            ],
+        })
+
+    def create_spk(self, lines):
+        return self.post('/api/spk/', {
+            'customer': self.customer.pk,
+            'items': [
+                {'product': product.pk, 'carton_quantity': carton_quantity, 'pack_quantity': pack_quantity}
+                for product, carton_quantity, pack_quantity in lines
+            ],
+        })
+
+    def sj_data(self, spk, lines):
+        return {
+            'spk': spk['id'], 'warehouse': self.warehouse.pk, 'sj_type': 'KA',
+            'vehicle_type': 'Truck', 'vehicle_number': 'B 1',
+            'items': [
+                {'product': product.pk, 'carton_quantity': carton_quantity, 'pack_quantity': pack_quantity}
+                for product, carton_quantity, pack_quantity in lines
+            ],
+        }
+
+
+class StockLedgerAPITests(InventoryAPITestCase):
+    """
+    Every document write posts ledger rows that sum to the Stock table.
+    """
+
+    def test_document_writes_keep_ledger_equal_to_stock(self):
+        spg = self.create_spg([(self.product, 10, 5), (self.other_product, 4, 0)])
+        transfer = self.post('/api/stock-transfers/', {
+            'source_warehouse': self.warehouse.pk,
+            'destination_warehouse': self.other_warehouse.pk,
+            'items': [{'product': self.product.pk, 'carton_quantity': 3, 'pack_quantity': 1}],
+        })
+        spk = self.create_spk([(self.product, 5, 2)])
+        sj = self.post('/api/sj/', self.sj_data(spk, [(self.product, 2, 2)]))
+
+        response = self.client.put(f"/api/spg/bawang/{spg['id']}/", {
+            'warehouse': self.warehouse.pk,
+            'sj_number': 'SJ-SUPPLIER',
+            'items': [
+                {'product': self.product.pk, 'carton_quantity': 12, 'pack_quantity': 5},
+                {'product': self.other_product.pk, 'carton_quantity': 1, 'pack_quantity': 0},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.client.delete(f"/api/stock-transfers/{transfer['id']}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(f"/api/sj/{sj['id']}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.post(f"/api/stock-transfers/{transfer['id']}/restore/").status_code, status.HTTP_200_OK
+        )
+
+        self.assertEqual(self.stock(self.warehouse), (9, 4))
+        self.assertEqual(self.stock(self.other_warehouse), (3, 1))
+        self.assertEqual(self.stock(self.warehouse, self.other_product), (1, 0))
+        self.assertLedgerMatchesStock()
+
+
+class StockShortfallAPITests(InventoryAPITestCase):
+    """
+    Stock never goes negative: shortfalls are rejected with 400 and the database CHECK
+    constraints refuse any write that slips past the application.
+    """
+
+    def test_shortfalls_are_rejected_with_400(self):
+        spg = self.create_spg([(self.product, 5, 0)])
+        spk = self.create_spk([(self.product, 10, 0)])
+
+        data = self.post('/api/sj/', self.sj_data(spk, [(self.product, 6, 0)]), status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', data)
+        data = self.post('/api/stock-transfers/', {
+            'source_warehouse': self.warehouse.pk,
+            'destination_warehouse': self.other_warehouse.pk,
+            'items': [{'product': self.product.pk, 'carton_quantity': 6, 'pack_quantity': 0}],
+        }, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', data)
+
+        # Voiding the SPG would take back stock that has already been shipped.
+        self.post('/api/sj/', self.sj_data(spk, [(self.product, 4, 0)]))
+        response = self.client.delete(f"/api/spg/bawang/{spg['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, response.data)
+        self.assertFalse(SPG.objects.get(pk=spg['id']).is_deleted)
+
+        self.assertEqual(self.stock(self.warehouse), (1, 0))
+        self.assertLedgerMatchesStock()
+
+    def test_check_constraints_refuse_negative_stock(self):
+        for field in ('carton_quantity', 'pack_quantity'):
+            with self.subTest(field=field), self.assertRaises(IntegrityError), transaction.atomic():
+                Stock.objects.filter(product=self.product, warehouse=self.warehouse).update(**{field: -1})
+
+
+class SPKFulfillmentAPITests(InventoryAPITestCase):
+    """
+    The fulfilled counters of SPK lines follow the SJs shipped against them through
+    edits, deletes and restores.
+    """
+
+    def fulfilled(self, spk):
+        item = SPKItems.objects.get(spk_id=spk['id'], product=self.product)
+        return item.fulfilled_carton_quantity, item.fulfilled_pack_quantity
+
+    def test_sj_delete_and_restore_shift_fulfilled_counters(self):
+        self.create_spg([(self.product, 20, 10)])
+        spk = self.create_spk([(self.product, 10, 5)])
+        sj = self.post('/api/sj/', self.sj_data(spk, [(self.product, 4, 1)]))
+        other_sj = self.post('/api/sj/', self.sj_data(spk, [(self.product, 2, 2)]))
+        self.assertEqual(self.fulfilled(spk), (6, 3))
+
+        response = self.client.put(f"/api/sj/{sj['id']}/", self.sj_data(spk, [(self.product, 5, 1)]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(self.fulfilled(spk), (7, 3))
+
+        self.assertEqual(self.client.delete(f"/api/sj/{sj['id']}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.fulfilled(spk), (2, 2))
+        self.post('/api/sj/bulk-delete/', {'ids': [sj['id'], other_sj['id']]}, status.HTTP_200_OK)
+        self.assertEqual(self.fulfilled(spk), (0, 0))
+
+        self.assertEqual(self.client.post(f"/api/sj/{sj['id']}/restore/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(f"/api/sj/{sj['id']}/restore/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.fulfilled(spk), (5, 1))
+        self.post('/api/sj/bulk-restore/', {'ids': [other_sj['id']]}, status.HTTP_200_OK)
+        self.assertEqual(self.fulfilled(spk), (7, 3))
+        self.assertEqual(self.stock(self.warehouse), (13, 7))
+        self.assertLedgerMatchesStock()
+
+
+class ReportCacheAPITests(InventoryAPITestCase):
+    """
+    Cached reports are served until a write to one of their tables commits.
+    """
+
+    def stock_info(self):
+        response = self.client.get('/api/report/stock-info/', {'warehouse': self.warehouse.pk, 'paginate': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['product_code']: row['carton_quantity'] for row in response.data}
+
+    def test_document_writes_invalidate_cached_reports(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            spg = self.create_spg([(self.product, 10, 0)])
+        self.assertEqual(self.stock_info(), {'P1': 10})
+
+        # Served from the cache: a write that bumps no generation is not seen.
+        Stock.objects.filter(product=self.other_product, warehouse=self.warehouse).update(carton_quantity=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.stock_info(), {'P1': 10})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/spg/bawang/{spg['id']}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock_info(), {'P2': 3})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_spg([(self.product, 2, 0)])
+        self.assertEqual(self.stock_info(), {'P1': 2, 'P2': 3})
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'sfwarehouse.app'])
+    def test_cached_pagination_links_follow_the_requesting_origin(self):
+        self.create_spg([(self.product, 10, 0), (self.other_product, 2, 0)])
+        params = {'warehouse': self.warehouse.pk, 'page_size': 1}
+
+        response = self.client.get('/api/report/stock-info/', params)
+        self.assertTrue(response.data['next'].startswith('http://testserver/api/report/stock-info/'))
+        response = self.client.get('/api/report/stock-info/', params, HTTP_HOST='sfwarehouse.app', secure=True)
+        self.assertTrue(response.data['next'].startswith('https://sfwarehouse.app/api/report/stock-info/'))
+
+
+class StockItemsReportAPITests(InventoryAPITestCase):
+    """
+    The stock in/out items reports list one row per live document line.
+    """
+
+    def test_items_reports_list_document_lines(self):
+        spg = self.create_spg([(self.product, 10, 5), (self.other_product, 3, 0)])
+        spk = self.create_spk([(self.product, 8, 2)])
+        sj = self.post('/api/sj/', self.sj_data(spk, [(self.product, 4, 1)]))
+        deleted_sj = self.post('/api/sj/', self.sj_data(spk, [(self.product, 1, 0)]))
+        self.assertEqual(self.client.delete(f"/api/sj/{deleted_sj['id']}/").status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/report/stock-in-items/', {'product': self.product.pk, 'paginate': 'false'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['document_number'], row['warehouse_name'], row['product_code'], row['carton_quantity'], row['pack_quantity'])
+             for row in response.data],
+            [(spg['document_number'], 'Gudang 1', 'P1', 10, 5)],
+        )
+
+        response = self.client.get('/api/report/stock-out-items/', {'warehouse': self.warehouse.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        row = response.data['results'][0]
+        self.assertEqual(
+            (row['document_number'], row['spk_document_number'], row['product_code'], row['carton_quantity']),
+            (sj['document_number'], spk['document_number'], 'P1', 4),
+        )
+
+        response = self.client.get('/api/report/stock-out-items/', {'export': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['document_number', 'transaction_date', 'spk_document_number'])
+        self.assertEqual(len(lines), 2)
+
+
+class ReportJobAPITests(InventoryAPITestCase):
+    """
+    Report jobs are checked when queued, and only a job whose worker stopped beating
+    is claimed again.
+    """
+
+    def test_invalid_params_are_rejected_when_queued(self):
+        for report, params in (
+            ('stock-balance', {}),
+            ('stock-balance', {'start_date': '2026-10-02', 'end_date': '2026-10-01'}),
+            ('stock-card', {'start_date': '2026-10-01', 'end_date': '2026-10-31'}),
+            ('stock-aging', {'bucket': 'never'}),
+            ('stock-info', {'warehouse': 'main'}),
+        ):
+            response = self.client.post('/api/report/jobs/', {'report': report, 'params': params}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (report, params))
+            self.assertIn('params', response.data)
+        self.assertFalse(ReportJob.objects.exists())
+
+        response = self.client.post(
+            '/api/report/jobs/',
+            {'report': 'stock-balance', 'params': {'start_date': '2026-10-01', 'end_date': '2026-10-31'}},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(ReportJob.objects.get().status, ReportJob.STATUS_PENDING)
+
+    def test_running_job_is_reclaimed_only_after_its_heartbeat_stops(self):
+        ReportJob.objects.create(user=self.user, report='stock-info')
+        job = _claim_report_job(timezone.now())
+        self.assertEqual((job.status, job.attempts), (ReportJob.STATUS_RUNNING, 1))
+
+        # Long past its start, but still beating: not stale.
+        ReportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - datetime.timedelta(hours=3))
+        self.assertTrue(_beat_report_job(job))
+        self.assertIsNone(_claim_report_job(timezone.now() - datetime.timedelta(minutes=5)))
+
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(minutes=10))
+        reclaimed = _claim_report_job(timezone.now() - datetime.timedelta(minutes=5))
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+        # The first worker's heartbeats no longer land on the reclaimed attempt.
+        self.assertFalse(_beat_report_job(job))
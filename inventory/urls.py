@@ -13,6 +13,8 @@ from .views import (
     SJViewSet,
     SuratLainViewSet,
     StockInfoReportView,
+    StockBalanceReportView,
+    StockCardReportView,
     StockTransferReportView,
     ReturPenjualanReportView,
     ReturPembelianReportView,
@@ -20,7 +22,13 @@ from .views import (
     PengeluaranBarangReportView,
     StockAdjustmentViewSet,
     StockInReportView,
+    SPKBacklogReportView,
     StockOutReportView,
+    StockInItemsReportView,
+    StockOutItemsReportView,
+    ReportJobViewSet,
+    StockAgingReportView,
+    ReportDashboardView,
 )
 
 router = DefaultRouter()
@@ -34,6 +42,7 @@ router.register(r'stock-transfers', SuratTransferStokViewSet, basename='stock-tr
 router.register(r'spk', SPKViewSet, basename='spk')
 router.register(r'sj', SJViewSet, basename='sj')
 router.register(r'stock-adjustments', StockAdjustmentViewSet, basename='stock-adjustment')
+router.register(r'report/jobs', ReportJobViewSet, basename='report-job')
 spg_list = SPGViewSet.as_view({
     'get': 'list',
     'post': 'create'
@@ -47,6 +56,12 @@ spg_detail = SPGViewSet.as_view({
 spg_restore = SPGViewSet.as_view({
     'post': 'restore'
 })
+spg_bulk_delete = SPGViewSet.as_view({
+    'post': 'bulk_delete'
+})
+spg_bulk_restore = SPGViewSet.as_view({
+    'post': 'bulk_restore'
+})
 
 surat_lain_list = SuratLainViewSet.as_view({
     'get': 'list',
@@ -61,16 +76,28 @@ surat_lain_detail = SuratLainViewSet.as_view({
 surat_lain_restore = SuratLainViewSet.as_view({
     'post': 'restore'
 })
+surat_lain_bulk_delete = SuratLainViewSet.as_view({
+    'post': 'bulk_delete'
+})
+surat_lain_bulk_restore = SuratLainViewSet.as_view({
+    'post': 'bulk_restore'
+})
 
 urlpatterns = [
     path('', include(router.urls)),
     path('spg/<str:document_type>/', spg_list, name='spg-list'),
     path('spg/<str:document_type>/<int:pk>/', spg_detail, name='spg-detail'),
     path('spg/<str:document_type>/<int:pk>/restore/', spg_restore, name='spg-restore'),
+    path('spg/<str:document_type>/bulk-delete/', spg_bulk_delete, name='spg-bulk-delete'),
+    path('spg/<str:document_type>/bulk-restore/', spg_bulk_restore, name='spg-bulk-restore'),
     path('<str:document_type_slug>/', surat_lain_list, name='surat-lain-list'),
     path('<str:document_type_slug>/<int:pk>/', surat_lain_detail, name='surat-lain-detail'),
     path('<str:document_type_slug>/<int:pk>/restore/', surat_lain_restore, name='surat-lain-restore'),
+    path('<str:document_type_slug>/bulk-delete/', surat_lain_bulk_delete, name='surat-lain-bulk-delete'),
+    path('<str:document_type_slug>/bulk-restore/', surat_lain_bulk_restore, name='surat-lain-bulk-restore'),
     path('report/stock-info/', StockInfoReportView.as_view(), name='report-stock-info'),
+    path('report/stock-balance/', StockBalanceReportView.as_view(), name='report-stock-balance'),
+    path('report/stock-card/', StockCardReportView.as_view(), name='report-stock-card'),
     path('report/stock-transfer/', StockTransferReportView.as_view(), name='report-stock-transfer'),
     path('report/retur-pembelian/', ReturPembelianReportView.as_view(), name='report-retur-pembelian'),
     path('report/retur-penjualan/', ReturPenjualanReportView.as_view(), name='report-retur-penjualan'),
@@ -78,4 +105,9 @@ urlpatterns = [
     path('report/pengeluaran-barang/', PengeluaranBarangReportView.as_view(), name='report-pengeluaran-barang'),
     path('report/stock-out/', StockOutReportView.as_view(), name='report-stock-out'),
     path('report/stock-in/', StockInReportView.as_view(), name='report-stock-in'),
+    path('report/stock-out-items/', StockOutItemsReportView.as_view(), name='report-stock-out-items'),
+    path('report/stock-in-items/', StockInItemsReportView.as_view(), name='report-stock-in-items'),
+    path('report/spk-backlog/', SPKBacklogReportView.as_view(), name='report-spk-backlog'),
+    path('report/stock-aging/', StockAgingReportView.as_view(), name='report-stock-aging'),
+    path('report/dashboard/', ReportDashboardView.as_view(), name='report-dashboard'),
 ]
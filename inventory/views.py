@@ -2,10 +2,31 @@ from rest_framework import viewsets, status, serializers, generics, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Sum, F
-from django.db.models.functions import Lower
-from .models import Category, Supplier, Product, Warehouse, Stock, Customer, SPG, SuratTransferStok, SPK, SJ, SuratLain, SuratTransferStokItems, SuratLainItems, StockAdjustment, SJItems, SPGItems
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connection, connections
+from django.db.models import Q, Sum, F, Value
+from django.db.models.functions import Greatest, Lower, TruncDate
+from django.http import FileResponse, HttpRequest, QueryDict
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_date, parse_datetime
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import os
+import time
+from .models import Category, Supplier, Product, Warehouse, Stock, Customer, SPG, SuratTransferStok, SPK, SJ, SuratLain, SuratTransferStokItems, SuratLainItems, StockAdjustment, SJItems, SPGItems, SPKItems, DailyMovementTotal, StockMovement, ReportJob, InsufficientStockError, _daily_closing_balances, _data_generation, _report_cache, _set_documents_deleted, _stock_balances_as_of, _stock_card, _stock_aging, _local_day_start, _table_generations, STOCK_AGING_BUCKETS
 from .serializers import (
     CategorySerializer,
     SupplierSerializer,
@@ -24,8 +45,18 @@ from .serializers import (
     ReturnReportSerializer,
     DocumentSummaryReportSerializer,
     StockAdjustmentSerializer,
+    StockAsOfSerializer,
+    StockBalanceReportSerializer,
+    StockCardMovementSerializer,
+    StockAgingReportSerializer,
+    StockAgingSummarySerializer,
     StockReportSerializer,
+    StockInItemReportSerializer,
+    StockOutItemReportSerializer,
+    SPKBacklogReportSerializer,
+    ReportJobSerializer,
 )
+from .exports import ReportExportMixin, _export_chunks
 from .filters import (
     StockInfoReportFilter,
     StockTransferReportFilter,
@@ -38,6 +69,9 @@ from .filters import (
     StockFilter,
     StockOutReportFilter,
     StockInReportFilter,
+    StockInTotalsFilter,
+    StockOutTotalsFilter,
+    SPKBacklogReportFilter,
 )
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -156,6 +190,31 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated]
 
+def _parse_as_of_cutoff(value):
+    """
+    Turns the `date` query parameter into an exclusive ledger cutoff. A date-only value
+    covers that whole day; a datetime includes movements at that exact instant.
+    """
+    if not value:
+        return None
+
+    try:
+        as_of_date = parse_date(value)
+        if as_of_date is not None:
+            cutoff = datetime.datetime.combine(as_of_date + datetime.timedelta(days=1), datetime.time.min)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                return None
+            cutoff = moment + datetime.timedelta(microseconds=1)
+    except ValueError:
+        return None
+
+    if timezone.is_naive(cutoff):
+        cutoff = timezone.make_aware(cutoff, timezone.get_current_timezone())
+    return cutoff
+
+
 class StockViewSet(
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -176,7 +235,7 @@ class StockViewSet(
         return queryset
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'by_warehouse', 'by_product']:
+        if self.action in ['list', 'retrieve', 'by_warehouse', 'by_product', 'as_of']:
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
@@ -214,6 +273,38 @@ class StockViewSet(
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(detail=False, methods=['GET'], url_path='as-of')
+    def as_of(self, request):
+        cutoff = _parse_as_of_cutoff(request.query_params.get('date'))
+        if cutoff is None:
+            return Response(
+                {"error": "date is required (YYYY-MM-DD or ISO 8601 datetime)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        warehouse_id = request.query_params.get('warehouse')
+        stocks = self.filter_queryset(self.get_queryset())
+        if warehouse_id:
+            if not warehouse_id.isdigit():
+                return Response(
+                    {"error": "warehouse must be a warehouse id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            warehouse_id = int(warehouse_id)
+            stocks = stocks.filter(warehouse_id=warehouse_id)
+        else:
+            warehouse_id = None
+
+        balances = _stock_balances_as_of(cutoff, warehouse_id)
+        stocks = list(stocks)
+        for stock in stocks:
+            balance = balances.get((stock.product_id, stock.warehouse_id), {})
+            stock.as_of_carton_quantity = balance.get('carton_quantity', 0)
+            stock.as_of_pack_quantity = balance.get('pack_quantity', 0)
+
+        serializer = StockAsOfSerializer(stocks, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
     def update(self, request, *args, **kwargs):
         stock = self.get_object()
         if stock.product.is_deleted:
@@ -272,14 +363,104 @@ class CustomerViewSet(viewsets.ModelViewSet):
             )
 
 
+# Exact list counts are cached per filter signature for this long, or until the next
+# write to a tracked table.
+LIST_COUNT_CACHE_TIMEOUT = 300
+
+# Query parameters that select a page or an output format rather than filter rows.
+_COUNT_IGNORED_PARAMS = {'page', 'page_size', 'paginate', 'pagination', 'cursor', 'count', 'export', 'engine'}
+
+
+def _estimated_count(queryset):
+    """
+    Returns the planner's row estimate for `queryset`, which comes from the table
+    statistics instead of a scan of the matching rows.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _request_digest(request, ignored_params=(), origin=''):
+    """
+    Hashes the request path and its query parameters, in a normalized order and without
+    `ignored_params`, into a cache key component. `origin` is hashed along for entries
+    that embed absolute links.
+    """
+    signature = sorted(
+        (key, value)
+        for key, values in request.query_params.lists() if key not in ignored_params
+        for value in values
+    )
+    return hashlib.sha1(json.dumps([origin, request.path, signature]).encode()).hexdigest()
+
+
+def _cached_count(queryset, request):
+    """
+    Returns the exact count of `queryset`, cached under the request path and its filter
+    parameters until any tracked table is written.
+    """
+    report_cache = _report_cache()
+    cache_key = f'inventory:list-count:{_data_generation()}:{_request_digest(request, _COUNT_IGNORED_PARAMS)}'
+    count = report_cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        report_cache.set(cache_key, count, LIST_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class _CountedPaginator(Paginator):
+    """
+    Paginator taking its count from `count_source`, which returns (count, exact).
+    Pages past an inexact count are served (possibly empty) instead of raising.
+    """
+    def __init__(self, object_list, per_page, count_source, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_source = count_source
+        self.count_exact = True
+
+    @cached_property
+    def count(self):
+        count, self.count_exact = self.count_source(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_exact or int(number) < 1:
+                raise
+            return int(number)
+
+
 class CustomPagination(PageNumberPagination):
+    """
+    Page number pagination. The exact count is cached per filter signature until the
+    next write to a tracked table; `?count=estimate` reports the planner's estimate instead,
+    which costs no scan of the filtered rows. `count_exact` tells which one was used.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+    def django_paginator_class(self, queryset, page_size):
+        return _CountedPaginator(queryset, page_size, self.count_queryset)
+
+    def count_queryset(self, queryset):
+        if isinstance(queryset, list):
+            return len(queryset), True
+        if self.request.query_params.get('count') == 'estimate' and connection.vendor == 'postgresql':
+            return _estimated_count(queryset), False
+        return _cached_count(queryset, self.request), True
+
     def get_paginated_response(self, data):
         return Response({
             'count': self.page.paginator.count,
+            'count_exact': self.page.paginator.count_exact,
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'next': self.get_next_link(),
@@ -288,23 +469,270 @@ class CustomPagination(PageNumberPagination):
         })
 
 
+def _keyset_value(row, field_name):
+    field_name = field_name.lstrip('-')
+    if isinstance(row, dict) and field_name in row:
+        return row[field_name]
+
+    value = row
+    for part in field_name.split('__'):
+        value = value[part] if isinstance(value, dict) else getattr(value, part)
+    return value
+
+
+def _keyset_filter(ordering, values, reverse=False):
+    """
+    Builds the filter selecting the rows after `values` in `ordering` (before them when
+    `reverse`), i.e. a row comparison on the composite key. The leading field is also
+    bounded on its own so the index on it can be range-scanned.
+    """
+    def lookup(field_name, strict):
+        descending = field_name.startswith('-') != reverse
+        return f"{field_name.lstrip('-')}__{'lt' if descending else 'gt'}{'' if strict else 'e'}"
+
+    condition = Q()
+    for index, field_name in enumerate(ordering):
+        step = Q(**{lookup(field_name, True): values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return Q(**{lookup(ordering[0], False): values[0]}) & condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique composite key, e.g. ('-created_at', '-id'). Pages
+    are selected by a key comparison instead of an offset and no total count is taken,
+    so any page costs the same as the first one. The cursor encodes the key of the
+    last (or first, for previous links) row of the current page.
+    """
+    cursor_query_param = 'cursor'
+    page_size = CustomPagination.page_size
+    page_size_query_param = CustomPagination.page_size_query_param
+    max_page_size = CustomPagination.max_page_size
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = [field_name[1:] if field_name.startswith('-') else f'-{field_name}' for field_name in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(_keyset_filter(self.ordering, position, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.row_key(rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self.row_key(rows[0])
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def row_key(self, row):
+        return [_keyset_value(row, field_name) for field_name in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor['p'], bool(cursor.get('r'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = {'p': [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.encode_cursor(self.next_position, False) if self.next_position else None,
+            'previous': self.encode_cursor(self.previous_position, True) if self.previous_position else None,
+            'results': data
+        })
+
+
 class OptionalPagination(CustomPagination):
     """
     A custom pagination class that allows disabling pagination via a query parameter.
     To disable pagination, add `?paginate=false` to the request URL.
+    Views that define `cursor_ordering` also accept `?pagination=cursor`, which pages
+    with KeysetPagination on that key instead of page numbers.
     """
+    keyset = None
+
     def paginate_queryset(self, queryset, request, view=None):
         if request.query_params.get('paginate', '').lower() == 'false':
             return None
 
+        cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if request.query_params.get('pagination') == 'cursor' and cursor_ordering:
+            self.keyset = KeysetPagination(cursor_ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+
         return super().paginate_queryset(queryset, request, view)
 
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ValuesReportMixin:
+    """
+    Reads a report as flat `.values()` rows named after its `copy_columns`, so no model
+    instances or related objects are built per row; the view's ValuesRowSerializer
+    renders them by key. Filters and ordering still apply to the model queryset, and the
+    fields of `cursor_ordering` are fetched alongside for keyset pagination.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = [
+            field_name.lstrip('-') for field_name in getattr(self, 'cursor_ordering', None) or ()
+            if field_name.lstrip('-') not in self.copy_columns
+        ]
+        expressions = {}
+        for name, expression in self.copy_columns.items():
+            if expression == name:
+                fields.append(name)
+            else:
+                expressions[name] = F(expression) if isinstance(expression, str) else expression
+        return queryset.values(*fields, **expressions)
+
+
+class ReportCacheMixin:
+    """
+    Caches the JSON response of a report per view and normalized query parameters, keyed
+    by the generations of `cache_tables`, the models the report reads. Writes to any of
+    those tables move their generation on, so an entry is never served after the data
+    behind it changed. Paginated responses hold absolute next/previous links, so entries
+    are also kept per scheme and host. Exports are streamed and never cached.
+    """
+    cache_tables = ()
+
+    def cache_variant(self):
+        """
+        Extra cache key part for reports whose result depends on more than the query
+        parameters and the data, such as today's date.
+        """
+        return ''
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(ReportCacheMixin, self).list(request, *args, **kwargs))
+
+    def cached_response(self, request, build_response):
+        if not self.cache_tables or request.query_params.get('export'):
+            return build_response()
+
+        generations = '-'.join(str(generation) for generation in _table_generations(self.cache_tables))
+        digest = _request_digest(request, origin=request.build_absolute_uri('/'))
+        cache_key = f'inventory:report:{type(self).__name__}{self.cache_variant()}:{generations}:{digest}'
+        report_cache = _report_cache()
+        data = report_cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = build_response()
+        if response.status_code == status.HTTP_200_OK:
+            report_cache.set(cache_key, response.data, settings.REPORT_CACHE_TIMEOUT)
+        return response
 
-class SPGViewSet(viewsets.ModelViewSet):
+
+class StockShortfallMixin:
+    """
+    Reports stock shortfalls raised while deleting or restoring documents as
+    non-field validation errors, the same way the document serializers do.
+    """
+    def handle_exception(self, exc):
+        if isinstance(exc, InsufficientStockError):
+            exc = serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: exc.messages})
+        return super().handle_exception(exc)
+
+
+class BulkSoftDeleteMixin:
+    """
+    Adds bulk-delete/ and bulk-restore/ actions that void or restore up to
+    BULK_SOFT_DELETE_LIMIT documents of the view in one transaction.
+    Expects {"ids": [...]}; ids outside the view or already in the target state are skipped.
+    """
+    BULK_SOFT_DELETE_LIMIT = 1000
+
+    @action(detail=False, methods=['POST'], url_path='bulk-delete')
+    def bulk_delete(self, request, *args, **kwargs):
+        return self._bulk_set_deleted(request, deleted=True)
+
+    @action(detail=False, methods=['POST'], url_path='bulk-restore')
+    def bulk_restore(self, request, *args, **kwargs):
+        return self._bulk_set_deleted(request, deleted=False)
+
+    def _bulk_set_deleted(self, request, deleted):
+        ids = request.data.get('ids')
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)
+        ):
+            return Response(
+                {"error": "ids must be a non-empty list of document ids"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.BULK_SOFT_DELETE_LIMIT:
+            return Response(
+                {"error": f"At most {self.BULK_SOFT_DELETE_LIMIT} documents can be processed at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        allowed_ids = list(queryset.filter(pk__in=ids).values_list('pk', flat=True))
+        documents = _set_documents_deleted(queryset.model, allowed_ids, deleted)
+
+        processed_ids = {document.pk for document in documents}
+        return Response(
+            {
+                'message': f"{len(documents)} documents have been {'deleted' if deleted else 'restored'}",
+                'document_numbers': [document.document_number for document in documents],
+                'skipped_ids': [pk for pk in ids if pk not in processed_ids],
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class SPGViewSet(StockShortfallMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     serializer_class = SPGSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = SPGFilter
     pagination_class = OptionalPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         document_type = self.kwargs.get('document_type', '').upper()
@@ -316,7 +744,7 @@ class SPGViewSet(viewsets.ModelViewSet):
             'items__product__category',
         )
 
-        if self.action == 'restore':
+        if self.action in ['restore', 'bulk_restore']:
             return queryset.filter(is_deleted=True)
 
         view_type = self.request.query_params.get('view', 'active')
@@ -357,11 +785,12 @@ class SPGViewSet(viewsets.ModelViewSet):
         )
 
 
-class SuratTransferStokViewSet(viewsets.ModelViewSet):
+class SuratTransferStokViewSet(StockShortfallMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     serializer_class = SuratTransferStokSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = SuratTransferStokFilter
     pagination_class = OptionalPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         queryset = SuratTransferStok.objects.all().select_related(
@@ -373,7 +802,7 @@ class SuratTransferStokViewSet(viewsets.ModelViewSet):
             'items__product__category',
         )
 
-        if self.action == 'restore':
+        if self.action in ['restore', 'bulk_restore']:
             return queryset.filter(is_deleted=True)
 
         view_type = self.request.query_params.get('view', 'active')
@@ -409,6 +838,7 @@ class SPKViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filterset_class = SPKFilter
     pagination_class = OptionalPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         queryset = SPK.objects.all().select_related('customer', 'user').prefetch_related(
@@ -447,10 +877,11 @@ class SPKViewSet(viewsets.ModelViewSet):
         )
 
 
-class SJViewSet(viewsets.ModelViewSet):
+class SJViewSet(StockShortfallMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     serializer_class = SJSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-created_at', '-id')
     filterset_class = SJFilter
 
     def get_queryset(self):
@@ -459,7 +890,7 @@ class SJViewSet(viewsets.ModelViewSet):
             'items__product__category',
         )
 
-        if self.action == 'restore':
+        if self.action in ['restore', 'bulk_restore']:
             return queryset.filter(is_deleted=True)
 
         view_type = self.request.query_params.get('view', 'active')
@@ -490,11 +921,12 @@ class SJViewSet(viewsets.ModelViewSet):
         )
 
 
-class SuratLainViewSet(viewsets.ModelViewSet):
+class SuratLainViewSet(StockShortfallMixin, BulkSoftDeleteMixin, viewsets.ModelViewSet):
     serializer_class = SuratLainSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = SuratLainFilter
     pagination_class = OptionalPagination
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         """
@@ -524,7 +956,7 @@ class SuratLainViewSet(viewsets.ModelViewSet):
         )
 
         # For the 'restore' action, we must look in the deleted items
-        if self.action == 'restore':
+        if self.action in ['restore', 'bulk_restore']:
             return queryset.filter(is_deleted=True)
 
         # For all other actions, use the 'view' query parameter
@@ -572,56 +1004,233 @@ class SuratLainViewSet(viewsets.ModelViewSet):
         return Response({'message': f'Document {instance.document_number} has been restored'}, status=status.HTTP_200_OK)
 
 
-class StockInfoReportView(generics.ListAPIView):
+class StockInfoReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     """
     Provides a report of all stock levels for all products in all warehouses.
     """
     serializer_class = StockInfoReportSerializer
+    cache_tables = (Stock, Product, Category, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
     filterset_class = StockInfoReportFilter
+    copy_columns = {
+        'product_code': 'product__code',
+        'product_name': 'product__name',
+        'product_category': 'product__category__name',
+        'supplier_name': 'product__supplier__name',
+        'packing': 'product__packing',
+        'carton_quantity': 'carton_quantity',
+        'pack_quantity': 'pack_quantity',
+        'warehouse_name': 'warehouse__name',
+    }
 
     def get_queryset(self):
         queryset = Stock.objects.filter(
             product__is_deleted=False
+        ).filter(
+            Q(carton_quantity__gt=0) | Q(pack_quantity__gt=0)
+        ).order_by('product__category__sort_order', Lower('product__name'))
+
+        return queryset
+
+
+def _parse_report_date(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+class StockBalanceReportView(ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
+    """
+    Provides the opening and closing balance of every stock record over a date range,
+    read from the daily closing snapshots.
+    """
+    serializer_class = StockBalanceReportSerializer
+    cache_tables = (Stock, StockMovement, Product, Category, Supplier, Warehouse)
+    permission_classes = [IsAuthenticated]
+    pagination_class = OptionalPagination
+    filterset_class = StockInfoReportFilter
+
+    def get_queryset(self):
+        return Stock.objects.filter(
+            product__is_deleted=False
         ).select_related(
             'product__category',
             'product__supplier',
             'warehouse',
-        ).filter(
-            Q(carton_quantity__gt=0) | Q(pack_quantity__gt=0)
         ).order_by('product__category__sort_order', Lower('product__name'))
 
-        return queryset
+    def params_error(self, request):
+        start_date = _parse_report_date(request.query_params.get('start_date'))
+        end_date = _parse_report_date(request.query_params.get('end_date'))
+        if start_date is None or end_date is None or start_date > end_date:
+            return "start_date and end_date are required (YYYY-MM-DD) and start_date must not be after end_date"
+
+        warehouse_id = request.query_params.get('warehouse')
+        if warehouse_id and not warehouse_id.isdigit():
+            return "warehouse must be a warehouse id"
+        return None
+
+    def list(self, request, *args, **kwargs):
+        error = self.params_error(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        start_date = _parse_report_date(request.query_params.get('start_date'))
+        end_date = _parse_report_date(request.query_params.get('end_date'))
+        warehouse_id = request.query_params.get('warehouse')
+        warehouse_id = int(warehouse_id) if warehouse_id else None
+
+        queryset = self.filter_queryset(self.get_queryset())
+        opening = _daily_closing_balances(start_date - datetime.timedelta(days=1), warehouse_id)
+        closing = _daily_closing_balances(end_date, warehouse_id)
+
+        export_format = request.query_params.get('export')
+        if export_format:
+            return self.export(
+                (stock for chunk in _export_chunks(queryset) for stock in self._attach_balances(chunk, opening, closing)),
+                export_format,
+            )
+
+        page = self.paginate_queryset(queryset)
+        stocks = page if page is not None else list(queryset)
+        self._attach_balances(stocks, opening, closing)
+
+        serializer = self.get_serializer(stocks, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def _attach_balances(self, stocks, opening, closing):
+        for stock in stocks:
+            key = (stock.product_id, stock.warehouse_id)
+            stock.opening_carton_quantity = opening.get(key, {}).get('carton_quantity', 0)
+            stock.opening_pack_quantity = opening.get(key, {}).get('pack_quantity', 0)
+            stock.closing_carton_quantity = closing.get(key, {}).get('carton_quantity', 0)
+            stock.closing_pack_quantity = closing.get(key, {}).get('pack_quantity', 0)
+        return stocks
 
 
-class StockTransferReportView(generics.ListAPIView):
+class StockCardReportView(ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
+    """
+    Provides the stock card (kartu stok) of one product in one warehouse: the opening
+    balance at start_date, every movement up to end_date in chronological order with
+    its running balance, and the closing balance. Read from the stock ledger.
+    """
+    serializer_class = StockCardMovementSerializer
+    cache_tables = (StockMovement, Product, Warehouse)
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: self.stock_card(request))
+
+    def params_error(self, request):
+        product_id = request.query_params.get('product', '')
+        warehouse_id = request.query_params.get('warehouse', '')
+        if not product_id.isdigit() or not warehouse_id.isdigit():
+            return "product and warehouse are required"
+
+        start_date = _parse_report_date(request.query_params.get('start_date'))
+        end_date = _parse_report_date(request.query_params.get('end_date'))
+        if start_date is None or end_date is None or start_date > end_date:
+            return "start_date and end_date are required (YYYY-MM-DD) and start_date must not be after end_date"
+        return None
+
+    def stock_card(self, request):
+        error = self.params_error(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        start_date = _parse_report_date(request.query_params.get('start_date'))
+        end_date = _parse_report_date(request.query_params.get('end_date'))
+        product = get_object_or_404(Product, pk=request.query_params['product'])
+        warehouse = get_object_or_404(Warehouse, pk=request.query_params['warehouse'])
+        opening, movements = _stock_card(
+            product.pk,
+            warehouse.pk,
+            _local_day_start(start_date),
+            _local_day_start(end_date + datetime.timedelta(days=1)),
+        )
+
+        export_format = request.query_params.get('export')
+        if export_format:
+            return self.export(movements, export_format)
+
+        closing = movements[-1] if movements else None
+        return Response({
+            'product': product.pk,
+            'product_code': product.code,
+            'product_name': product.name,
+            'packing': product.packing,
+            'warehouse': warehouse.pk,
+            'warehouse_name': warehouse.name,
+            'opening_carton_quantity': opening['carton_quantity'],
+            'opening_pack_quantity': opening['pack_quantity'],
+            'closing_carton_quantity': closing['balance_carton_quantity'] if closing else opening['carton_quantity'],
+            'closing_pack_quantity': closing['balance_pack_quantity'] if closing else opening['pack_quantity'],
+            'movements': self.get_serializer(movements, many=True).data,
+        })
+
+
+class StockTransferReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     """
     Provides a summary report of all items in active (not deleted) stock transfers.
     """
     serializer_class = StockTransferReportSerializer
+    cache_tables = (SuratTransferStok, Product, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-surat_transfer_stok__created_at', '-id')
     filterset_class = StockTransferReportFilter
-
-    queryset = SuratTransferStokItems.objects.filter(surat_transfer_stok__is_deleted=False).select_related(
-        'surat_transfer_stok',
-        'product',
-        'product__supplier',
-        'surat_transfer_stok__source_warehouse',
-        'surat_transfer_stok__destination_warehouse',
+    copy_columns = {
+        'document_number': 'surat_transfer_stok__document_number',
+        'transaction_date': TruncDate('surat_transfer_stok__transaction_date'),
+        'product_name': 'product__name',
+        'supplier_name': 'product__supplier__name',
+        'packing': 'product__packing',
+        'carton_quantity': 'carton_quantity',
+        'pack_quantity': 'pack_quantity',
+        'source_warehouse': 'surat_transfer_stok__source_warehouse__name',
+        'destination_warehouse': 'surat_transfer_stok__destination_warehouse__name',
+    }
+
+    queryset = SuratTransferStokItems.objects.filter(
+        surat_transfer_stok__is_deleted=False
     ).order_by('-surat_transfer_stok__created_at')
 
 
-class ReturPembelianReportView(generics.ListAPIView):
+_DOCUMENT_REPORT_COPY_COLUMNS = {
+    'document_number': 'surat_lain__document_number',
+    'transaction_date': TruncDate('surat_lain__transaction_date'),
+    'sj_number': 'surat_lain__sj_number',
+    'supplier_name': 'product__supplier__name',
+    'warehouse_name': 'surat_lain__warehouse__name',
+    'product_code': 'product__code',
+    'product_name': 'product__name',
+    'packing': 'product__packing',
+    'carton_quantity': 'carton_quantity',
+    'pack_quantity': 'pack_quantity',
+    'notes': 'surat_lain__notes',
+}
+_RETURN_REPORT_COPY_COLUMNS = {
+    name: expression for name, expression in _DOCUMENT_REPORT_COPY_COLUMNS.items()
+    if name != 'sj_number'
+}
+
+
+class ReturPembelianReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     serializer_class = DocumentSummaryReportSerializer
+    cache_tables = (SuratLain, Product, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-surat_lain__transaction_date', '-id')
     filterset_class = ReturnReportFilter
+    copy_columns = _RETURN_REPORT_COPY_COLUMNS
     queryset = SuratLainItems.objects.filter(
         surat_lain__document_type='RETUR_PEMBELIAN',
         surat_lain__is_deleted=False
-    ).select_related('surat_lain', 'product', 'product__supplier', 'surat_lain__warehouse').order_by('-surat_lain__transaction_date')
+    ).order_by('-surat_lain__transaction_date')
 
     def get_serializer_context(self):
         """Pass report_type to the serializer."""
@@ -630,15 +1239,18 @@ class ReturPembelianReportView(generics.ListAPIView):
         return context
 
 
-class ReturPenjualanReportView(generics.ListAPIView):
+class ReturPenjualanReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     serializer_class = DocumentSummaryReportSerializer
+    cache_tables = (SuratLain, Product, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-surat_lain__transaction_date', '-id')
     filterset_class = ReturnReportFilter
+    copy_columns = _RETURN_REPORT_COPY_COLUMNS
     queryset = SuratLainItems.objects.filter(
         surat_lain__document_type='RETUR_PENJUALAN',
         surat_lain__is_deleted=False
-    ).select_related('surat_lain', 'product', 'product__supplier', 'surat_lain__warehouse').order_by('-surat_lain__transaction_date')
+    ).order_by('-surat_lain__transaction_date')
 
     def get_serializer_context(self):
         """Pass report_type to the serializer."""
@@ -647,15 +1259,18 @@ class ReturPenjualanReportView(generics.ListAPIView):
         return context
 
 
-class PenerimaanBarangReportView(generics.ListAPIView):
+class PenerimaanBarangReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     serializer_class = DocumentSummaryReportSerializer
+    cache_tables = (SuratLain, Product, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-surat_lain__transaction_date', '-id')
     filterset_class = ReturnReportFilter
+    copy_columns = _DOCUMENT_REPORT_COPY_COLUMNS
     queryset = SuratLainItems.objects.filter(
         surat_lain__document_type='STB',
         surat_lain__is_deleted=False
-    ).select_related('surat_lain', 'product', 'product__supplier', 'surat_lain__warehouse').order_by('-surat_lain__transaction_date')
+    ).order_by('-surat_lain__transaction_date')
 
     def get_serializer_context(self):
         """Pass report_type to the serializer."""
@@ -664,15 +1279,18 @@ class PenerimaanBarangReportView(generics.ListAPIView):
         return context
 
 
-class PengeluaranBarangReportView(generics.ListAPIView):
+class PengeluaranBarangReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
     serializer_class = DocumentSummaryReportSerializer
+    cache_tables = (SuratLain, Product, Supplier, Warehouse)
     permission_classes = [IsAuthenticated]
     pagination_class = OptionalPagination
+    cursor_ordering = ('-surat_lain__transaction_date', '-id')
     filterset_class = ReturnReportFilter
+    copy_columns = _DOCUMENT_REPORT_COPY_COLUMNS
     queryset = SuratLainItems.objects.filter(
         surat_lain__document_type='SPB',
         surat_lain__is_deleted=False
-    ).select_related('surat_lain', 'product', 'product__supplier', 'surat_lain__warehouse').order_by('-surat_lain__transaction_date')
+    ).order_by('-surat_lain__transaction_date')
 
     def get_serializer_context(self):
         """Pass report_type to the serializer."""
@@ -700,21 +1318,29 @@ class StockAdjustmentViewSet(
         serializer.save(user=self.request.user)
 
 
-class StockOutReportView(generics.ListAPIView):
+class DailyTotalsReportMixin:
     """
-    API view for the stock out report.
+    Serves a stock in/out report from DailyMovementTotal when its filters fit whole days
+    (and `totals_filters` accepts every parameter given), falling back to the document
+    items otherwise. Both querysets annotate and group the same report columns.
     """
-    serializer_class = StockReportSerializer
-    filterset_class = StockOutReportFilter
-    pagination_class = OptionalPagination
-
-    def get_queryset(self):
-        return SJItems.objects.filter(sj__is_deleted=False).select_related(
-            'sj',
-            'product',
-            'product__category',
-            'product__supplier',
-        ).annotate(
+    totals_filterset_class = None
+    items_filterset_class = None
+
+    @cached_property
+    def use_daily_totals(self):
+        params = self.request.query_params
+        if any(params.get(name) and _parse_report_date(params[name]) is None for name in ('start_date', 'end_date')):
+            return False
+        customer = params.get('customer')
+        return not customer or customer.isdigit()
+
+    @property
+    def filterset_class(self):
+        return self.totals_filterset_class if self.use_daily_totals else self.items_filterset_class
+
+    def report_queryset(self, queryset):
+        return queryset.annotate(
             product_code=F('product__code'),
             product_name=F('product__name'),
             packing=F('product__packing'),
@@ -726,27 +1352,539 @@ class StockOutReportView(generics.ListAPIView):
         ).order_by('product__category__sort_order', Lower('product__name'))
 
 
-class StockInReportView(generics.ListAPIView):
+class StockOutReportView(DailyTotalsReportMixin, ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
     """
-    API view for the stock in report.
+    API view for the stock out report.
     """
     serializer_class = StockReportSerializer
-    filterset_class = StockInReportFilter
+    cache_tables = (SJ, Product, Category)
+    totals_filterset_class = StockOutTotalsFilter
+    items_filterset_class = StockOutReportFilter
     pagination_class = OptionalPagination
+    copy_columns = {
+        'product_code': 'product_code',
+        'product_name': 'product_name',
+        'packing': 'packing',
+        'total_carton_quantity': 'total_carton_quantity',
+        'total_pack_quantity': 'total_pack_quantity',
+    }
 
     def get_queryset(self):
-        return SPGItems.objects.filter(spg__is_deleted=False).select_related(
-            'spg',
-            'product',
-            'product__category',
-            'product__supplier',
-        ).annotate(
+        if self.use_daily_totals:
+            return self.report_queryset(DailyMovementTotal.objects.filter(source_type=SJ.STOCK_SOURCE_TYPE))
+        return self.report_queryset(SJItems.objects.filter(sj__is_deleted=False))
+
+
+class SPKBacklogReportView(ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
+    """
+    API view for the SPK backlog report: ordered, shipped and outstanding quantities per
+    product across all live SPKs, read from the fulfilled counters of the SPK lines,
+    next to the current stock of the product per warehouse.
+    Pass ?group_by=customer to split the totals per customer.
+    """
+    serializer_class = SPKBacklogReportSerializer
+    cache_tables = (SPK, Stock, Product, Category, Customer, Warehouse)
+    permission_classes = [IsAuthenticated]
+    filterset_class = SPKBacklogReportFilter
+    pagination_class = OptionalPagination
+
+    def get_queryset(self):
+        group_fields = ['product_id', 'product_code', 'product_name', 'packing']
+        order_fields = ['product__category__sort_order', Lower('product__name')]
+        queryset = SPKItems.objects.filter(spk__is_deleted=False).annotate(
             product_code=F('product__code'),
             product_name=F('product__name'),
             packing=F('product__packing'),
-        ).values(
-            'product_code', 'product_name', 'packing'
-        ).annotate(
-            total_carton_quantity=Sum('carton_quantity'),
-            total_pack_quantity=Sum('pack_quantity')
-        ).order_by('product__category__sort_order', Lower('product__name'))
+        )
+        if self.request.query_params.get('group_by') == 'customer':
+            queryset = queryset.annotate(
+                customer_id=F('spk__customer_id'),
+                customer_name=F('spk__customer__name'),
+            )
+            group_fields += ['customer_id', 'customer_name']
+            order_fields += [Lower('spk__customer__name'), 'spk__customer_id']
+
+        # Over-shipped lines count as nothing outstanding rather than offsetting other lines.
+        return queryset.values(*group_fields).annotate(
+            ordered_carton_quantity=Sum('carton_quantity'),
+            ordered_pack_quantity=Sum('pack_quantity'),
+            shipped_carton_quantity=Sum('fulfilled_carton_quantity'),
+            shipped_pack_quantity=Sum('fulfilled_pack_quantity'),
+            outstanding_carton_quantity=Sum(Greatest(F('carton_quantity') - F('fulfilled_carton_quantity'), Value(0))),
+            outstanding_pack_quantity=Sum(Greatest(F('pack_quantity') - F('fulfilled_pack_quantity'), Value(0))),
+        ).order_by(*order_fields)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        export_format = request.query_params.get('export')
+        if export_format:
+            return self.export(
+                (row for chunk in _export_chunks(queryset) for row in self._attach_stocks(chunk)),
+                export_format,
+            )
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        self._attach_stocks(rows)
+
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def _attach_stocks(self, rows):
+        """
+        Attaches the current stock of each row's product per warehouse, with every
+        warehouse present, reading the stock of all rows with one query.
+        """
+        warehouse_names = list(Warehouse.objects.order_by('id').values_list('name', flat=True))
+        stocks_by_product = {
+            row['product_id']: {name: {'pack': 0, 'carton': 0} for name in warehouse_names}
+            for row in rows
+        }
+        for product_id, warehouse_name, carton_quantity, pack_quantity in Stock.objects.filter(
+            product_id__in=list(stocks_by_product)
+        ).values_list('product_id', 'warehouse__name', 'carton_quantity', 'pack_quantity'):
+            stocks_by_product[product_id][warehouse_name] = {'pack': pack_quantity, 'carton': carton_quantity}
+        for row in rows:
+            row['stocks'] = stocks_by_product[row['product_id']]
+        return rows
+
+
+class StockInReportView(DailyTotalsReportMixin, ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
+    """
+    API view for the stock in report.
+    """
+    serializer_class = StockReportSerializer
+    cache_tables = (SPG, Product, Category)
+    totals_filterset_class = StockInTotalsFilter
+    items_filterset_class = StockInReportFilter
+    pagination_class = OptionalPagination
+    copy_columns = {
+        'product_code': 'product_code',
+        'product_name': 'product_name',
+        'packing': 'packing',
+        'total_carton_quantity': 'total_carton_quantity',
+        'total_pack_quantity': 'total_pack_quantity',
+    }
+
+    def get_queryset(self):
+        if self.use_daily_totals:
+            return self.report_queryset(DailyMovementTotal.objects.filter(source_type=SPG.STOCK_SOURCE_TYPE))
+        return self.report_queryset(SPGItems.objects.filter(spg__is_deleted=False))
+
+
+class StockInItemsReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
+    """
+    Provides every item of the active SPGs, one row per line with its document, warehouse
+    and product, filtered like the stock in report. Full-history exports can be streamed
+    with ?export=csv&engine=copy.
+    """
+    serializer_class = StockInItemReportSerializer
+    cache_tables = (SPG, Product, Category, Supplier, Warehouse)
+    permission_classes = [IsAuthenticated]
+    pagination_class = OptionalPagination
+    cursor_ordering = ('-spg__created_at', '-id')
+    filterset_class = StockInReportFilter
+    copy_columns = {
+        'document_number': 'spg__document_number',
+        'document_type': 'spg__document_type',
+        'transaction_date': TruncDate('spg__transaction_date'),
+        'sj_number': 'spg__sj_number',
+        'container_number': 'spg__container_number',
+        'vehicle_number': 'spg__vehicle_number',
+        'warehouse_name': 'spg__warehouse__name',
+        'product_code': 'product__code',
+        'product_name': 'product__name',
+        'product_category': 'product__category__name',
+        'supplier_name': 'product__supplier__name',
+        'packing': 'product__packing',
+        'carton_quantity': 'carton_quantity',
+        'pack_quantity': 'pack_quantity',
+    }
+
+    queryset = SPGItems.objects.filter(spg__is_deleted=False).order_by('-spg__created_at', '-id')
+
+
+class StockOutItemsReportView(ReportCacheMixin, ReportExportMixin, ValuesReportMixin, generics.ListAPIView):
+    """
+    Provides every item of the active SJs, one row per line with its document, customer,
+    warehouse and product, filtered like the stock out report. Full-history exports can
+    be streamed with ?export=csv&engine=copy.
+    """
+    serializer_class = StockOutItemReportSerializer
+    cache_tables = (SJ, SPK, Customer, Product, Category, Supplier, Warehouse)
+    permission_classes = [IsAuthenticated]
+    pagination_class = OptionalPagination
+    cursor_ordering = ('-sj__created_at', '-id')
+    filterset_class = StockOutReportFilter
+    copy_columns = {
+        'document_number': 'sj__document_number',
+        'transaction_date': TruncDate('sj__transaction_date'),
+        'spk_document_number': 'sj__spk__document_number',
+        'sj_type': 'sj__sj_type',
+        'customer_name': 'sj__customer__name',
+        'non_customer_name': 'sj__non_customer_name',
+        'vehicle_number': 'sj__vehicle_number',
+        'warehouse_name': 'sj__warehouse__name',
+        'product_code': 'product__code',
+        'product_name': 'product__name',
+        'product_category': 'product__category__name',
+        'supplier_name': 'product__supplier__name',
+        'packing': 'product__packing',
+        'carton_quantity': 'carton_quantity',
+        'pack_quantity': 'pack_quantity',
+    }
+
+    queryset = SJItems.objects.filter(sj__is_deleted=False).order_by('-sj__created_at', '-id')
+
+
+class StockAgingReportView(ReportCacheMixin, ReportExportMixin, generics.ListAPIView):
+    """
+    Buckets the on-hand stock of every warehouse by days since its last outbound
+    movement (0-30, 31-90, 91-180 and over 180 days) as of today or `as_of`, to find
+    slow-moving and dead stock. One row per stock record, oldest first, or one row per
+    warehouse with `group=warehouse`. Filters: warehouse, supplier, category and bucket.
+    """
+    serializer_class = StockAgingReportSerializer
+    cache_tables = (Stock, SJ, SuratLain, SuratTransferStok, Product, Category, Supplier, Warehouse)
+    permission_classes = [IsAuthenticated]
+    pagination_class = OptionalPagination
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('group') == 'warehouse':
+            return StockAgingSummarySerializer
+        return StockAgingReportSerializer
+
+    def cache_variant(self):
+        # Without as_of the report ages the stock as of today.
+        return f':{timezone.localdate()}'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: self.stock_aging(request))
+
+    def params_error(self, request):
+        as_of = request.query_params.get('as_of')
+        if as_of and _parse_report_date(as_of) is None:
+            return "as_of must be a date (YYYY-MM-DD)"
+
+        for name in ('warehouse', 'supplier', 'category'):
+            value = request.query_params.get(name, '')
+            if value and not value.isdigit():
+                return f"{name} must be an id"
+
+        bucket = request.query_params.get('bucket')
+        buckets = [key for key, _ in STOCK_AGING_BUCKETS]
+        if bucket and bucket not in buckets:
+            return f"bucket must be one of {', '.join(buckets)}"
+        group = request.query_params.get('group')
+        if group and group != 'warehouse':
+            return "group must be warehouse"
+        return None
+
+    def stock_aging(self, request):
+        error = self.params_error(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        as_of = request.query_params.get('as_of')
+        as_of = _parse_report_date(as_of) if as_of else timezone.localdate()
+        ids = {}
+        for name in ('warehouse', 'supplier', 'category'):
+            value = request.query_params.get(name, '')
+            ids[f'{name}_id'] = int(value) if value else None
+        bucket = request.query_params.get('bucket')
+        group = request.query_params.get('group')
+
+        rows = _stock_aging(as_of, **ids)
+        if bucket:
+            rows = [row for row in rows if row['bucket'] == bucket]
+        if group:
+            rows = self._warehouse_summaries(rows)
+
+        export_format = request.query_params.get('export')
+        if export_format:
+            return self.export(rows, export_format)
+
+        page = self.paginate_queryset(rows)
+        serializer = self.get_serializer(page if page is not None else rows, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def _warehouse_summaries(self, rows):
+        summaries = {}
+        for row in rows:
+            summary = summaries.get(row['warehouse'])
+            if summary is None:
+                summary = summaries[row['warehouse']] = {
+                    'warehouse': row['warehouse'],
+                    'warehouse_name': row['warehouse_name'],
+                }
+                for key, _ in STOCK_AGING_BUCKETS:
+                    summary.update({f'{key}_stock_count': 0, f'{key}_carton_quantity': 0, f'{key}_pack_quantity': 0})
+
+            summary[f"{row['bucket']}_stock_count"] += 1
+            summary[f"{row['bucket']}_carton_quantity"] += row['carton_quantity']
+            summary[f"{row['bucket']}_pack_quantity"] += row['pack_quantity']
+        return list(summaries.values())
+
+
+# Report views by the slug of their endpoint, for running them in-process from report
+# jobs and the dashboard.
+REPORT_VIEWS = {
+    'stock-info': StockInfoReportView,
+    'stock-balance': StockBalanceReportView,
+    'stock-card': StockCardReportView,
+    'stock-transfer': StockTransferReportView,
+    'retur-pembelian': ReturPembelianReportView,
+    'retur-penjualan': ReturPenjualanReportView,
+    'penerimaan-barang': PenerimaanBarangReportView,
+    'pengeluaran-barang': PengeluaranBarangReportView,
+    'stock-out': StockOutReportView,
+    'stock-in': StockInReportView,
+    'spk-backlog': SPKBacklogReportView,
+    'stock-aging': StockAgingReportView,
+}
+
+
+def _report_request(report, user, params, meta=None):
+    """
+    Builds the GET request the report's endpoint would have received with `params`
+    (a dict of values or lists of values), authenticated as `user`. `meta` carries the
+    host headers of an outer request so that pagination links resolve.
+    """
+    query = QueryDict(mutable=True)
+    for key, value in params.items():
+        values = value if isinstance(value, list) else [value]
+        query.setlist(key, [str(item).lower() if isinstance(item, bool) else str(item) for item in values])
+
+    http_request = HttpRequest()
+    http_request.method = 'GET'
+    http_request.path = f'/api/report/{report}/'
+    http_request.GET = query
+    if meta is not None:
+        http_request.META = dict(meta)
+    request = Request(http_request)
+    request.user = user
+    return request
+
+
+def _run_report_view(report, request, **initkwargs):
+    """
+    Runs the list action of a report view on `request` without going through the URL
+    dispatcher or authentication. Exceptions are turned into responses the way the view
+    would handle them.
+    """
+    view = REPORT_VIEWS[report](request=request, args=(), kwargs={}, format_kwarg=None, **initkwargs)
+    view.headers = {}
+    try:
+        view.check_permissions(request)
+        return view.list(request)
+    except Exception as exc:
+        return view.handle_exception(exc)
+
+
+def _report_params_error(report, request):
+    """
+    Checks `request` the way the report's endpoint would before running it: the view's
+    own parameter checks, then its filterset. Returns the error, or None when the
+    report would run.
+    """
+    view = REPORT_VIEWS[report](request=request, args=(), kwargs={}, format_kwarg=None)
+    if hasattr(view, 'params_error'):
+        error = view.params_error(request)
+        if error:
+            return error
+
+    filterset_class = getattr(view, 'filterset_class', None)
+    if filterset_class is not None:
+        filterset = filterset_class(request.query_params, request=request)
+        if not filterset.is_valid():
+            return filterset.errors
+    return None
+
+
+def _response_error(response):
+    data = response.data
+    if isinstance(data, dict):
+        return data.get('error') or data.get('detail') or json.dumps(data)
+    return json.dumps(data)
+
+
+def _report_job_path(job):
+    return os.path.join(settings.REPORT_JOB_ROOT, f'{job.pk}-{job.report}.{job.export_format}')
+
+
+def _run_report_job(job):
+    """
+    Runs a claimed job through its report view, unpaginated for json and as an export
+    otherwise, and writes the response to the job's result file, then records the
+    outcome. The outcome is only saved while the job is still on the attempt this
+    worker claimed, so a job that was reclaimed as stale is not overwritten by its
+    first worker.
+    """
+    outcome = {'status': ReportJob.STATUS_DONE, 'error': '', 'result_file': ''}
+    path = _report_job_path(job)
+    partial_path = f'{path}.{job.attempts}.part'
+    try:
+        params = dict(job.params)
+        if job.export_format == 'json':
+            params['paginate'] = 'false'
+        else:
+            params['export'] = job.export_format
+        # The result goes to a file, so it is kept out of the report cache.
+        response = _run_report_view(job.report, _report_request(job.report, job.user, params), cache_tables=())
+
+        if response.status_code != status.HTTP_200_OK:
+            outcome.update(status=ReportJob.STATUS_FAILED, error=_response_error(response))
+        else:
+            os.makedirs(settings.REPORT_JOB_ROOT, exist_ok=True)
+            with open(partial_path, 'wb') as result:
+                if response.streaming:
+                    for chunk in response.streaming_content:
+                        result.write(chunk)
+                else:
+                    result.write(JSONRenderer().render(response.data))
+            os.replace(partial_path, path)
+            outcome['result_file'] = os.path.basename(path)
+    except Exception as exc:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        outcome.update(status=ReportJob.STATUS_FAILED, error=str(exc) or type(exc).__name__)
+
+    ReportJob.objects.filter(pk=job.pk, attempts=job.attempts).update(finished_at=timezone.now(), **outcome)
+    job.refresh_from_db()
+    return job
+
+
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Queues reports for the run_report_jobs worker and serves their results. POST a
+    report slug with its query params, poll the returned poll_url until the status is
+    DONE, then fetch download_url.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Reject parameters the report would fail on now rather than from the worker.
+        report = serializer.validated_data['report']
+        error = _report_params_error(report, _report_request(report, request.user, serializer.validated_data.get('params', {})))
+        if error:
+            raise serializers.ValidationError({'params': error})
+
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['GET'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.STATUS_DONE:
+            return Response(
+                {"error": f"The report is not ready (status {job.status})"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        path = os.path.join(settings.REPORT_JOB_ROOT, job.result_file)
+        if not os.path.exists(path):
+            return Response(
+                {"error": "The report file is no longer available"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{job.report}-{job.pk}.{job.export_format}')
+
+
+# Sections of the report dashboard and whether each takes the shared date range; all of
+# them take the shared warehouse.
+REPORT_DASHBOARD_SECTIONS = {
+    'stock-info': False,
+    'stock-in': True,
+    'stock-out': True,
+    'stock-transfer': True,
+    'retur-pembelian': True,
+    'retur-penjualan': True,
+    'penerimaan-barang': True,
+    'pengeluaran-barang': True,
+}
+
+
+def _run_dashboard_section(report, request):
+    started = time.perf_counter()
+    try:
+        response = _run_report_view(report, request)
+        if response.status_code == status.HTTP_200_OK:
+            section = {'data': response.data}
+        else:
+            section = {'status': response.status_code, 'error': _response_error(response)}
+    finally:
+        # Each section runs on a pool thread with its own connection; close it here
+        # rather than leave it to the thread's exit.
+        connections.close_all()
+    section['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return section
+
+
+class ReportDashboardView(generics.GenericAPIView):
+    """
+    Runs the landing page reports (stock info, stock in/out, transfers and the four
+    SuratLain reports) for a shared start_date/end_date and warehouse in one request.
+    The sections run concurrently on a pool of REPORT_DASHBOARD_WORKERS threads, each
+    with its own database connection, and come back as each report's first page
+    (or `page_size` rows) with the time it took. `sections` picks a subset.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        warehouse_id = request.query_params.get('warehouse')
+        if (start_date and _parse_report_date(start_date) is None) or (end_date and _parse_report_date(end_date) is None):
+            return Response(
+                {"error": "start_date and end_date must be dates (YYYY-MM-DD)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if warehouse_id and not warehouse_id.isdigit():
+            return Response(
+                {"error": "warehouse must be a warehouse id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        sections = request.query_params.get('sections')
+        reports = sections.split(',') if sections else list(REPORT_DASHBOARD_SECTIONS)
+        unknown = [report for report in reports if report not in REPORT_DASHBOARD_SECTIONS]
+        if unknown:
+            return Response(
+                {"error": f"Unknown sections: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shared = {'warehouse': warehouse_id, 'page_size': request.query_params.get('page_size')}
+        dates = {'start_date': start_date, 'end_date': end_date}
+        section_requests = {}
+        for report in reports:
+            params = {**shared, **dates} if REPORT_DASHBOARD_SECTIONS[report] else shared
+            params = {key: value for key, value in params.items() if value}
+            section_requests[report] = _report_request(report, request.user, params, meta=request.META)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(settings.REPORT_DASHBOARD_WORKERS, len(reports))) as executor:
+            futures = {
+                report: executor.submit(_run_dashboard_section, report, section_request)
+                for report, section_request in section_requests.items()
+            }
+            results = {report: future.result() for report, future in futures.items()}
+
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'warehouse': int(warehouse_id) if warehouse_id else None,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'sections': results,
+        })